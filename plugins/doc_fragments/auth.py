@@ -31,6 +31,200 @@ options:
     type: bool
     default: yes
     aliases: [verify_ssl]
+  quay_connection_pool_size:
+    description:
+      - Maximum number of idle connections that the module keeps open to the
+        Quay server between API calls.
+      - Reusing connections saves a TCP connection and a TLS handshake for
+        each API call.
+      - Set the parameter to C(0) to open a new connection for each API call.
+      - The module does not reuse connections when it accesses the API
+        through a proxy.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_CONNECTION_POOL_SIZE) environment variable.
+    type: int
+    default: 10
+  quay_parallel_requests:
+    description:
+      - Maximum number of API requests that the module can send in parallel.
+      - The modules send parallel requests in the following cases.
+      - When retrieving the tags of a repository, the module requests the next
+        pages of the tag listing in advance.
+      - When looking up several users or robot accounts, for example the new
+        members of a team or the accounts in the repository permissions, the
+        module retrieves the accounts in parallel.
+      - The M(herve4m.quay.quay_team) module adds and removes the team members
+        in parallel.
+      - The M(herve4m.quay.quay_repository) module retrieves and applies the
+        user and team permission changes in parallel.
+      - The M(herve4m.quay.quay_repositories) module processes several
+        repositories in parallel.
+      - The M(herve4m.quay.quay_org_reconcile) module (used by the
+        C(herve4m.quay.quay_org) role) reads the current configuration of the
+        organization, and applies the changes of each phase, in parallel.
+      - Set I(quay_connection_pool_size) to at least the same value so that
+        the module can reuse the connections.
+      - Parallel requests require Python 3 on the managed node.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_PARALLEL_REQUESTS) environment variable.
+    type: int
+    default: 1
+  quay_cache_dir:
+    description:
+      - Directory where the module stores the responses from the API
+        endpoints that are addressed by an image digest (manifests, manifest
+        labels, and security reports).
+      - When the module needs the same data again, possibly during a later
+        task or a later play, it uses the stored data instead of calling the
+        API.
+      - The module also stores the repository, tag, permission, team member,
+        organization, default permission, auto-pruning policy, and quota
+        responses that include an C(ETag) or a C(Last-Modified) header. When
+        the module needs the same data again, it sends a conditional request
+        to the API, which returns only a short C(304 Not Modified) response if
+        the data did not change.
+      - The module never stores the responses that can include secrets, such
+        as robot account tokens, OAuth application secrets, or the
+        credentials of proxy cache and mirroring configurations.
+      - The stored responses are only reused with the same credentials
+        (I(quay_token) or I(quay_username)).
+      - The module creates the files with the C(0600) permissions.
+      - The module creates the directory if it does not exist.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_CACHE_DIR) environment variable.
+      - If you do not set the environment variable either, then the module
+        does not store the responses.
+    type: path
+  quay_cache_max_size:
+    description:
+      - Maximum size in MiB of the I(quay_cache_dir) directory.
+      - When the directory exceeds that size, the module removes the least
+        recently used responses.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_CACHE_MAX_SIZE) environment variable.
+    type: int
+    default: 100
+  quay_cache_ttl:
+    description:
+      - Time in seconds during which the stored manifest labels and security
+        reports stay valid.
+      - Manifests never change for a given digest and do not expire.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_CACHE_TTL) environment variable.
+    type: int
+    default: 3600
+  quay_max_retries:
+    description:
+      - Maximum number of times the module sends an API request again after a
+        temporary error.
+      - Temporary errors are network errors and the C(429), C(502), C(503),
+        and C(504) HTTP status codes.
+      - The module only retries the C(GET), C(PUT), and C(DELETE) requests,
+        which can safely be sent several times. The module retries the other
+        requests, such as C(POST), only when the server returns the C(429)
+        status code, because that code indicates that the server has not
+        processed the request.
+      - Set the parameter to C(0) to disable the retries.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_MAX_RETRIES) environment variable.
+    type: int
+    default: 3
+  quay_retry_backoff:
+    description:
+      - Base delay in seconds between two attempts.
+      - The module waits for a random delay between zero and
+        I(quay_retry_backoff) before the first retry, and doubles the upper
+        limit of that random delay for each following retry.
+      - When the server returns a C(Retry-After) header, the module waits
+        for the delay that the server requests instead.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_RETRY_BACKOFF) environment variable.
+    type: float
+    default: 1.0
+  quay_retry_max_delay:
+    description:
+      - Maximum delay in seconds between two attempts, including the delay
+        that the server requests in the C(Retry-After) header.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_RETRY_MAX_DELAY) environment variable.
+    type: float
+    default: 30.0
+  quay_rate_limit:
+    description:
+      - Maximum number of API requests per second that the module sends to
+        the Quay server.
+      - Set the parameter to C(0) to disable the limit.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_RATE_LIMIT) environment variable.
+    type: float
+    default: 0
+  quay_rate_limit_burst:
+    description:
+      - Number of API requests that the module can send at once, without
+        waiting, before I(quay_rate_limit) applies.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_RATE_LIMIT_BURST) environment variable.
+    type: int
+    default: 5
+  quay_rate_limit_file:
+    description:
+      - File that the modules use to share the I(quay_rate_limit) budget.
+      - By default, each module applies the limit to its own requests. When
+        you set the parameter, all the modules that use the same file on the
+        same system share the budget, such as the modules that Ansible runs
+        in parallel in several forks.
+      - The module creates the file if it does not exist.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_RATE_LIMIT_FILE) environment variable.
+    type: path
+  quay_dns_cache_ttl:
+    description:
+      - Time in seconds during which the module reuses the IP addresses of
+        the Quay server after resolving its name.
+      - The module resolves the name once, and then uses the addresses for
+        all its connections to the Quay server.
+      - Set the parameter to C(0) to resolve the name for each connection.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_DNS_CACHE_TTL) environment variable.
+    type: int
+    default: 300
+  quay_dns_cache_file:
+    description:
+      - File where the modules store the IP addresses of the Quay server.
+      - The modules that use the same file on the same system, such as the
+        modules in the following tasks, reuse the addresses until they
+        expire (I(quay_dns_cache_ttl)), instead of resolving the name again.
+      - The module creates the file if it does not exist.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_DNS_CACHE_FILE) environment variable.
+    type: path
+  quay_host_addresses:
+    description:
+      - IP addresses to use for the Quay server instead of resolving the name
+        that you set in I(quay_host).
+      - The module still uses the name in I(quay_host) for the C(Host) header
+        and to validate the TLS certificate.
+      - The addresses do not apply to the requests that go through a proxy.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_HOST_ADDRESSES) environment variable, which contains a
+        comma-separated list of addresses.
+    type: list
+    elements: str
+  quay_debug_stats:
+    description:
+      - Whether to return statistics about the API requests that the module
+        sends, in the C(quay_stats) key of the module result.
+      - The statistics include the number of requests, the total size of the
+        response bodies in bytes, after decompression, the median (C(p50))
+        and 95th percentile (C(p95)) latency in seconds, the number of
+        requests for each HTTP status code, and the same values for each API
+        endpoint, the most time-consuming endpoints first.
+      - The statistics also include the number of reused connections,
+        retries, and cache hits.
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_DEBUG_STATS) environment variable.
+    type: bool
+    default: no
 """
 
     LOGIN = r"""
@@ -58,4 +252,19 @@ options:
       - If you set I(quay_password), then you also need to set I(quay_username).
       - Mutually exclusive with I(quay_token).
     type: str
+  quay_session_cache_dir:
+    description:
+      - Directory where the module saves the web session that it opens when
+        you authenticate with I(quay_username) and I(quay_password).
+      - The following modules reuse that session instead of signing in again,
+        and the modules do not sign out when they complete. If the session has
+        expired, then the modules sign in again.
+      - The module encrypts the session with a key derived from
+        I(quay_password). Saving the session requires the C(cryptography)
+        Python library on the managed node.
+      - The module creates the directory if it does not exist.
+      - The parameter is ignored when you authenticate with I(quay_token).
+      - If you do not set the parameter, then the module tries the
+        C(QUAY_SESSION_CACHE_DIR) environment variable.
+    type: path
 """
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+name: quay
+short_description: HttpApi plugin for Quay Container Registry
+description:
+  - The plugin keeps an authenticated session to the Quay Container Registry
+    API in the persistent connection process, so that all the tasks of a play
+    that target the same host share the connection and the session.
+  - Use the plugin with the C(ansible.netcommon.httpapi) connection plugin, by
+    setting the C(ansible_connection) variable to C(ansible.netcommon.httpapi)
+    and the C(ansible_network_os) variable to C(herve4m.quay.quay).
+  - The C(ansible_host), C(ansible_httpapi_port), C(ansible_httpapi_use_ssl),
+    and C(ansible_httpapi_validate_certs) variables define how to reach the
+    Quay API.
+  - When the modules of the collection run through the persistent
+    connection, they ignore their I(quay_host), I(quay_token),
+    I(quay_username), and I(quay_password) parameters.
+version_added: '1.6.0'
+author: Hervé Quatremain (@herve4m)
+options:
+  quay_token:
+    description:
+      - OAuth access token for authenticating with the API.
+      - If you do not set the token, then the plugin signs in with the
+        C(ansible_user) and C(ansible_password) credentials, and signs out
+        when the persistent connection closes.
+    type: str
+    vars:
+      - name: ansible_quay_token
+    env:
+      - name: QUAY_TOKEN
+"""
+
+import json
+import re
+
+from ansible.errors import AnsibleConnectionFailure
+from ansible.module_utils.common.text.converters import to_text
+from ansible.module_utils.six.moves.http_cookies import SimpleCookie
+from ansible.plugins.httpapi import HttpApiBase
+
+
+class HttpApi(HttpApiBase):
+    """Quay Container Registry HttpApi plugin."""
+
+    def __init__(self, connection):
+        """Initialize the object."""
+        super(HttpApi, self).__init__(connection)
+        # Session cookies, by name
+        self.cookies = {}
+        self.csrf_token = None
+        self.signed_in = False
+        self.relogin = False
+
+    def get_auth_headers(self):
+        """Return the headers that authenticate the requests.
+
+        :return: The ``Authorization`` header for token authentication, or
+                 the ``Cookie`` and ``X-CSRF-Token`` headers of the session.
+        :rtype: dict
+        """
+        headers = {}
+        token = self.get_option("quay_token")
+        if token:
+            headers["Authorization"] = "Bearer {token}".format(token=token)
+        if self.cookies:
+            headers["Cookie"] = "; ".join(
+                "{name}={value}".format(name=n, value=v) for n, v in self.cookies.items()
+            )
+        if self.csrf_token:
+            headers["X-CSRF-Token"] = self.csrf_token
+        return headers
+
+    def login(self, username, password):
+        """Authenticate with a token, or sign in with a username and a password.
+
+        :param username: The username.
+        :type username: str
+        :param password: The password.
+        :type password: str
+
+        :raises AnsibleConnectionFailure: The authentication failed.
+        """
+        self.cookies = {}
+        self.csrf_token = None
+        if self.get_option("quay_token") or not username or not password:
+            self.connection._auth = self.get_auth_headers() or None
+            return
+
+        # Retrieve the CSRF cookie and token from the root page (GET /)
+        response, data = self.connection.send(
+            "/", None, method="GET", headers={"Accept": "*/*"}
+        )
+        match = re.search(r"window.__token\s*=\s*'(.*?)';", to_text(data.getvalue()))
+        if not match:
+            raise AnsibleConnectionFailure(
+                "Cannot retrieve the CSRF token from the returned data"
+            )
+
+        # Log in to the web UI (POST /api/v1/signin)
+        response, data = self.connection.send(
+            "/api/v1/signin",
+            json.dumps({"username": username, "password": password}),
+            method="POST",
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+                "X-CSRF-Token": match.group(1),
+            },
+        )
+        status = response.getcode()
+        if status != 200:
+            raise AnsibleConnectionFailure(
+                "Unable to sign in to {url}: {code}: {error}".format(
+                    url=self.connection._url, code=status, error=to_text(data.getvalue())
+                )
+            )
+        # Depending on the Quay version the headers might not be in lowercase
+        headers_lower = dict((k.lower(), v) for k, v in response.info().items())
+        self.csrf_token = headers_lower.get("x-next-csrf-token")
+        if self.csrf_token is None:
+            raise AnsibleConnectionFailure("Cannot retrieve the authentication token")
+        self.signed_in = True
+        self.connection._auth = self.get_auth_headers()
+
+    def logout(self):
+        """Sign out when the session has been opened with a username and a password."""
+        if self.signed_in:
+            try:
+                self.send_request("POST", "/api/v1/signout")
+            except Exception:
+                pass
+        self.signed_in = False
+        self.cookies = {}
+        self.csrf_token = None
+        self.connection._auth = None
+
+    def update_auth(self, response, response_text):
+        """Collect the session cookies from the response.
+
+        :return: The headers that authenticate the next requests, or ``None``
+                 if the response does not set any cookie.
+        :rtype: dict
+        """
+        info = response.info()
+        cookies = info.get_all("Set-Cookie") if hasattr(info, "get_all") else None
+        if not cookies:
+            return None
+        for cookie in cookies:
+            parsed = SimpleCookie()
+            try:
+                parsed.load(cookie)
+            except Exception:
+                continue
+            for name, morsel in parsed.items():
+                self.cookies[name] = morsel.value
+        return self.get_auth_headers()
+
+    def handle_httperror(self, exc):
+        """Process the HTTP errors.
+
+        When the session has expired, the method signs in again and the
+        request is sent one more time. The other errors are returned to the
+        module, which decides what to do with them.
+
+        :return: ``True`` to send the request again, or the error to return it
+                 as the response.
+        :rtype: bool or :py:class:``urllib.error.HTTPError``
+        """
+        if exc.code == 401 and self.signed_in and not self.relogin:
+            self.relogin = True
+            try:
+                self.login(
+                    self.connection.get_option("remote_user"),
+                    self.connection.get_option("password"),
+                )
+            finally:
+                self.relogin = False
+            return True
+        return exc
+
+    def get_base_url(self):
+        """Return the URL of the Quay server.
+
+        :return: The URL, such as ``https://quay.example.com:443``.
+        :rtype: str
+        """
+        if not getattr(self.connection, "_url", None):
+            self.connection._connect()
+        return self.connection._url
+
+    def send_request(self, method, path, data=None, headers=None):
+        """Send a request to the Quay API through the persistent connection.
+
+        The method returns HTTP errors as responses, so that the module can
+        process them.
+
+        :param method: GET, PUT, POST, DELETE, or HEAD
+        :type method: str
+        :param path: The path and the query of the URL, such as
+                     ``/api/v1/repository?namespace=production``.
+        :type path: str
+        :param data: Data for PUT and POST requests.
+        :type data: str
+        :param headers: Additional headers for the request.
+        :type headers: dict
+
+        :return: A dictionary with the ``status``, ``reason``, ``headers``
+                 (list of (header, value) tuples), and ``body`` keys.
+        :rtype: dict
+        """
+        response, data = self.connection.send(
+            path, data, method=method, headers=headers or {}
+        )
+        # The response is already decompressed
+        return {
+            "status": response.getcode(),
+            "reason": to_text(
+                getattr(response, "reason", None) or getattr(response, "msg", "")
+            ),
+            "headers": [
+                (k, v) for k, v in response.info().items() if k.lower() != "content-encoding"
+            ],
+            "body": to_text(data.getvalue(), errors="surrogate_or_strict"),
+        }
@@ -6,16 +6,116 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
-import socket
+import hashlib
+import itertools
 import json
 import re
+import threading
+import time
 
-from ansible.module_utils.basic import AnsibleModule, env_fallback
-from ansible.module_utils._text import to_text
+try:
+    from concurrent.futures import ThreadPoolExecutor
+
+    HAS_FUTURES = True
+except ImportError:
+    HAS_FUTURES = False
+
+from ansible.module_utils.basic import AnsibleModule, env_fallback, missing_required_lib
+from ansible.module_utils._text import to_bytes, to_text
+from ansible.module_utils.connection import Connection
+from ansible.module_utils.connection import ConnectionError as HttpApiConnectionError
+from ansible.module_utils.six.moves import http_client
 from ansible.module_utils.six.moves.urllib.parse import urlparse, urlencode
 from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.request import Request as URLRequest
 from ansible.module_utils.urls import Request, SSLValidationError
 
+from .connection_pool import (
+    ConnectionPool,
+    PoolResponse,
+    ResponseHead,
+    read_body,
+    read_response,
+)
+from .digest_resolver import DigestResolver
+from .dns_resolver import DNSResolver
+from .response_cache import ResponseCache
+from .rate_limiter import RateLimiter
+from .request_stats import RequestStats
+from .retry_policy import RetryPolicy
+from .session_cache import HAS_CRYPTOGRAPHY, SessionCache
+
+
+# Number of tag names that the registry API returns per page. The registry
+# might return fewer names.
+REGISTRY_TAG_PAGE_SIZE = 1000
+
+# Options that control how the modules send the API requests. The modules
+# accept them with and without authentication.
+CLIENT_ARGSPEC = dict(
+    quay_connection_pool_size=dict(
+        type="int",
+        default=10,
+        fallback=(env_fallback, ["QUAY_CONNECTION_POOL_SIZE"]),
+    ),
+    quay_parallel_requests=dict(
+        type="int",
+        default=1,
+        fallback=(env_fallback, ["QUAY_PARALLEL_REQUESTS"]),
+    ),
+    quay_cache_dir=dict(type="path", fallback=(env_fallback, ["QUAY_CACHE_DIR"])),
+    quay_cache_max_size=dict(
+        type="int",
+        default=100,
+        fallback=(env_fallback, ["QUAY_CACHE_MAX_SIZE"]),
+    ),
+    quay_cache_ttl=dict(
+        type="int",
+        default=3600,
+        fallback=(env_fallback, ["QUAY_CACHE_TTL"]),
+    ),
+    quay_max_retries=dict(
+        type="int",
+        default=3,
+        fallback=(env_fallback, ["QUAY_MAX_RETRIES"]),
+    ),
+    quay_retry_backoff=dict(
+        type="float",
+        default=1.0,
+        fallback=(env_fallback, ["QUAY_RETRY_BACKOFF"]),
+    ),
+    quay_retry_max_delay=dict(
+        type="float",
+        default=30.0,
+        fallback=(env_fallback, ["QUAY_RETRY_MAX_DELAY"]),
+    ),
+    quay_rate_limit=dict(
+        type="float",
+        default=0,
+        fallback=(env_fallback, ["QUAY_RATE_LIMIT"]),
+    ),
+    quay_rate_limit_burst=dict(
+        type="int",
+        default=5,
+        fallback=(env_fallback, ["QUAY_RATE_LIMIT_BURST"]),
+    ),
+    quay_rate_limit_file=dict(type="path", fallback=(env_fallback, ["QUAY_RATE_LIMIT_FILE"])),
+    quay_dns_cache_ttl=dict(
+        type="int", default=300, fallback=(env_fallback, ["QUAY_DNS_CACHE_TTL"])
+    ),
+    quay_dns_cache_file=dict(type="path", fallback=(env_fallback, ["QUAY_DNS_CACHE_FILE"])),
+    quay_host_addresses=dict(
+        type="list",
+        elements="str",
+        fallback=(env_fallback, ["QUAY_HOST_ADDRESSES"]),
+    ),
+    quay_debug_stats=dict(
+        type="bool",
+        default=False,
+        fallback=(env_fallback, ["QUAY_DEBUG_STATS"]),
+    ),
+)
+
 
 class APIModuleError(Exception):
     """API request error exception.
@@ -37,10 +137,14 @@ class APIModule(AnsibleModule):
     """Ansible module for managing Quay Container Registry."""
 
     AUTH_ARGSPEC = dict(
+        CLIENT_ARGSPEC,
         quay_host=dict(fallback=(env_fallback, ["QUAY_HOST"]), default="http://127.0.0.1"),
         quay_token=dict(no_log=True, fallback=(env_fallback, ["QUAY_TOKEN"])),
         quay_username=dict(fallback=(env_fallback, ["QUAY_USERNAME"])),
         quay_password=dict(no_log=True, fallback=(env_fallback, ["QUAY_PASSWORD"])),
+        quay_session_cache_dir=dict(
+            type="path", fallback=(env_fallback, ["QUAY_SESSION_CACHE_DIR"])
+        ),
         validate_certs=dict(
             type="bool",
             aliases=["verify_ssl"],
@@ -67,9 +171,55 @@ class APIModule(AnsibleModule):
           anonymous.
         * :py:attr:``self.cache_org``: Dictionary that is used to cache
           organization details. Keys are organization names.
+        * :py:attr:``self.cache_account``: Dictionary that is used to cache
+          user and robot account details. Keys are account names. Accounts
+          that do not exist are also cached, with a ``None`` value.
+        * :py:attr:``self.pool``: :py:class:``connection_pool.ConnectionPool``
+          object that keeps the connections to the Quay server open between
+          API calls.
+        * :py:attr:``self.resolver``: :py:class:``dns_resolver.DNSResolver``
+          object that resolves the Quay server name once for all the
+          connections in the pool.
+        * :py:attr:``self.max_workers``: Maximum number of API requests that
+          the module can send in parallel.
+        * :py:attr:``self.retry_policy``:
+          :py:class:``retry_policy.RetryPolicy`` object that decides when to
+          send the requests again after temporary errors.
+        * :py:attr:``self.request_stats``:
+          :py:class:``request_stats.RequestStats`` object that records the
+          API requests.
+        * :py:attr:``self.rate_limiter``:
+          :py:class:``rate_limiter.RateLimiter`` object that limits the number
+          of requests per second.
+        * :py:attr:``self.cache``: :py:class:``response_cache.ResponseCache``
+          object that stores the responses from the digest-addressed
+          endpoints, or ``None`` if the `quay_cache_dir' parameter is not set.
+        * :py:attr:``self.current_user``: Details of the user account used to
+          access the API, or ``None`` if not retrieved yet. See
+          :py:meth:``who_am_i``.
+        * :py:attr:``self.who_am_i_hits``: Number of :py:meth:``who_am_i``
+          calls that did not need an API request.
+        * :py:attr:``self.connection``:
+          :py:class:``ansible.module_utils.connection.Connection`` object
+          that sends the requests through the persistent connection, when the
+          play uses the ``ansible.netcommon.httpapi`` connection plugin, or
+          ``None`` otherwise. The persistent connection owns the
+          authenticated session.
+        * :py:attr:``self.digest_resolver``:
+          :py:class:``digest_resolver.DigestResolver`` object that resolves
+          image tags to manifest digests with the registry API.
         """
         self.authenticated = False
         self.token_authenticated = False
+        self.session_cache = None
+        self.session_restored = False
+        self.current_user = None
+        self.who_am_i_hits = 0
+        self.who_am_i_lock = threading.Lock()
+        self.account_cache_hits = 0
+        self.account_cache_misses = 0
+        self.account_lock = threading.Lock()
+        self.request_stats = RequestStats()
 
         full_argspec = {}
         full_argspec.update(self.AUTH_ARGSPEC)
@@ -85,7 +235,18 @@ class APIModule(AnsibleModule):
 
         super(APIModule, self).__init__(argument_spec=full_argspec, **kwargs)
 
+        # The herve4m.quay.quay httpapi plugin provides the Quay URL and the
+        # session
+        self.connection = None
         host = self.params.get("quay_host")
+        if self._socket_path:
+            self.connection = Connection(self._socket_path)
+            try:
+                host = self.connection.get_base_url()
+            except HttpApiConnectionError as e:
+                self.fail_json(
+                    msg="Unable to use the persistent connection: {error}".format(error=e)
+                )
 
         if not host.startswith("https://") and not host.startswith("http://"):
             host = "https://{host}".format(host=host)
@@ -100,9 +261,17 @@ class APIModule(AnsibleModule):
                 )
             )
 
-        # Try to resolve the hostname
+        # Try to resolve the hostname. The addresses are kept for the
+        # connections to the Quay server.
+        addresses = self.params.get("quay_host_addresses")
+        self.resolver = DNSResolver(
+            ttl=self.params.get("quay_dns_cache_ttl"),
+            pins={self.host_url.hostname: addresses} if addresses else None,
+            path=self.params.get("quay_dns_cache_file"),
+        )
         try:
-            socket.gethostbyname(self.host_url.hostname)
+            if self.connection is None:
+                self.resolver.resolve(self.host_url.hostname)
         except Exception as e:
             self.fail_json(
                 msg="Unable to resolve `quay_host' ({host}): {error}".format(
@@ -110,38 +279,111 @@ class APIModule(AnsibleModule):
                 )
             )
 
-        # Create a network session object
+        # Policy for sending the requests again after temporary errors
+        self.retry_policy = RetryPolicy(
+            max_retries=self.params.get("quay_max_retries"),
+            backoff=self.params.get("quay_retry_backoff"),
+            max_delay=self.params.get("quay_retry_max_delay"),
+        )
+
+        # Limit the rate of the requests to the Quay server
+        self.rate_limiter = RateLimiter(
+            rate=self.params.get("quay_rate_limit"),
+            burst=self.params.get("quay_rate_limit_burst"),
+            path=self.params.get("quay_rate_limit_file"),
+            key=self.host_url.netloc,
+        )
+
+        # Create the pool of persistent connections and a network session
+        # object
+        self.pool = ConnectionPool(
+            maxsize=self.params.get("quay_connection_pool_size"),
+            validate_certs=self.params.get("validate_certs"),
+            resolver=self.resolver,
+        )
         self.create_session()
 
+        # Parallel requests require the concurrent.futures module (Python 3)
+        self.max_workers = self.params.get("quay_parallel_requests") or 1
+        if not HAS_FUTURES or self.max_workers < 1:
+            self.max_workers = 1
+        self.worker = threading.local()
+
         # Authenticate
         token = self.params.get("quay_token")
-        if token:
+        if self.connection is not None:
+            # The persistent connection has already authenticated
+            token = None
+            self.token_authenticated = True
+            self.authenticated = True
+        elif token:
             self.token_authenticated = True
             self.authenticated = True
             self.session.headers.update(
                 {"Authorization": "Bearer {token}".format(token=token)}
             )
         else:
-            token = self.authenticate()
+            # Reuse the session from a previous module run
+            self.session_cache = self.get_session_cache()
+            token = self.restore_session()
+            if token is None:
+                token = self.authenticate()
+                if token:
+                    self.session.headers.update({"X-CSRF-Token": token})
+                    self.save_session(token)
             if token:
-                self.session.headers.update({"X-CSRF-Token": token})
                 self.authenticated = True
         self.token = token
 
         # Cache returns from API calls that get organization details
         self.cache_org = {}
 
+        # Cache returns from API calls that get user and robot accounts
+        self.cache_account = {}
+
+        # Tag to digest resolutions for the module run
+        self.digest_resolver = DigestResolver(self)
+
+        # Persistent cache for the responses from digest-addressed endpoints.
+        # The responses are only shared between modules that use the same
+        # credentials.
+        self.cache = None
+        cache_dir = self.params.get("quay_cache_dir")
+        if cache_dir:
+            identity = self.params.get("quay_token") or self.params.get("quay_username") or ""
+            try:
+                self.cache = ResponseCache(
+                    cache_dir,
+                    (self.params.get("quay_cache_max_size") or 0) * 1024 * 1024,
+                    self.params.get("quay_cache_ttl") or 0,
+                    identity=hashlib.sha256(to_bytes(identity)).hexdigest(),
+                )
+            except (IOError, OSError) as e:
+                self.fail_json(
+                    msg="Cannot use the `quay_cache_dir' directory ({path}): {error}".format(
+                        path=cache_dir, error=e
+                    )
+                )
+
     def create_session(self):
         """Create a network session.
 
         The session preserves cookies and headers between calls.
+
+        The requests accept compressed responses. The responses are
+        decompressed by :py:meth:``make_raw_request``, for the gzip and the
+        deflate encodings, and not by the session object, which only supports
+        gzip.
         """
         headers = {
             "Content-Type": "application/json",
             "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
         }
         self.session = Request(
-            validate_certs=self.params.get("validate_certs"), headers=headers
+            validate_certs=self.params.get("validate_certs"),
+            headers=headers,
+            decompress=False,
         )
 
     def authenticate(self):
@@ -199,9 +441,98 @@ class APIModule(AnsibleModule):
             self.fail_json(msg="Cannot retrieve the authentication token")
         return token
 
+    def get_session_cache(self):
+        """Return the object that saves the sessions between module runs.
+
+        :return: The session cache object, or ``None`` if the
+                 `quay_session_cache_dir' parameter is not set or if no
+                 username and password are provided.
+        :rtype: :py:class:``session_cache.SessionCache`` or None
+        """
+        path = self.params.get("quay_session_cache_dir")
+        username = self.params.get("quay_username")
+        password = self.params.get("quay_password")
+        if not path or not username or not password:
+            return None
+        if not HAS_CRYPTOGRAPHY:
+            self.fail_json(msg=missing_required_lib("cryptography"))
+        try:
+            return SessionCache(path, self.host_url.geturl(), username, password)
+        except (IOError, OSError) as e:
+            self.fail_json(
+                msg=(
+                    "Cannot use the `quay_session_cache_dir' directory ({path}): {error}"
+                ).format(path=path, error=e)
+            )
+
+    def restore_session(self):
+        """Restore the session saved by a previous module run.
+
+        The method verifies that the session is still valid by retrieving the
+        current user details (``GET /api/v1/user/``).
+
+        :return: The CSRF token of the session, or ``None`` if no valid session
+                 is available.
+        :rtype: str or None
+        """
+        if self.session_cache is None:
+            return None
+        token = self.session_cache.load(self.session.cookies)
+        if not token:
+            return None
+        self.session.headers.update({"X-CSRF-Token": token})
+        try:
+            response = self.make_json_request(
+                "GET", self.build_url("user/"), ok_error_codes=[401, 403, 404]
+            )
+        except APIModuleError:
+            response = None
+        if (
+            response
+            and response["status_code"] == 200
+            and isinstance(response["json"], dict)
+            and response["json"].get("username") == self.params.get("quay_username")
+        ):
+            self.session_restored = True
+            # Keep the user details for who_am_i()
+            self.current_user = response["json"]
+            return token
+
+        # The session has expired
+        self.session_cache.remove()
+        self.session.cookies.clear()
+        self.session.headers.pop("X-CSRF-Token", None)
+        return None
+
+    def save_session(self, token):
+        """Save the session so that later module runs can reuse it.
+
+        :param token: The CSRF token of the session.
+        :type token: str
+        """
+        if self.session_cache is not None:
+            self.session_cache.save(self.session.cookies, token)
+
+    def reauthenticate(self):
+        """Sign in again when the restored session has expired."""
+        self.session_restored = False
+        self.current_user = None
+        self.session.cookies.clear()
+        self.session.headers.pop("X-CSRF-Token", None)
+        token = self.authenticate()
+        self.session.headers.update({"X-CSRF-Token": token})
+        self.token = token
+        self.save_session(token)
+
     def logout(self):
-        """Logout."""
-        if self.authenticated and not self.token_authenticated:
+        """Logout.
+
+        When the sessions are saved between module runs, the method does not
+        sign out, so that the next module can reuse the session.
+        """
+        if self.authenticated and self.session_cache is not None:
+            self.save_session(self.token)
+        elif self.authenticated and not self.token_authenticated:
             url = self.build_url("signout")
             try:
                 self.make_json_request("POST", url)
@@ -210,14 +541,99 @@ class APIModule(AnsibleModule):
         self.authenticated = False
         self.create_session()
 
+    def close_connections(self):
+        """Close the persistent connections and log the pool statistics."""
+        pool = getattr(self, "pool", None)
+        if pool is None:
+            return
+        stats = pool.get_stats()
+        self.debug(
+            (
+                "Connection pool: {requests} requests, {hits} reused connections,"
+                " {misses} new connections, {discarded} discarded connections"
+            ).format(**stats)
+        )
+        pool.close()
+        self.debug(
+            "Current user lookups: {hits} served without an API call".format(
+                hits=self.who_am_i_hits
+            )
+        )
+        self.debug("API request retries: {retries}".format(retries=self.retry_policy.retries))
+        self.debug(
+            "DNS resolutions: {hits} served from the cache, {misses} DNS lookups".format(
+                **self.resolver.get_stats()
+            )
+        )
+        self.debug(
+            "Rate limiter: {waits} delayed requests, {wait_time:.2f}s total delay".format(
+                waits=self.rate_limiter.waits, wait_time=self.rate_limiter.wait_time
+            )
+        )
+        self.debug(
+            "Account lookups: {hits} served from the cache, {misses} API lookups".format(
+                hits=self.account_cache_hits, misses=self.account_cache_misses
+            )
+        )
+        resolver = getattr(self, "digest_resolver", None)
+        if resolver is not None:
+            self.debug(
+                (
+                    "Tag digests: {hits} served from the cache, {resolved} resolved with"
+                    " the registry API, {failures} not resolved"
+                ).format(**resolver.get_stats())
+            )
+
+    def get_debug_stats(self):
+        """Return the statistics about the API requests and the caches.
+
+        :return: The statistics, or ``None`` if the `quay_debug_stats'
+                 parameter is not set.
+        :rtype: dict or None
+        """
+        if not self.params.get("quay_debug_stats") or getattr(self, "pool", None) is None:
+            return None
+        stats = self.request_stats.get_summary()
+        stats["connection_pool"] = self.pool.get_stats()
+        stats["retries"] = self.retry_policy.retries
+        stats["dns"] = self.resolver.get_stats()
+        stats["rate_limiter"] = {
+            "waits": self.rate_limiter.waits,
+            "wait_time": round(self.rate_limiter.wait_time, 4),
+        }
+        stats["who_am_i_hits"] = self.who_am_i_hits
+        stats["account_cache"] = {
+            "hits": self.account_cache_hits,
+            "misses": self.account_cache_misses,
+        }
+        resolver = getattr(self, "digest_resolver", None)
+        if resolver is not None:
+            stats["digest_resolver"] = resolver.get_stats()
+        cache = getattr(self, "cache", None)
+        if cache is not None:
+            stats["response_cache"] = {
+                "hits": cache.hits,
+                "misses": cache.misses,
+                "revalidated": cache.revalidated,
+            }
+        return stats
+
     def fail_json(self, **kwargs):
         """Logout and then exit with an error."""
         self.logout()
+        self.close_connections()
+        stats = self.get_debug_stats()
+        if stats is not None:
+            kwargs["quay_stats"] = stats
         super(APIModule, self).fail_json(**kwargs)
 
     def exit_json(self, **kwargs):
         """Logout and then exit the module."""
         self.logout()
+        self.close_connections()
+        stats = self.get_debug_stats()
+        if stats is not None:
+            kwargs["quay_stats"] = stats
         super(APIModule, self).exit_json(**kwargs)
 
     def build_url(self, endpoint, query_params=None):
@@ -256,7 +672,8 @@ class APIModule(AnsibleModule):
                                when returned by the API. 404 by default.
         :type ok_error_codes: list
         :param kwargs: Additional parameter to pass to the API (headers, data
-                       for PUT and POST requests, ...)
+                       for PUT and POST requests, endpoint template for the
+                       request statistics, ...)
 
         :raises APIModuleError: The API request failed.
 
@@ -280,23 +697,22 @@ class APIModule(AnsibleModule):
         follow_redirects = kwargs.get("follow_redirects")
 
         try:
-            if follow_redirects is not None:
-                response = self.session.open(
-                    method,
-                    url.geturl(),
-                    headers=headers,
-                    data=data,
-                    follow_redirects=follow_redirects,
-                )
-            else:
-                response = self.session.open(method, url.geturl(), headers=headers, data=data)
+            response = self.send_request(
+                method,
+                url,
+                headers=headers,
+                data=data,
+                follow_redirects=follow_redirects,
+                ok_error_codes=ok_error_codes,
+                endpoint=kwargs.get("endpoint"),
+            )
         except SSLValidationError as ssl_err:
             raise APIModuleError(
                 "Could not establish a secure connection to {host}: {error}.".format(
                     host=url.netloc, error=ssl_err
                 )
             )
-        except ConnectionError as con_err:
+        except (ConnectionError, HttpApiConnectionError) as con_err:
             raise APIModuleError(
                 "Network error when trying to connect to {host}: {error}.".format(
                     host=url.netloc, error=con_err
@@ -305,52 +721,17 @@ class APIModule(AnsibleModule):
         except HTTPError as he:
             if he.code in ok_error_codes:
                 response = he
-            # Sanity check: Did the server send back some kind of internal error?
-            elif he.code >= 500:
-                raise APIModuleError(
-                    (
-                        "The host sent back a server error: {path}: {error}."
-                        " Please check the logs and try again later."
-                    ).format(path=url.path, error=he)
-                )
-            # Sanity check: Did we fail to authenticate properly?
-            # If so, fail out now; this is always a failure.
-            elif he.code == 401:
-                raise APIModuleError(
-                    "Authentication required for {path} (HTTP 401).".format(path=url.path)
-                )
-            # Sanity check: Did we get a forbidden response, which means that
-            # the user isn't allowed to do this? Report that.
-            elif he.code == 403:
-                raise APIModuleError(
-                    "You do not have permission to {method} {path} (HTTP 403).".format(
-                        method=method, path=url.path
-                    )
-                )
-            # Sanity check: Did we get a 404 response?
-            # Requests with primary keys will return a 404 if there is no
-            # response, and we want to consistently trap these.
-            elif he.code == 405:
-                raise APIModuleError(
-                    "Cannot make a {method} request to this endpoint {path}.".format(
-                        method=method, path=url.path
-                    )
-                )
-            # Sanity check: Did we get some other kind of error?  If so, write
-            # an appropriate error message.
-            elif he.code >= 400:
-                # We are going to return a 400 so the module can decide what to
-                # do with it.
-                response = he
-            elif he.code == 204 and method == "DELETE":
-                # A 204 is a normal response for a delete function
-                response = he
+            # The session restored from a previous module run has expired
+            elif he.code == 401 and self.session_restored:
+                self.reauthenticate()
+                return self.make_raw_request(method, url, ok_error_codes, **kwargs)
             else:
-                raise APIModuleError(
-                    "Unexpected return code when calling {url}: {error}".format(
-                        url=url.geturl(), error=he
-                    )
-                )
+                error_msg = self.get_http_error_message(method, url, he)
+                if error_msg:
+                    raise APIModuleError(error_msg)
+                # We are going to return the error so the module can decide
+                # what to do with it.
+                response = he
         except Exception as e:
             raise APIModuleError(
                 (
@@ -360,7 +741,7 @@ class APIModule(AnsibleModule):
             )
 
         try:
-            response_body = response.read()
+            response_body = read_body(response)
             # Convert the list of tuples to a dictionary
             response_headers = {}
             for r in response.getheaders():
@@ -378,7 +759,285 @@ class APIModule(AnsibleModule):
             "headers": response_headers,
         }
 
-    def make_json_request(self, method, url, ok_error_codes=None, **kwargs):
+    def get_http_error_message(self, method, url, error):
+        """Return the error message for an HTTP error that the module cannot process.
+
+        :param method: GET, PUT, POST, or DELETE
+        :type method: str
+        :param url: URL to the API endpoint
+        :type url: :py:class:``urllib.parse.ParseResult``
+        :param error: The HTTP error returned by the server.
+        :type error: :py:class:``urllib.error.HTTPError``
+
+        :return: The error message, or ``None`` if the response must be
+                 returned to the caller, which decides what to do with it.
+        :rtype: str or None
+        """
+        # Sanity check: Did the server send back some kind of internal error?
+        if error.code >= 500:
+            return (
+                "The host sent back a server error: {path}: {error}."
+                " Please check the logs and try again later."
+            ).format(path=url.path, error=error)
+        # Sanity check: Did we fail to authenticate properly?
+        # If so, fail out now; this is always a failure.
+        if error.code == 401:
+            return "Authentication required for {path} (HTTP 401).".format(path=url.path)
+        # Sanity check: Did we get a forbidden response, which means that
+        # the user isn't allowed to do this? Report that.
+        if error.code == 403:
+            return "You do not have permission to {method} {path} (HTTP 403).".format(
+                method=method, path=url.path
+            )
+        # Sanity check: Did we get a 404 response?
+        # Requests with primary keys will return a 404 if there is no
+        # response, and we want to consistently trap these.
+        if error.code == 405:
+            return "Cannot make a {method} request to this endpoint {path}.".format(
+                method=method, path=url.path
+            )
+        # Sanity check: Did we get some other kind of error?
+        if error.code >= 400:
+            return None
+        # A 204 is a normal response for a delete function
+        if error.code == 204 and method == "DELETE":
+            return None
+        return "Unexpected return code when calling {url}: {error}".format(
+            url=url.geturl(), error=error
+        )
+
+    def send_request(
+        self,
+        method,
+        url,
+        headers=None,
+        data=None,
+        follow_redirects=None,
+        ok_error_codes=None,
+        endpoint=None,
+    ):
+        """Send the request, and send it again after temporary errors.
+
+        The request waits first if the rate limit
+        (:py:attr:``self.rate_limiter``) is reached.
+
+        The :py:class:``retry_policy.RetryPolicy`` object in
+        :py:attr:``self.retry_policy`` decides whether the request can be
+        retried, and how long to wait before the next attempt.
+
+        :param method: GET, PUT, POST, or DELETE
+        :type method: str
+        :param url: URL to the API endpoint
+        :type url: :py:class:``urllib.parse.ParseResult``
+        :param headers: Additional headers for the request.
+        :type headers: dict
+        :param data: Data for PUT and POST requests.
+        :type data: str
+        :param follow_redirects: Redirection policy. ``None`` to use the
+                                 persistent connections, when possible.
+        :type follow_redirects: str
+        :param ok_error_codes: HTTP error codes that the caller processes.
+                               Those codes are never retried.
+        :type ok_error_codes: list
+        :param endpoint: The endpoint template, such as
+                         ``repository/{full_repo_name}``, for the request
+                         statistics.
+        :type endpoint: str
+
+        :raises HTTPError: The server returned an HTTP error.
+
+        :return: The response from the server.
+        :rtype: :py:class:``http.client.HTTPResponse``
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self.rate_limiter.acquire()
+            start = time.time()
+            try:
+                if self.connection is not None:
+                    response = self.make_connection_request(
+                        method, url, headers=headers, data=data
+                    )
+                elif follow_redirects is None and self.pool.can_handle(url):
+                    response = self.make_pooled_request(
+                        method, url, headers=headers, data=data
+                    )
+                elif follow_redirects is not None:
+                    response = self.session.open(
+                        method,
+                        url.geturl(),
+                        headers=headers,
+                        data=data,
+                        follow_redirects=follow_redirects,
+                    )
+                else:
+                    response = self.session.open(
+                        method, url.geturl(), headers=headers, data=data
+                    )
+                # Read the body now so that the statistics give the size of
+                # the data that the module processes
+                if not isinstance(response, PoolResponse):
+                    response = read_response(response)
+                self.record_request(method, url, endpoint, response, start)
+                return response
+            except SSLValidationError:
+                self.record_request(method, url, endpoint, None, start)
+                raise
+            except Exception as e:
+                if isinstance(e, HTTPError) and not isinstance(e.fp, PoolResponse):
+                    try:
+                        body = read_response(e)
+                    except Exception:
+                        pass
+                    else:
+                        e = HTTPError(url.geturl(), e.code, e.reason, body.headers, body)
+                self.record_request(
+                    method, url, endpoint, e if isinstance(e, HTTPError) else None, start
+                )
+                if isinstance(e, HTTPError) and ok_error_codes and e.code in ok_error_codes:
+                    raise e
+                if not self.retry_policy.should_retry(method, attempt, e):
+                    raise e
+                self.debug(
+                    "Retrying {method} {path} after error: {error}".format(
+                        method=method, path=url.path, error=e
+                    )
+                )
+
+    def record_request(self, method, url, endpoint, response, start):
+        """Record the request in the statistics.
+
+        :param method: GET, PUT, POST, or DELETE
+        :type method: str
+        :param url: URL to the API endpoint
+        :type url: :py:class:``urllib.parse.ParseResult``
+        :param endpoint: The endpoint template, or ``None`` to use the path
+                         from the URL.
+        :type endpoint: str
+        :param response: The response from the server, or ``None`` if the
+                         request failed without response. The body must
+                         have been read, so that its size is known.
+        :type response: :py:class:``connection_pool.PoolResponse`` or
+                        :py:class:``urllib.error.HTTPError``
+        :param start: Time when the request has been sent.
+        :type start: float
+        """
+        duration = time.time() - start
+        if endpoint is None:
+            endpoint = url.path
+            if endpoint.startswith("/api/v1/"):
+                endpoint = endpoint[len("/api/v1/") :]
+        if response is None:
+            status = 0
+            size = 0
+        else:
+            status = getattr(response, "status", None) or getattr(response, "code", 0)
+            # For HTTP errors, the body is in the fp attribute
+            size = getattr(getattr(response, "fp", response), "size", 0)
+        self.request_stats.record(method, endpoint.lstrip("/"), status, size, duration)
+
+    def make_pooled_request(self, method, url, headers=None, data=None):
+        """Send the request through a persistent connection from the pool.
+
+        The method merges the session headers and cookies with the request,
+        and then raises :py:class:``urllib.error.HTTPError`` for HTTP errors,
+        the same way :py:class:``ansible.module_utils.urls.Request`` does.
+        Redirections for GET and HEAD requests are delegated to the session
+        object.
+
+        :param method: GET, PUT, POST, or DELETE
+        :type method: str
+        :param url: URL to the API endpoint
+        :type url: :py:class:``urllib.parse.ParseResult``
+        :param headers: Additional headers for the request.
+        :type headers: dict
+        :param data: Data for PUT and POST requests.
+        :type data: str
+
+        :raises HTTPError: The server returned an HTTP error.
+
+        :return: The response from the server.
+        :rtype: :py:class:``connection_pool.PoolResponse``
+        """
+        request_headers = dict(self.session.headers)
+        if headers:
+            request_headers.update(headers)
+        request_headers.setdefault("User-Agent", self.session.http_agent or "ansible-httpget")
+
+        # The urllib Request object is only used to add and collect cookies
+        request = URLRequest(url.geturl(), headers=request_headers)
+        self.session.cookies.add_cookie_header(request)
+        response = self.pool.urlopen(
+            method,
+            url,
+            body=to_bytes(data) if data is not None else None,
+            headers=dict(request.header_items()),
+        )
+        self.session.cookies.extract_cookies(response, request)
+
+        if (
+            300 <= response.status < 400
+            and response.status != 304
+            and method in ("GET", "HEAD")
+        ):
+            return self.session.open(method, url.geturl(), headers=headers, data=data)
+        if response.status >= 300:
+            raise HTTPError(
+                url.geturl(), response.status, response.reason, response.headers, response
+            )
+        return response
+
+    def make_connection_request(self, method, url, headers=None, data=None):
+        """Send the request through the persistent connection.
+
+        The ``herve4m.quay.quay`` httpapi plugin adds the authentication
+        headers and the session cookies, and follows the redirections.
+
+        :param method: GET, PUT, POST, or DELETE
+        :type method: str
+        :param url: URL to the API endpoint
+        :type url: :py:class:``urllib.parse.ParseResult``
+        :param headers: Additional headers for the request.
+        :type headers: dict
+        :param data: Data for PUT and POST requests.
+        :type data: str
+
+        :raises HTTPError: The server returned an HTTP error.
+        :raises ansible.module_utils.connection.ConnectionError: The
+            persistent connection failed.
+
+        :return: The response from the server.
+        :rtype: :py:class:``connection_pool.PoolResponse``
+        """
+        # The plugin sends the authentication headers, and the response body
+        # is decompressed by the connection
+        request_headers = dict(
+            (k, v)
+            for k, v in self.session.headers.items()
+            if k.lower() not in ("accept-encoding", "authorization", "x-csrf-token")
+        )
+        if headers:
+            request_headers.update(headers)
+        path = url.path
+        if url.query:
+            path = "{path}?{query}".format(path=path, query=url.query)
+        result = self.connection.send_request(method, path, data, request_headers)
+
+        msg = http_client.HTTPMessage()
+        for name, value in result["headers"]:
+            msg[name] = value
+        response = PoolResponse(
+            ResponseHead(result["status"], result["reason"], msg),
+            to_bytes(result["body"], errors="surrogate_or_strict"),
+        )
+        if response.status >= 300:
+            raise HTTPError(
+                url.geturl(), response.status, response.reason, response.headers, response
+            )
+        return response
+
+    def make_json_request(self, method, url, ok_error_codes=None, validators=None, **kwargs):
         """Perform an API call and return the retrieved JSON data.
 
         :param method: GET, PUT, POST, or DELETE
@@ -388,6 +1047,11 @@ class APIModule(AnsibleModule):
         :param ok_error_codes: HTTP error codes that are acceptable (not errors)
                                when returned by the API. 404 by default.
         :type ok_error_codes: list
+        :param validators: ``If-None-Match`` and ``If-Modified-Since`` headers
+                           for a conditional request. When the data has not
+                           changed, the returned status code is ``304`` and
+                           the returned data is empty.
+        :type validators: dict
         :param kwargs: Additional parameter to pass to the API (data
                        for PUT and POST requests, ...)
 
@@ -399,6 +1063,13 @@ class APIModule(AnsibleModule):
                  (dictionary)
         :rtype: dict
         """
+        if validators:
+            if ok_error_codes is None:
+                ok_error_codes = [404]
+            ok_error_codes = ok_error_codes + [304]
+            headers = dict(kwargs.get("headers") or {})
+            headers.update(validators)
+            kwargs["headers"] = headers
         response = self.make_raw_request(method, url, ok_error_codes, **kwargs)
         response_body = response.get("body")
         response_json = {}
@@ -506,18 +1177,40 @@ class APIModule(AnsibleModule):
         """
         if ok_error_codes is None:
             ok_error_codes = [404]
+        template = endpoint
         for k in kwargs:
             endpoint = endpoint.replace("{" + k + "}", kwargs[k])
 
         url = self.build_url(endpoint, query_params=query_params)
+
+        # Try the persistent cache first
+        stale = None
+        if self.cache is not None:
+            response_json = self.cache.get(endpoint, url)
+            if response_json is not None:
+                return self.add_attribute_aliases(response_json)
+            # Stored response that the server must confirm (conditional GET)
+            stale = self.cache.get_stale(endpoint, url)
+
         try:
-            response = self.make_json_request("GET", url, ok_error_codes=ok_error_codes)
+            response = self.make_json_request(
+                "GET",
+                url,
+                ok_error_codes=ok_error_codes,
+                validators=stale[1] if stale else None,
+                endpoint=template,
+            )
         except APIModuleError as e:
             if exit_on_error:
                 self.fail_json(msg=str(e))
             else:
                 raise
 
+        # The stored response is still valid
+        if stale and response["status_code"] == 304:
+            self.cache.refresh(url)
+            return self.add_attribute_aliases(stale[0])
+
         if response["status_code"] in ok_error_codes:
             return None
 
@@ -539,16 +1232,48 @@ class APIModule(AnsibleModule):
             else:
                 raise APIModuleError(fail_msg)
 
-        # Duplicate all attributes that have underscores (`_') in their name
-        # with the same name but without the underscores. Some PUT data use
-        # the attribute names without underscores.
+        if self.cache is not None:
+            self.cache.set(endpoint, url, response["json"], response["headers"])
+        return self.add_attribute_aliases(response["json"])
+
+    def add_attribute_aliases(self, response_json):
+        """Duplicate the attributes that have underscores in their name.
+
+        Duplicate all attributes that have underscores (`_') in their name
+        with the same name but without the underscores. Some PUT data use
+        the attribute names without underscores.
+
+        :param response_json: The data returned by the API.
+        :type response_json: dict
+
+        :return: The updated data.
+        :rtype: dict
+        """
         try:
-            for k in response["json"].copy().keys():
+            for k in response_json.copy().keys():
                 if "_" in k:
-                    response["json"][k.replace("_", "")] = response["json"][k]
+                    response_json[k.replace("_", "")] = response_json[k]
         except AttributeError:
             pass
-        return response["json"]
+        return response_json
+
+    def invalidate_cache(self, endpoint):
+        """Remove the cached responses that a modification makes obsolete.
+
+        The method removes the response for the given endpoint and for its
+        parent endpoint. For example, deleting a manifest label
+        (``.../manifest/{digest}/labels/{id}``) invalidates the list of labels
+        (``.../manifest/{digest}/labels``).
+
+        :param endpoint: API endpoint path, with the path parameters already
+                         substituted.
+        :type endpoint: str
+        """
+        if self.cache is None:
+            return
+        endpoint = endpoint.strip("/")
+        for path in (endpoint, endpoint.rsplit("/", 1)[0]):
+            self.cache.invalidate(path, self.build_url(path))
 
     def delete(
         self,
@@ -606,12 +1331,14 @@ class APIModule(AnsibleModule):
                 self.exit_json(changed=True)
             return True
 
+        template = endpoint
         for k in kwargs:
             endpoint = endpoint.replace("{" + k + "}", kwargs[k])
 
+        self.invalidate_cache(endpoint)
         url = self.build_url(endpoint)
         try:
-            response = self.make_json_request("DELETE", url)
+            response = self.make_json_request("DELETE", url, endpoint=template)
         except APIModuleError as e:
             if exit_on_error:
                 self.fail_json(msg=str(e))
@@ -701,13 +1428,15 @@ class APIModule(AnsibleModule):
                 self.exit_json(changed=True)
             return {}
 
+        template = endpoint
         for k in kwargs:
             endpoint = endpoint.replace("{" + k + "}", kwargs[k])
 
+        self.invalidate_cache(endpoint)
         url = self.build_url(endpoint)
         try:
             response = self.make_json_request(
-                "POST", url, ok_error_codes=ok_error_codes, data=new_item
+                "POST", url, ok_error_codes=ok_error_codes, data=new_item, endpoint=template
             )
         except APIModuleError as e:
             if exit_on_error:
@@ -774,12 +1503,14 @@ class APIModule(AnsibleModule):
         if self.check_mode:
             return {}
 
+        template = endpoint
         for k in kwargs:
             endpoint = endpoint.replace("{" + k + "}", kwargs[k])
 
+        self.invalidate_cache(endpoint)
         url = self.build_url(endpoint)
         try:
-            response = self.make_json_request("PUT", url, data=new_item)
+            response = self.make_json_request("PUT", url, data=new_item, endpoint=template)
         except APIModuleError as e:
             if exit_on_error:
                 self.fail_json(msg=str(e))
@@ -927,6 +1658,9 @@ class APIModule(AnsibleModule):
         If the `quay_token' parameter has not been provided, then all the
         API calls are anonymous and the method returns ``None``.
 
+        The method retrieves the user details only once and then returns the
+        name from :py:attr:``self.current_user``.
+
         :param exit_on_error: If ``True`` (the default), exit the module on API
                               error. Otherwise, raise the
                               :py:class:``APIModuleError`` exception.
@@ -938,18 +1672,33 @@ class APIModule(AnsibleModule):
         """
         if not self.authenticated:
             return None
-        user = self.get_object_path("user/", exit_on_error=exit_on_error)
-        return user.get("username")
+        with self.who_am_i_lock:
+            if self.current_user is not None:
+                self.who_am_i_hits += 1
+            else:
+                user = self.get_object_path("user/", exit_on_error=exit_on_error)
+                if not user:
+                    return None
+                self.current_user = user
+        return self.current_user.get("username")
 
-    def get_account(self, account_name, exit_on_error=True):
+    def get_account(self, account_name, exit_on_error=True, check_user_robots=True):
         """Search for the given user account (user or robot).
 
+        The method looks up each account only once and then returns the
+        result from :py:attr:``self.cache_account``, including for the
+        accounts that do not exist.
+
         :param account_name: The account name to look for.
         :type account_name: str
         :param exit_on_error: If ``True`` (the default), exit the module on API
                               error. Otherwise, raise the
                               :py:class:``APIModuleError`` exception.
         :type exit_on_error: bool
+        :param check_user_robots: Whether to look for a robot account of the
+                                  current user when the name has no
+                                  ``<namespace>+`` prefix.
+        :type check_user_robots: bool
 
         :return: The user description or None if the user account cannot be
                  found. The returned dictionary includes the ``is_robot`` key
@@ -957,6 +1706,127 @@ class APIModule(AnsibleModule):
                  or a user account (``False``).
         :rtype: dict or None
         """
+        with self.account_lock:
+            if account_name in self.cache_account:
+                self.account_cache_hits += 1
+                return self.cache_account[account_name]
+            self.account_cache_misses += 1
+        account = self.lookup_account(
+            account_name, exit_on_error=exit_on_error, check_user_robots=check_user_robots
+        )
+        with self.account_lock:
+            self.cache_account[account_name] = account
+        return account
+
+    def get_accounts(self, account_names, exit_on_error=True):
+        """Search for several user accounts (users or robots).
+
+        The method removes the duplicate names and looks up the accounts in
+        parallel when the module can send parallel requests.
+
+        :param account_names: The account names to look for.
+        :type account_names: list
+        :param exit_on_error: If ``True`` (the default), exit the module on API
+                              error. Otherwise, raise the
+                              :py:class:``APIModuleError`` exception.
+        :type exit_on_error: bool
+
+        :return: A dictionary with the account names as keys and the values
+                 returned by :py:meth:``get_account`` as values (``None`` for
+                 the accounts that do not exist).
+        :rtype: dict
+        """
+        names = []
+        for name in account_names:
+            if name not in names:
+                names.append(name)
+
+        # A name without the `<namespace>+' prefix can be a robot account of
+        # the current user. Instead of looking for each name, retrieve all the
+        # robot accounts of the current user at once.
+        #
+        # GET /api/v1/user/robots/
+        # {
+        #   "robots": [
+        #     {
+        #       "name": "admin+robot1",
+        #       "created": "Tue, 23 Jan 2024 09:34:05 -0000",
+        #       "last_accessed": null,
+        #       "description": "",
+        #       "unstructured_metadata": {}
+        #     }
+        #   ]
+        # }
+        with self.account_lock:
+            bare_names = [n for n in names if "+" not in n and n not in self.cache_account]
+        check_user_robots = True
+        if self.authenticated and len(bare_names) > 1:
+            user_robots = self.get_object_path(
+                "user/robots/", ok_error_codes=[400, 404], exit_on_error=exit_on_error
+            )
+            if isinstance(user_robots, dict) and "robots" in user_robots:
+                check_user_robots = False
+                robots = {}
+                for robot in user_robots["robots"]:
+                    shortname = robot.get("name", "").split("+", 1)[-1]
+                    if shortname in bare_names:
+                        robots[shortname] = dict(robot, is_organization=False, is_robot=True)
+                self.cache_accounts(robots)
+
+        def get_account(name):
+            try:
+                return (
+                    self.get_account(
+                        name, exit_on_error=False, check_user_robots=check_user_robots
+                    ),
+                    None,
+                )
+            except APIModuleError as e:
+                return (None, e)
+
+        accounts = {}
+        for name, (account, error) in zip(names, self.map_parallel(get_account, names)):
+            if error is not None:
+                if exit_on_error:
+                    self.fail_json(msg=str(error))
+                raise error
+            accounts[name] = account
+        return accounts
+
+    def cache_accounts(self, accounts):
+        """Store account details that the caller has retrieved by other means.
+
+        :py:meth:``get_account`` then returns those details without looking up
+        the accounts.
+
+        :param accounts: Dictionary with the account names as keys and the
+                         account details as values. The details must include
+                         the ``is_robot`` key.
+        :type accounts: dict
+        """
+        with self.account_lock:
+            self.cache_account.update(accounts)
+
+    def lookup_account(self, account_name, exit_on_error=True, check_user_robots=True):
+        """Search for the given user account by using the API.
+
+        Use :py:meth:``get_account`` instead, which caches the results.
+
+        :param account_name: The account name to look for.
+        :type account_name: str
+        :param exit_on_error: If ``True`` (the default), exit the module on API
+                              error. Otherwise, raise the
+                              :py:class:``APIModuleError`` exception.
+        :type exit_on_error: bool
+        :param check_user_robots: Whether to look for a robot account of the
+                                  current user when the name has no
+                                  ``<namespace>+`` prefix.
+        :type check_user_robots: bool
+
+        :return: The user description or None if the user account cannot be
+                 found.
+        :rtype: dict or None
+        """
         # Robot account
         try:
             namespace, robot_shortname = account_name.split("+", 1)
@@ -992,7 +1862,7 @@ class APIModule(AnsibleModule):
 
         # Robot account for the current user (no prefix `<namespace>+' in the
         # given name)
-        if self.authenticated:
+        if self.authenticated and check_user_robots:
             robot = self.get_object_path(
                 "user/robots/{robot_shortname}",
                 ok_error_codes=[400, 404],
@@ -1214,9 +2084,73 @@ class APIModule(AnsibleModule):
             return user_details
         return None
 
-    def get_tags(self, namespace, repository, tag=None, digest=None, only_active_tags=True):
+    def map_parallel(self, function, items):
+        """Call the function for each item and return the results in order.
+
+        When the module can send parallel requests (``quay_parallel_requests``
+        parameter greater than 1), the calls run in a pool of threads.
+        The function must not exit the module. Use the ``exit_on_error=False``
+        and ``auto_exit=False`` parameters of the API methods, and catch the
+        :py:class:``APIModuleError`` exceptions, so that the errors are
+        processed in the main thread.
+
+        :param function: The function to call. The function receives the item
+                         as its only parameter.
+        :type function: function
+        :param items: The items to process.
+        :type items: list
+
+        :return: The list of the values returned by the function, in the same
+                 order as the items.
+        :rtype: list
+        """
+        items = list(items)
+        # Nested calls from a worker thread run sequentially, so that the
+        # number of parallel requests stays within `quay_parallel_requests'
+        if self.max_workers == 1 or len(items) < 2 or getattr(self.worker, "active", False):
+            return [function(item) for item in items]
+
+        def run(item):
+            self.worker.active = True
+            try:
+                return function(item)
+            finally:
+                self.worker.active = False
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(items)))
+        try:
+            return list(executor.map(run, items))
+        finally:
+            executor.shutdown(wait=True)
+
+    def get_tags(
+        self,
+        namespace,
+        repository,
+        tag=None,
+        digest=None,
+        only_active_tags=True,
+        names_only=False,
+        name_regex=None,
+        newer_than=None,
+        older_than=None,
+        limit=None,
+    ):
         """Return the list of tags for the given repository.
 
+        When only the names of all the active tags are needed
+        (``names_only``), the method lists the tags with the registry API,
+        which returns the names without the tag details and with larger pages.
+        See :py:meth:``iter_tag_names``. The registry API returns the names in
+        lexical order, without the tag dates. Therefore, the method uses the
+        Quay API, which lists the most recent tags first, when ``limit``,
+        ``newer_than``, or ``older_than`` is set.
+
+        The filters (``name_regex``, ``newer_than``, and ``older_than``) are
+        applied while the pages are retrieved (see :py:meth:``iter_tags``).
+        When ``limit`` is set, the method stops retrieving pages as soon as it
+        has enough tags.
+
         :param namespace: The name of the repository's namespace.
         :type namespace: str
         :param repository: The name of the repository.
@@ -1232,9 +2166,25 @@ class APIModule(AnsibleModule):
         :param only_active_tags: If ``True`` (the default), then only return
                                  active tags.
         :type only_active_tags: bool
+        :param names_only: If ``True``, then return the tag names instead of
+                           the tag dictionaries.
+        :type names_only: bool
+        :param name_regex: Only return the tags which names match that
+                           compiled regular expression.
+        :type name_regex: :py:class:``re.Pattern``
+        :param newer_than: Only return the tags created or moved after that
+                           Unix timestamp.
+        :type newer_than: int
+        :param older_than: Only return the tags created or moved before that
+                           Unix timestamp.
+        :type older_than: int
+        :param limit: Maximum number of tags to return. By default, the method
+                      returns all the tags.
+        :type limit: int
 
         :return: The list of tags or an empty list if no tag has been retrieved.
-                 Each item in the list is the dictionary retrieved from the API.
+                 Each item in the list is the dictionary retrieved from the API,
+                 or the tag name if ``names_only`` is ``True``.
                  For example::
 
                     [
@@ -1269,6 +2219,173 @@ class APIModule(AnsibleModule):
                         }
                     ]
         """
+        if (
+            names_only
+            and not tag
+            and not digest
+            and only_active_tags
+            and newer_than is None
+            and older_than is None
+            and not limit
+        ):
+            # The registry API does not return the tag dates, and does not
+            # list the most recent tags first
+            tags = self.iter_tag_names(namespace, repository)
+            if name_regex:
+                tags = (name for name in tags if name_regex.search(name))
+        else:
+            tags = self.iter_tags(
+                namespace,
+                repository,
+                tag,
+                digest,
+                only_active_tags,
+                name_regex,
+                newer_than,
+                older_than,
+            )
+            if names_only:
+                tags = (t["name"] for t in tags if "name" in t)
+        if limit:
+            # Stopping the iteration also stops the pagination
+            tags = itertools.islice(tags, limit)
+        return list(tags)
+
+    def iter_tag_names(self, namespace, repository):
+        """Return a generator that yields the names of the active tags.
+
+        The method uses the registry API (``/v2/``), which returns up to
+        :py:data:``REGISTRY_TAG_PAGE_SIZE`` names per page, and follows the
+        ``Link`` response header to the next pages. The names are in the
+        order that the registry returns them, usually in lexical order.
+
+        If the registry API does not return the first page, then the method
+        uses the Quay API tag listing instead (:py:meth:``iter_tags``).
+
+        :param namespace: The name of the repository's namespace.
+        :type namespace: str
+        :param repository: The name of the repository.
+        :type repository: str
+
+        :return: A generator. Each item is a tag name.
+        :rtype: generator
+        """
+        # Get the tag names
+        #
+        # GET /v2/{namespace}/{repository}/tags/list?n=1000
+        # Link: </v2/{namespace}/{repository}/tags/list?n=1000&last=v0.5.0>; rel="next"
+        # {
+        #   "name": "production/smallimage",
+        #   "tags": ["latest", "v0.4.0", "v0.4.1", "v0.5.0"]
+        # }
+        full_repo_name = "{namespace}/{repository}".format(
+            namespace=namespace, repository=repository
+        )
+        token = None
+        if self.digest_resolver.enabled:
+            token = self.digest_resolver.get_token(full_repo_name)
+        url = self.host_url._replace(
+            path="/v2/{name}/tags/list".format(name=full_repo_name),
+            query=urlencode({"n": REGISTRY_TAG_PAGE_SIZE}),
+        )
+        headers = {
+            "Accept": "application/json",
+            "Authorization": "Bearer {token}".format(token=token),
+        }
+        first_page = True
+        while token:
+            try:
+                response = self.make_json_request(
+                    "GET",
+                    url,
+                    ok_error_codes=[401, 403, 404],
+                    headers=headers,
+                    endpoint="v2/{namespace}/{repository}/tags/list",
+                )
+            except APIModuleError as e:
+                if not first_page:
+                    self.fail_json(msg=str(e))
+                response = None
+            if response is None or response["status_code"] != 200:
+                if not first_page:
+                    self.fail_json(
+                        msg="Cannot retrieve the tags of {name}: {code}.".format(
+                            name=full_repo_name, code=response["status_code"]
+                        )
+                    )
+                # The registry API cannot list the tags
+                break
+            first_page = False
+            for name in response["json"].get("tags") or []:
+                yield name
+
+            # Link: </v2/.../tags/list?n=1000&last=v0.4.0>; rel="next"
+            headers_lower = dict((k.lower(), v) for k, v in response["headers"].items())
+            match = re.search(r'<([^>]+)>\s*;\s*rel="?next"?', headers_lower.get("link", ""))
+            if not match:
+                return
+            next_url = urlparse(match.group(1))
+            url = self.host_url._replace(path=next_url.path, query=next_url.query)
+
+        if first_page:
+            for t in self.iter_tags(namespace, repository):
+                if "name" in t:
+                    yield t["name"]
+
+    def iter_tags(
+        self,
+        namespace,
+        repository,
+        tag=None,
+        digest=None,
+        only_active_tags=True,
+        name_regex=None,
+        newer_than=None,
+        older_than=None,
+    ):
+        """Return a generator that yields the tags for the given repository.
+
+        The method retrieves the pages of the tag listing only when the caller
+        needs more tags. Callers that only need the first matching tag can stop
+        the iteration, which saves the API calls for the remaining pages. For
+        example::
+
+            tag_details = next(module.iter_tags("production", "smallimage", "latest"), None)
+
+        The API returns the most recent tags first (``start_ts`` attribute).
+        Therefore, when ``newer_than`` is set, the method stops retrieving
+        pages at the first tag that is older than that time.
+
+        :param namespace: The name of the repository's namespace.
+        :type namespace: str
+        :param repository: The name of the repository.
+        :type repository: str
+        :param tag: The tag to retrieve. If ``None`` (the default), then the
+                    :py:attribute:``digest`` is used instead. If that attribute
+                    is also not set, then all the tags for the given repository
+                    are returned.
+        :type tag: str
+        :param digest: The image digest to search for. Only the tags that
+                       reference that digest are returned. Only used if the
+                       :py:attribute:``tag`` attribute is None.
+        :type digest: str
+        :param only_active_tags: If ``True`` (the default), then only return
+                                 active tags.
+        :type only_active_tags: bool
+        :param name_regex: Only yield the tags which names match that compiled
+                           regular expression (:py:meth:``re.Pattern.search``).
+        :type name_regex: :py:class:``re.Pattern``
+        :param newer_than: Only yield the tags which ``start_ts`` attribute is
+                           greater than or equal to that Unix timestamp.
+        :type newer_than: int
+        :param older_than: Only yield the tags which ``start_ts`` attribute is
+                           lower than that Unix timestamp.
+        :type older_than: int
+
+        :return: A generator. Each item is a tag dictionary retrieved from the
+                 API (see :py:meth:``get_tags``).
+        :rtype: generator
+        """
         # Get the tags
         #
         # GET /api/v1/repository/{namespace}/{repository}/tag/?specificTag={tag}
@@ -1326,37 +2443,104 @@ class APIModule(AnsibleModule):
         query_params = {"onlyActiveTags": only_active_tags, "limit": 100}
         if tag:
             query_params["specificTag"] = tag
-        tag_list = []
-        page = 1
-        while True:
-            query_params["page"] = page
+        for tags in self.get_tag_pages(namespace, repository, query_params):
+            for t in tags.get("tags", []):
+                if not tag and digest and t.get("manifest_digest") != digest:
+                    continue
+                if name_regex and not name_regex.search(t.get("name", "")):
+                    continue
+                if newer_than is not None or older_than is not None:
+                    start_ts = t.get("start_ts")
+                    if start_ts is None:
+                        continue
+                    if newer_than is not None and start_ts < newer_than:
+                        # All the remaining tags are older
+                        return
+                    if older_than is not None and start_ts >= older_than:
+                        continue
+                yield t
+
+    def get_tag_pages(self, namespace, repository, query_params):
+        """Return a generator that retrieves the pages of the tag listing.
+
+        When the module can send parallel requests (``quay_parallel_requests``
+        parameter greater than 1), the method speculatively retrieves the next
+        pages while the current page is processed. The pages are still
+        returned in order, and the method stops at the first page that does not
+        have additional pages, discarding the pages that have been retrieved
+        beyond that point.
+
+        :param namespace: The name of the repository's namespace.
+        :type namespace: str
+        :param repository: The name of the repository.
+        :type repository: str
+        :param query_params: The query to append to the URL. The method adds
+                             the ``page`` parameter.
+        :type query_params: dict
 
-            tags = self.get_object_path(
+        :return: A generator. Each item is the dictionary returned by the API
+                 for a page. The dictionary includes the ``tags`` and the
+                 ``has_additional`` keys.
+        :rtype: generator
+        """
+
+        def get_page(page):
+            params = dict(query_params)
+            params["page"] = page
+            return self.get_object_path(
                 "repository/{namespace}/{repository}/tag/",
-                query_params=query_params,
+                query_params=params,
+                exit_on_error=False,
                 namespace=namespace,
                 repository=repository,
             )
-            if tags:
-                if tag or not digest:
-                    tag_list.extend(tags.get("tags", []))
-                else:
-                    tag_list.extend(
-                        [
-                            t
-                            for t in tags.get("tags", [])
-                            if t.get("manifest_digest") == digest
-                        ]
-                    )
-                if tags.get("has_additional", False):
-                    page += 1
-                    continue
-            break
-        return tag_list
+
+        # Do not retrieve pages in advance when only one tag is requested
+        if self.max_workers == 1 or query_params.get("specificTag"):
+            page = 1
+            while True:
+                try:
+                    tags = get_page(page)
+                except APIModuleError as e:
+                    self.fail_json(msg=str(e))
+                if not tags:
+                    return
+                yield tags
+                if not tags.get("has_additional", False):
+                    return
+                page += 1
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {}
+        try:
+            for page in range(1, self.max_workers + 1):
+                futures[page] = executor.submit(get_page, page)
+            next_page = self.max_workers + 1
+            page = 1
+            while True:
+                try:
+                    tags = futures.pop(page).result()
+                except APIModuleError as e:
+                    self.fail_json(msg=str(e))
+                if not tags:
+                    return
+                yield tags
+                if not tags.get("has_additional", False):
+                    return
+                # Keep the same number of requests in flight
+                futures[next_page] = executor.submit(get_page, next_page)
+                next_page += 1
+                page += 1
+        finally:
+            # Pages retrieved beyond the last page are not needed
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown(wait=True)
 
 
 class APIModuleNoAuth(APIModule):
     AUTH_ARGSPEC = dict(
+        CLIENT_ARGSPEC,
         quay_host=dict(fallback=(env_fallback, ["QUAY_HOST"]), default="http://127.0.0.1"),
         validate_certs=dict(
             type="bool",
@@ -0,0 +1,475 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import collections
+import select
+import socket
+import ssl
+import threading
+import zlib
+
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.request import getproxies, proxy_bypass
+from ansible.module_utils.urls import SSLValidationError
+
+
+# Status line and headers of a response, as expected by PoolResponse
+ResponseHead = collections.namedtuple("ResponseHead", ["status", "reason", "msg"])
+
+# Error raised when the server closes the connection without sending a
+# response (Python 3). Python 2 raises BadStatusLine.
+RemoteDisconnected = getattr(http_client, "RemoteDisconnected", http_client.BadStatusLine)
+
+# Methods that can be sent again when the server closes a reused connection
+# before responding
+IDEMPOTENT_METHODS = ["GET", "HEAD", "OPTIONS", "TRACE", "PUT", "DELETE"]
+
+
+def read_body(response, chunk_size=65536):
+    """Read the response body and decompress it if needed.
+
+    The body is decompressed while it is read, by chunks, so that the
+    compressed data is never entirely kept in memory.
+
+    :param response: The response from the server.
+    :type response: :py:class:``http.client.HTTPResponse``
+    :param chunk_size: Number of bytes to read at a time.
+    :type chunk_size: int
+
+    :raises zlib.error: The compressed data is invalid.
+
+    :return: The response body, decompressed according to the
+             ``Content-Encoding`` header (``gzip`` or ``deflate``).
+    :rtype: bytes
+    """
+    headers = getattr(response, "headers", None)
+    encoding = headers.get("Content-Encoding", "") if headers is not None else ""
+    encoding = encoding.strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        decoder = zlib.decompressobj(zlib.MAX_WBITS)
+    else:
+        return response.read()
+
+    chunks = []
+    first = True
+    while True:
+        chunk = response.read(chunk_size)
+        if not chunk:
+            break
+        try:
+            chunks.append(decoder.decompress(chunk))
+        except zlib.error:
+            # Some servers send raw deflate data, without the zlib header
+            if not first or encoding != "deflate":
+                raise
+            decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+            chunks.append(decoder.decompress(chunk))
+        first = False
+    chunks.append(decoder.flush())
+    return b"".join(chunks)
+
+
+def read_response(response):
+    """Read the body of a response that does not come from the pool.
+
+    :param response: The response from the server, or the HTTP error.
+    :type response: :py:class:``http.client.HTTPResponse`` or
+                    :py:class:``urllib.error.HTTPError``
+
+    :raises zlib.error: The compressed data is invalid.
+
+    :return: The response, with its body read and decompressed.
+    :rtype: :py:class:``PoolResponse``
+    """
+    data = read_body(response)
+    headers = response.headers
+    if headers is None:
+        headers = http_client.HTTPMessage()
+    elif "Content-Encoding" in headers:
+        del headers["Content-Encoding"]
+    status = getattr(response, "status", None) or response.code
+    return PoolResponse(ResponseHead(status, response.reason, headers), data)
+
+
+class PoolResponse(object):
+    """HTTP response which body has already been read from the connection.
+
+    The object provides the subset of the
+    :py:class:``http.client.HTTPResponse`` interface that the
+    :py:class:``api_module.APIModule`` class uses, so that the connection can
+    go back to the pool before the caller processes the response.
+
+    The body is already decompressed, and the ``Content-Encoding`` header is
+    removed. The ``size`` attribute gives the size of the decompressed body.
+
+    :param response: The response from the server.
+    :type response: :py:class:``http.client.HTTPResponse``
+    :param body: The data returned by the server.
+    :type body: bytes
+    """
+
+    def __init__(self, response, body):
+        """Initialize the object."""
+        self.status = response.status
+        self.code = response.status
+        self.reason = response.reason
+        self.msg = response.msg
+        self.headers = response.msg
+        self.size = len(body)
+        self._body = body
+
+    def read(self, amt=None):
+        """Return the response body."""
+        if amt is None:
+            body, self._body = self._body, b""
+        else:
+            body, self._body = self._body[:amt], self._body[amt:]
+        return body
+
+    def getheaders(self):
+        """Return the response headers as a list of (header, value) tuples."""
+        return list(self.msg.items())
+
+    def getheader(self, name, default=None):
+        """Return the value of the given response header."""
+        return self.msg.get(name, default)
+
+    def info(self):
+        """Return the response headers (used by the cookie jar)."""
+        return self.msg
+
+    def close(self):
+        """Release the response body."""
+        self._body = b""
+
+
+def is_connection_dropped(conn):
+    """Tell if the server has closed an idle connection.
+
+    An idle connection has nothing to read. If the socket is readable, then
+    the server has closed the connection, or has sent unexpected data. In
+    both cases, the connection cannot be used for a new request.
+
+    :param conn: The idle connection.
+    :type conn: :py:class:``http.client.HTTPConnection``
+
+    :return: ``True`` if the connection cannot be used anymore.
+    :rtype: bool
+    """
+    sock = getattr(conn, "sock", None)
+    if sock is None:
+        return False
+    try:
+        readable, _w, _x = select.select([sock], [], [], 0)
+    except (ValueError, select.error, socket.error):
+        return True
+    return bool(readable)
+
+
+class HTTPConnection(http_client.HTTPConnection):
+    """HTTP connection that opens its socket through a resolver object.
+
+    :param host: The host name of the server.
+    :type host: str
+    :param port: The TCP port.
+    :type port: int
+    :param timeout: Timeout in seconds for the network operations.
+    :type timeout: int
+    :param resolver: Object that resolves the host name, or ``None`` to let
+                     the system resolve the name.
+    :type resolver: :py:class:``dns_resolver.DNSResolver``
+    """
+
+    def __init__(self, host, port=None, timeout=10, resolver=None):
+        """Initialize the object."""
+        http_client.HTTPConnection.__init__(self, host, port, timeout=timeout)
+        self.resolver = resolver
+
+    def connect(self):
+        """Open the TCP connection to the server."""
+        if self.resolver is None:
+            return http_client.HTTPConnection.connect(self)
+        self.sock = open_socket(self)
+
+
+class HTTPSConnection(http_client.HTTPSConnection):
+    """HTTPS connection that opens its socket through a resolver object.
+
+    :param host: The host name of the server.
+    :type host: str
+    :param port: The TCP port.
+    :type port: int
+    :param timeout: Timeout in seconds for the network operations.
+    :type timeout: int
+    :param context: The SSL context for the TLS handshake.
+    :type context: :py:class:``ssl.SSLContext``
+    :param resolver: Object that resolves the host name, or ``None`` to let
+                     the system resolve the name.
+    :type resolver: :py:class:``dns_resolver.DNSResolver``
+    """
+
+    def __init__(self, host, port=None, timeout=10, context=None, resolver=None):
+        """Initialize the object."""
+        http_client.HTTPSConnection.__init__(
+            self, host, port, timeout=timeout, context=context
+        )
+        self.ssl_context = context or ssl.create_default_context()
+        self.resolver = resolver
+
+    def connect(self):
+        """Open the TCP connection to the server and perform the TLS handshake."""
+        if self.resolver is None:
+            return http_client.HTTPSConnection.connect(self)
+        # The certificate is verified against the host name, not against the
+        # IP address that the resolver returns
+        self.sock = self.ssl_context.wrap_socket(open_socket(self), server_hostname=self.host)
+
+
+def open_socket(conn):
+    """Open the socket of a connection with the resolver of that connection.
+
+    :param conn: The connection object.
+    :type conn: :py:class:``HTTPConnection`` or :py:class:``HTTPSConnection``
+
+    :raises socket.error: The connection failed.
+
+    :return: The connected socket.
+    :rtype: :py:class:``socket.socket``
+    """
+    sock = conn.resolver.create_connection(
+        (conn.host, conn.port), conn.timeout, conn.source_address
+    )
+    # Small requests are sent without waiting (same as http.client)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+class ConnectionPool(object):
+    """Keep-alive HTTP connections shared between API requests.
+
+    Connections are grouped by scheme, host, and port. After a request, the
+    connection goes back to the pool so that the next request to the same
+    server does not have to establish a new TCP connection and perform a new
+    TLS handshake.
+
+    :param maxsize: Maximum number of idle connections to keep per server.
+    :type maxsize: int
+    :param validate_certs: Whether to validate the server TLS certificates.
+    :type validate_certs: bool
+    :param timeout: Timeout in seconds for the network operations.
+    :type timeout: int
+    :param resolver: Object that resolves the host names for the new
+                     connections, or ``None`` to let the system resolve the
+                     names for each connection.
+    :type resolver: :py:class:``dns_resolver.DNSResolver``
+    """
+
+    def __init__(self, maxsize=10, validate_certs=True, timeout=10, resolver=None):
+        """Initialize the object."""
+        self.maxsize = maxsize
+        self.validate_certs = validate_certs
+        self.timeout = timeout
+        self.resolver = resolver
+        self.lock = threading.Lock()
+        # Idle connections. Keys are (scheme, host, port) tuples.
+        self.idle = {}
+        self.ssl_context = None
+
+        # Statistics
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def can_handle(self, url):
+        """Tell if the pool can send requests to the given URL.
+
+        The pool does not manage requests that go through a proxy. Those
+        requests must use the :py:class:``ansible.module_utils.urls.Request``
+        class.
+
+        :param url: The URL to test.
+        :type url: :py:class:``urllib.parse.ParseResult``
+
+        :return: ``True`` if the pool can process the request, ``False``
+                 otherwise.
+        :rtype: bool
+        """
+        if self.maxsize <= 0 or url.scheme not in ("http", "https"):
+            return False
+        proxies = getproxies()
+        if url.scheme in proxies and not proxy_bypass(url.hostname):
+            return False
+        return True
+
+    def get_ssl_context(self):
+        """Return the SSL context shared by all the HTTPS connections."""
+        if self.ssl_context is None:
+            context = ssl.create_default_context()
+            if not self.validate_certs:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            self.ssl_context = context
+        return self.ssl_context
+
+    def get_connection(self, key):
+        """Return an idle connection from the pool or create a new one.
+
+        :param key: The (scheme, host, port) tuple that identifies the server.
+        :type key: tuple
+
+        :return: A tuple. The first item is the connection object. The second
+                 item is ``True`` if the connection was reused from the pool.
+        :rtype: tuple
+        """
+        while True:
+            with self.lock:
+                connections = self.idle.get(key)
+                if not connections:
+                    self.misses += 1
+                    break
+                conn = connections.pop()
+            if not is_connection_dropped(conn):
+                with self.lock:
+                    self.hits += 1
+                return (conn, True)
+            conn.close()
+
+        scheme, host, port = key
+        if scheme == "https":
+            conn = HTTPSConnection(
+                host,
+                port,
+                timeout=self.timeout,
+                context=self.get_ssl_context(),
+                resolver=self.resolver,
+            )
+        else:
+            conn = HTTPConnection(host, port, timeout=self.timeout, resolver=self.resolver)
+        return (conn, False)
+
+    def release_connection(self, key, conn):
+        """Return the connection to the pool.
+
+        The connection is closed if the pool is already full.
+
+        :param key: The (scheme, host, port) tuple that identifies the server.
+        :type key: tuple
+        :param conn: The connection to return to the pool.
+        :type conn: :py:class:``http.client.HTTPConnection``
+        """
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < self.maxsize:
+                connections.append(conn)
+                return
+            self.discarded += 1
+        conn.close()
+
+    def urlopen(self, method, url, body=None, headers=None):
+        """Send a request and return the response.
+
+        If a reused connection has been closed by the server in the meantime,
+        then the request is sent again through a new connection, but only
+        when the server cannot have processed the request:
+
+        * The request could not be sent.
+        * The server closed the connection without responding, and the method
+          is idempotent.
+
+        The other network errors, such as a timeout while waiting for the
+        response, are raised. The caller decides whether to send the request
+        again (see :py:class:``retry_policy.RetryPolicy``).
+
+        :param method: GET, PUT, POST, DELETE, ...
+        :type method: str
+        :param url: URL to the API endpoint
+        :type url: :py:class:``urllib.parse.ParseResult``
+        :param body: The data to send.
+        :type body: str or bytes
+        :param headers: The request headers.
+        :type headers: dict
+
+        :raises SSLValidationError: The TLS handshake failed.
+
+        :return: The response from the server.
+        :rtype: :py:class:``PoolResponse``
+        """
+        scheme = url.scheme
+        port = url.port or (443 if scheme == "https" else 80)
+        key = (scheme, url.hostname, port)
+        path = url.path or "/"
+        if url.query:
+            path += "?" + url.query
+
+        with self.lock:
+            self.requests += 1
+        while True:
+            conn, reused = self.get_connection(key)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+            except ssl.SSLError as e:
+                conn.close()
+                raise SSLValidationError(str(e))
+            except (http_client.HTTPException, socket.error):
+                conn.close()
+                # The server has closed the idle connection and the request
+                # did not go out. Retry with a new connection.
+                if reused:
+                    continue
+                raise
+            try:
+                response = conn.getresponse()
+                data = read_body(response)
+            except ssl.SSLError as e:
+                conn.close()
+                raise SSLValidationError(str(e))
+            except RemoteDisconnected:
+                conn.close()
+                # The server has closed the idle connection without reading
+                # the request
+                if reused and method.upper() in IDEMPOTENT_METHODS:
+                    continue
+                raise
+            except (zlib.error, http_client.HTTPException, socket.error):
+                conn.close()
+                raise
+            break
+
+        if response.will_close:
+            conn.close()
+        else:
+            self.release_connection(key, conn)
+        del response.msg["Content-Encoding"]
+        return PoolResponse(response, data)
+
+    def close(self):
+        """Close all the idle connections."""
+        with self.lock:
+            for connections in self.idle.values():
+                for conn in connections:
+                    conn.close()
+            self.idle = {}
+
+    def get_stats(self):
+        """Return the pool statistics.
+
+        :return: A dictionary with the number of requests, the number of
+                 reused connections (``hits``), and the number of new
+                 connections (``misses``).
+        :rtype: dict
+        """
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "hits": self.hits,
+                "misses": self.misses,
+                "discarded": self.discarded,
+            }
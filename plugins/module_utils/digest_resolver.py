@@ -0,0 +1,300 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import base64
+import json
+import re
+import threading
+
+from ansible.module_utils._text import to_bytes, to_text
+from ansible.module_utils.six.moves.urllib.parse import urlencode, urlparse
+
+# Media types that the registry can return for a manifest. Without those types
+# in the Accept header, the registry might convert the manifest, and then
+# return the digest of the converted manifest.
+MANIFEST_TYPES = ", ".join(
+    [
+        "application/vnd.oci.image.index.v1+json",
+        "application/vnd.docker.distribution.manifest.list.v2+json",
+        "application/vnd.oci.image.manifest.v1+json",
+        "application/vnd.docker.distribution.manifest.v2+json",
+        "application/vnd.docker.distribution.manifest.v1+prettyjws",
+    ]
+)
+
+
+def parse_challenge(header):
+    """Parse a ``WWW-Authenticate`` header that requests a bearer token.
+
+    For example, the registry returns the following header when the token is
+    missing or does not grant access to the repository::
+
+        Bearer realm="https://quay.example.com/v2/auth",service="quay.example.com",
+        scope="repository:production/smallimage:pull"
+
+    :param header: The value of the ``WWW-Authenticate`` header.
+    :type header: str
+
+    :return: The challenge parameters (``realm``, ``service``, ``scope``, ...)
+             with lowercase names, or ``None`` if the header is not a
+             ``Bearer`` challenge.
+    :rtype: dict or None
+    """
+    if not header:
+        return None
+    scheme, _sep, params = header.strip().partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    challenge = {}
+    for name, quoted, unquoted in re.findall(
+        r'([A-Za-z_]+)\s*=\s*(?:"([^"]*)"|([^\s,]+))', params
+    ):
+        challenge[name.lower()] = quoted or unquoted
+    return challenge
+
+
+class DigestResolver(object):
+    """Resolve image tags to manifest digests.
+
+    The resolver sends a ``HEAD`` request for the manifest to the registry
+    API (``/v2/``), and reads the digest from the ``Docker-Content-Digest``
+    response header. That request does not return the tag history that the
+    ``/api/v1/repository/{namespace}/{repository}/tag/`` endpoint returns.
+
+    The registry API requires a bearer token for each repository. The
+    resolver requests the token from the ``/v2/auth`` endpoint, with the
+    OAuth access token or the username and password of the module, and keeps
+    it for the other tags of the repository.
+
+    When the registry rejects the token with a ``401`` code, the resolver
+    requests a new token from the realm that the ``WWW-Authenticate``
+    challenge gives, and sends the ``HEAD`` request again once.
+
+    The tokens and the digests are only kept in memory, for the module run.
+    When the registry API cannot resolve a tag, for example because the tag
+    does not exist or because the registry API is not reachable at the Quay
+    URL, the resolver returns ``None`` and the caller uses the Quay API
+    instead. In that case, the registry requests (``/v2/auth`` and ``HEAD``)
+    are added to the requests of the Quay API lookup. When the ``/v2/auth``
+    endpoint does not exist, the resolver stops using the registry API for
+    the rest of the module run.
+
+    :param module: The module that sends the requests.
+    :type module: :py:class:``api_module.APIModule``
+    """
+
+    def __init__(self, module):
+        """Initialize the object."""
+        self.module = module
+        self.lock = threading.Lock()
+        # Keys are (namespace, repository, tag) tuples
+        self.digests = {}
+        # Keys are repository names (namespace/repository), values are bearer
+        # tokens, or None when the registry has refused the token
+        self.tokens = {}
+        # Set to False when the registry API is not available
+        self.enabled = module.connection is None
+
+        # Statistics
+        self.hits = 0
+        self.resolved = 0
+        self.failures = 0
+
+    def get_credentials(self):
+        """Return the ``Authorization`` header for the ``/v2/auth`` endpoint.
+
+        :return: The header value, or ``None`` for anonymous access.
+        :rtype: str or None
+        """
+        params = self.module.params
+        if params.get("quay_token"):
+            credentials = "$oauthtoken:{token}".format(token=params["quay_token"])
+        elif params.get("quay_username") and params.get("quay_password"):
+            credentials = "{user}:{password}".format(
+                user=params["quay_username"], password=params["quay_password"]
+            )
+        else:
+            return None
+        return "Basic {value}".format(
+            value=to_text(
+                base64.b64encode(to_bytes(credentials, errors="surrogate_or_strict"))
+            )
+        )
+
+    def get_token(self, full_repo_name, challenge=None):
+        """Return a bearer token for pulling from the given repository.
+
+        :param full_repo_name: The repository name (``namespace/shortname``).
+        :type full_repo_name: str
+        :param challenge: The parameters of the ``WWW-Authenticate`` challenge
+                          that the registry returned (see
+                          :py:func:``parse_challenge``). When set, the method
+                          requests a new token from the realm of the
+                          challenge instead of returning the stored token.
+                          The realm must be on the Quay server, so that the
+                          credentials are not sent to another server.
+        :type challenge: dict
+
+        :return: The token, or ``None`` if the registry does not provide one.
+        :rtype: str or None
+        """
+        module = self.module
+        query = {
+            "service": module.host_url.netloc,
+            "scope": "repository:{name}:pull".format(name=full_repo_name),
+        }
+        path = "/v2/auth"
+        if challenge:
+            realm = urlparse(challenge.get("realm", ""))
+            if realm.netloc != module.host_url.netloc or not realm.path:
+                return None
+            path = realm.path
+            query["service"] = challenge.get("service", query["service"])
+            query["scope"] = challenge.get("scope", query["scope"])
+        elif full_repo_name in self.tokens:
+            return self.tokens[full_repo_name]
+
+        headers = {"Accept": "application/json"}
+        credentials = self.get_credentials()
+        if credentials:
+            headers["Authorization"] = credentials
+        url = module.host_url._replace(path=path, query=urlencode(query))
+        token = None
+        try:
+            response = module.make_raw_request(
+                "GET",
+                url,
+                ok_error_codes=[400, 401, 403, 404],
+                headers=headers,
+                endpoint="v2/auth",
+            )
+            if response["status_code"] == 200:
+                token = json.loads(to_text(response["body"])).get("token")
+            elif response["status_code"] == 404:
+                # The registry API is not available at the Quay URL
+                self.enabled = False
+        except Exception as e:
+            module.debug("Cannot get a registry token: {error}".format(error=e))
+        self.tokens[full_repo_name] = token
+        return token
+
+    def get_registry_digest(self, namespace, repository, tag):
+        """Return the digest of the manifest that the tag references.
+
+        :param namespace: The namespace of the repository.
+        :type namespace: str
+        :param repository: The repository name, without the namespace.
+        :type repository: str
+        :param tag: The tag name.
+        :type tag: str
+
+        :return: The manifest digest, or ``None`` if the registry API cannot
+                 resolve the tag.
+        :rtype: str or None
+        """
+        key = (namespace, repository, tag)
+        with self.lock:
+            if key in self.digests:
+                self.hits += 1
+                return self.digests[key]
+            if not self.enabled or not namespace:
+                return None
+
+            module = self.module
+            full_repo_name = "{namespace}/{repository}".format(
+                namespace=namespace, repository=repository
+            )
+            token = self.get_token(full_repo_name)
+            if not token:
+                self.failures += 1
+                return None
+
+            url = module.host_url._replace(
+                path="/v2/{name}/manifests/{tag}".format(name=full_repo_name, tag=tag)
+            )
+            response = self.head_manifest(url, token)
+            if response is not None and response["status_code"] == 401:
+                # The token is not valid for the repository. Get a new token
+                # as the registry requests it, and then try again once.
+                headers_lower = dict((k.lower(), v) for k, v in response["headers"].items())
+                challenge = parse_challenge(headers_lower.get("www-authenticate"))
+                token = self.get_token(full_repo_name, challenge) if challenge else None
+                if token:
+                    response = self.head_manifest(url, token)
+            if response is None:
+                self.failures += 1
+                return None
+            headers_lower = dict((k.lower(), v) for k, v in response["headers"].items())
+            digest = headers_lower.get("docker-content-digest")
+            if response["status_code"] != 200 or not digest:
+                self.failures += 1
+                return None
+            self.resolved += 1
+            self.digests[key] = digest
+            return digest
+
+    def head_manifest(self, url, token):
+        """Send the ``HEAD`` request for a manifest.
+
+        :param url: The URL of the manifest.
+        :type url: :py:class:``urllib.parse.ParseResult``
+        :param token: The bearer token for the repository.
+        :type token: str
+
+        :return: The response (see :py:meth:``api_module.APIModule.make_raw_request``),
+                 or ``None`` if the request failed.
+        :rtype: dict or None
+        """
+        headers = {
+            "Accept": MANIFEST_TYPES,
+            "Authorization": "Bearer {token}".format(token=token),
+        }
+        try:
+            return self.module.make_raw_request(
+                "HEAD",
+                url,
+                ok_error_codes=[401, 403, 404],
+                headers=headers,
+                endpoint="v2/{namespace}/{repository}/manifests/{tag}",
+            )
+        except Exception as e:
+            self.module.debug(
+                "Cannot get the digest from the registry: {error}".format(error=e)
+            )
+            return None
+
+    def set_digest(self, namespace, repository, tag, digest):
+        """Record the digest of a tag that the module has created or changed.
+
+        :param namespace: The namespace of the repository.
+        :type namespace: str
+        :param repository: The repository name, without the namespace.
+        :type repository: str
+        :param tag: The tag name.
+        :type tag: str
+        :param digest: The manifest digest, or ``None`` if the tag has been
+                       removed.
+        :type digest: str
+        """
+        with self.lock:
+            if digest:
+                self.digests[(namespace, repository, tag)] = digest
+            else:
+                self.digests.pop((namespace, repository, tag), None)
+
+    def get_stats(self):
+        """Return the resolver statistics.
+
+        :return: A dictionary with the number of tags resolved from the cache
+                 (``hits``), the number of tags resolved with the registry API
+                 (``resolved``), and the number of tags that the registry API
+                 could not resolve (``failures``).
+        :rtype: dict
+        """
+        with self.lock:
+            return {"hits": self.hits, "resolved": self.resolved, "failures": self.failures}
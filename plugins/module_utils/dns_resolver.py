@@ -0,0 +1,256 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+import socket
+import threading
+import time
+
+try:
+    import fcntl
+
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+
+class DNSResolver(object):
+    """Resolve host names and keep the results for a given time.
+
+    The addresses are resolved once and then reused for all the connections
+    that the module opens to the same host, until they expire.
+
+    When ``path`` is set, the results are also stored in that file, and the
+    file is locked during the resolution. The modules that use the same file,
+    such as the modules that run in the following tasks, reuse the addresses
+    without querying the DNS servers again.
+
+    Host names in ``pins`` always resolve to the given addresses, without
+    querying the DNS servers.
+
+    :param ttl: Time in seconds during which the addresses stay valid. ``0``
+                disables the cache.
+    :type ttl: int
+    :param pins: Static addresses. Keys are host names and values are lists
+                 of IP addresses.
+    :type pins: dict
+    :param path: File that stores the addresses to share between processes,
+                 or ``None`` to keep them only in memory.
+    :type path: str
+    """
+
+    def __init__(self, ttl=300, pins=None, path=None):
+        """Initialize the object."""
+        self.ttl = max(ttl or 0, 0)
+        self.pins = dict((h.lower(), list(a)) for h, a in (pins or {}).items() if a)
+        self.path = os.path.expanduser(path) if path and HAS_FCNTL and self.ttl else None
+        self.lock = threading.Lock()
+        # Keys are host names, values are (addresses, expiration time) tuples
+        self.entries = {}
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, host):
+        """Query the DNS servers.
+
+        :param host: The host name to resolve.
+        :type host: str
+
+        :raises socket.gaierror: The name cannot be resolved.
+
+        :return: The IP addresses, in the order that the system returns them.
+        :rtype: list
+        """
+        addresses = []
+        for info in socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM):
+            address = info[4][0]
+            if address not in addresses:
+                addresses.append(address)
+        return addresses
+
+    def lookup_shared(self, host, now, refresh=False):
+        """Return the addresses from the shared file, or resolve them.
+
+        :param host: The host name to resolve.
+        :type host: str
+        :param now: Current time.
+        :type now: float
+        :param refresh: Whether to ignore the addresses in the file.
+        :type refresh: bool
+
+        :raises socket.gaierror: The name cannot be resolved.
+
+        :return: A tuple with the IP addresses, their expiration time, and
+                 whether they come from the file.
+        :rtype: tuple
+        """
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    hosts = json.loads(f.read() or "{}")
+                except ValueError:
+                    hosts = {}
+                if not isinstance(hosts, dict):
+                    hosts = {}
+                entry = hosts.get(host)
+                if (
+                    not refresh
+                    and isinstance(entry, dict)
+                    and entry.get("addresses")
+                    and entry.get("expires", 0) > now
+                ):
+                    return (entry["addresses"], entry["expires"], True)
+
+                addresses = self.lookup(host)
+                expires = now + self.ttl
+                hosts[host] = {"addresses": addresses, "expires": expires}
+                # Drop the expired entries
+                hosts = dict(
+                    (h, e)
+                    for h, e in hosts.items()
+                    if isinstance(e, dict) and e.get("expires", 0) > now
+                )
+                f.seek(0)
+                f.truncate()
+                json.dump(hosts, f)
+                f.flush()
+                return (addresses, expires, False)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def resolve(self, host, refresh=False):
+        """Return the IP addresses of the given host.
+
+        :param host: The host name or the IP address.
+        :type host: str
+        :param refresh: Whether to ignore the cached addresses and query the
+                        DNS servers again.
+        :type refresh: bool
+
+        :raises socket.gaierror: The name cannot be resolved.
+
+        :return: The IP addresses.
+        :rtype: list
+        """
+        host = host.lower()
+        if host in self.pins:
+            return self.pins[host]
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(host)
+            if not refresh and entry and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            path = self.path
+
+        # The name is resolved without holding the lock, so that the threads
+        # that connect to other hosts, or that use cached addresses, do not
+        # wait for the DNS servers. Concurrent threads might resolve the same
+        # name, and the last result is kept.
+        cached = False
+        addresses = None
+        if path:
+            try:
+                addresses, expires, cached = self.lookup_shared(host, now, refresh)
+            except socket.gaierror:
+                raise
+            except (IOError, OSError):
+                # Fall back to the memory cache when the file cannot be used
+                with self.lock:
+                    self.path = None
+        if addresses is None:
+            addresses = self.lookup(host)
+            expires = now + self.ttl
+
+        with self.lock:
+            if cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if self.ttl:
+                self.entries[host] = (addresses, expires)
+        return addresses
+
+    def connect(self, addresses, port, timeout, source_address):
+        """Open a TCP connection to the first reachable address.
+
+        :param addresses: The IP addresses to try.
+        :type addresses: list
+        :param port: The TCP port.
+        :type port: int
+        :param timeout: The timeout for the connection.
+        :type timeout: float
+        :param source_address: The (host, port) tuple to bind to.
+        :type source_address: tuple
+
+        :raises socket.error: None of the addresses can be reached.
+
+        :return: The connected socket.
+        :rtype: :py:class:``socket.socket``
+        """
+        error = None
+        for address in addresses:
+            try:
+                return socket.create_connection((address, port), timeout, source_address)
+            except socket.error as e:
+                error = e
+        raise error or socket.error("No address to connect to")
+
+    def create_connection(self, address, timeout=None, source_address=None):
+        """Open a TCP connection to the given host.
+
+        The method has the same signature as the
+        :py:func:``socket.create_connection`` function. The
+        :py:class:``connection_pool.HTTPConnection`` and
+        :py:class:``connection_pool.HTTPSConnection`` objects call it to open
+        their socket.
+
+        If none of the cached addresses can be reached, then the method
+        resolves the name again, in case the addresses have changed.
+
+        :param address: The (host, port) tuple.
+        :type address: tuple
+        :param timeout: The timeout for the connection.
+        :type timeout: float
+        :param source_address: The (host, port) tuple to bind to.
+        :type source_address: tuple
+
+        :raises socket.error: The connection failed.
+
+        :return: The connected socket.
+        :rtype: :py:class:``socket.socket``
+        """
+        host, port = address[:2]
+        addresses = self.resolve(host)
+        try:
+            return self.connect(addresses, port, timeout, source_address)
+        except socket.error:
+            if host.lower() in self.pins or not self.ttl:
+                raise
+            fresh = self.resolve(host, refresh=True)
+            if fresh == addresses:
+                raise
+        return self.connect(fresh, port, timeout, source_address)
+
+    def get_stats(self):
+        """Return the resolver statistics.
+
+        :return: A dictionary with the number of names resolved from the
+                 cache (``hits``) and from the DNS servers (``misses``).
+        :rtype: dict
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,149 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+
+class RateLimiter(object):
+    """Limit the rate of the API requests with a token bucket.
+
+    The bucket holds up to ``burst`` tokens and is refilled at ``rate``
+    tokens per second. Each request takes a token. When the bucket is empty,
+    the request waits for the next token.
+
+    By default, the bucket is local to the module. When ``path`` is set, the
+    state of the bucket is stored in that file, and the file is locked while
+    a token is taken. All the modules that use the same file, such as the
+    modules running in parallel in the Ansible forks, share the same budget.
+    The file stores a bucket for each Quay server (``key``).
+
+    :param rate: Number of requests per second. ``0`` disables the limit.
+    :type rate: float
+    :param burst: Maximum number of requests that can be sent at once after
+                  a period of inactivity.
+    :type burst: int
+    :param path: File that stores the state of the buckets to share between
+                 processes, or ``None`` to use a bucket local to the process.
+    :type path: str
+    :param key: Name of the bucket in the file, usually the server host and
+                port.
+    :type key: str
+    """
+
+    def __init__(self, rate=0, burst=1, path=None, key=""):
+        """Initialize the object."""
+        self.rate = max(rate or 0, 0)
+        self.burst = max(burst or 1, 1)
+        self.path = os.path.expanduser(path) if path and HAS_FCNTL else None
+        self.key = key
+        self.lock = threading.Lock()
+        self.tokens = float(self.burst)
+        self.stamp = time.time()
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def take(self, tokens, stamp, now):
+        """Take a token from the bucket.
+
+        The token is reserved even if the bucket is empty, so that the
+        following requests wait after this one.
+
+        :param tokens: Number of tokens in the bucket at ``stamp``.
+        :type tokens: float
+        :param stamp: Time of the last update of the bucket.
+        :type stamp: float
+        :param now: Current time.
+        :type now: float
+
+        :return: A tuple with the new number of tokens and the time to wait
+                 before sending the request.
+        :rtype: tuple
+        """
+        tokens = min(self.burst, tokens + max(now - stamp, 0) * self.rate)
+        tokens -= 1
+        delay = -tokens / self.rate if tokens < 0 else 0
+        return (tokens, delay)
+
+    def take_shared(self, now):
+        """Take a token from the bucket stored in the shared file.
+
+        :param now: Current time.
+        :type now: float
+
+        :return: The time to wait before sending the request.
+        :rtype: float
+        """
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    buckets = json.loads(f.read() or "{}")
+                except ValueError:
+                    buckets = {}
+                if not isinstance(buckets, dict):
+                    buckets = {}
+                bucket = buckets.get(self.key) or {}
+                tokens, delay = self.take(
+                    bucket.get("tokens", self.burst), bucket.get("stamp", now), now
+                )
+                buckets[self.key] = {"tokens": tokens, "stamp": now}
+                f.seek(0)
+                f.truncate()
+                json.dump(buckets, f)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return delay
+
+    def reserve(self):
+        """Take a token and return the time to wait before sending the request.
+
+        Unlike :py:meth:``acquire``, the method returns immediately, and the
+        caller is responsible for waiting.
+
+        :return: The delay in seconds, ``0`` if the request can be sent now.
+        :rtype: float
+        """
+        if not self.rate:
+            return 0
+        now = time.time()
+        delay = None
+        if self.path:
+            try:
+                delay = self.take_shared(now)
+            except (IOError, OSError):
+                # Fall back to the local bucket when the file cannot be used
+                self.path = None
+        with self.lock:
+            if delay is None:
+                self.tokens, delay = self.take(self.tokens, self.stamp, now)
+                self.stamp = now
+            if delay > 0:
+                self.waits += 1
+                self.wait_time += delay
+        return max(delay, 0)
+
+    def acquire(self):
+        """Wait until the request can be sent."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,617 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import re
+
+from .api_module import APIModuleError
+
+
+# Options that describe a repository. Used by the quay_repository module and,
+# as suboptions, by the quay_repositories module.
+REPOSITORY_ARGSPEC = dict(
+    name=dict(required=True),
+    visibility=dict(choices=["public", "private"]),
+    description=dict(),
+    perms=dict(
+        type="list",
+        elements="dict",
+        options=dict(
+            type=dict(choices=["user", "team"], default="user"),
+            name=dict(required=True),
+            role=dict(choices=["read", "write", "admin"], default="read"),
+        ),
+    ),
+    append=dict(type="bool", default=True),
+    star=dict(type="bool"),
+    repo_state=dict(choices=["NORMAL", "READ_ONLY", "MIRROR"]),
+    auto_prune_method=dict(choices=["none", "tags", "date"]),
+    auto_prune_value=dict(),
+    state=dict(choices=["present", "absent"], default="present"),
+)
+
+REPOSITORY_REQUIRED_IF = [
+    ("auto_prune_method", "tags", ["auto_prune_value"]),
+    ("auto_prune_method", "date", ["auto_prune_value"]),
+]
+
+REPOSITORY_REQUIRED_BY = {
+    "auto_prune_value": "auto_prune_method",
+}
+
+
+class RepositoryManager(object):
+    """Create, update, and delete repositories.
+
+    The object keeps the namespace and the account lookups, so that
+    processing several repositories in the same module run does not retrieve
+    the same namespace or account twice.
+
+    :param module: An initialized :py:class:``api_module.APIModule`` object
+                   that can be used to access the API.
+    :type module: :py:class:``api_module.APIModule``
+    """
+
+    def __init__(self, module):
+        """Initialize the object."""
+        self.module = module
+        self.my_name = module.who_am_i()
+        self.namespaces = {}
+
+    def get_auto_prune_value(self, auto_prune_method, auto_prune_value):
+        """Validate and return the auto-pruning tags value.
+
+        :param auto_prune_method: The auto-pruning method (``none``, ``tags``,
+                                  or ``date``).
+        :type auto_prune_method: str
+        :param auto_prune_value: The value to validate.
+        :type auto_prune_value: str
+
+        :raises APIModuleError: The value has a wrong format.
+
+        :return: The value to send to the API.
+        :rtype: int or str
+        """
+        if auto_prune_method == "tags":
+            try:
+                value = int(auto_prune_value)
+            except ValueError:
+                value = 0
+            if value <= 0:
+                raise APIModuleError(
+                    (
+                        "Wrong format for the `auto_prune_value' parameter:"
+                        " {auto_prune_value} is not a positive integer."
+                    ).format(auto_prune_value=auto_prune_value)
+                )
+            auto_prune_value = value
+        if auto_prune_method == "date":
+            value = "".join(auto_prune_value.split())
+            if not re.match(r"[1-9]\d*[smhdw]$", value):
+                raise APIModuleError(
+                    (
+                        "Wrong format for the `auto_prune_value' parameter:"
+                        " {auto_prune_value} is not a positive integer followed by"
+                        " the s, m, h, d, or w suffix."
+                    ).format(auto_prune_value=auto_prune_value)
+                )
+            auto_prune_value = value
+        return auto_prune_value
+
+    def split_name(self, name):
+        """Return the namespace and the short name of the given repository.
+
+        :param name: The repository name, with or without the namespace part.
+                     Without a namespace part, the repository is in the
+                     user's personal namespace.
+        :type name: str
+
+        :raises APIModuleError: The name does not include a namespace and the
+                                access to the API is anonymous.
+
+        :return: A tuple with the namespace and the repository short name.
+        :rtype: tuple
+        """
+        name = name.strip("/")
+        try:
+            namespace, repo_shortname = name.split("/", 1)
+        except ValueError:
+            # No namespace part in the repository name. Therefore, the
+            # repository is in the user's personal namespace
+            if not self.my_name:
+                raise APIModuleError(
+                    (
+                        "The `name' parameter must include the"
+                        " organization: <organization>/{name}."
+                    ).format(name=name)
+                )
+            namespace = self.my_name
+            repo_shortname = name
+        return (namespace, repo_shortname)
+
+    def get_namespace(self, namespace):
+        """Return the namespace details, retrieving them only once.
+
+        :param namespace: The name of the namespace to look for.
+        :type namespace: str
+
+        :return: The namespace details or None if the namespace cannot be found.
+        :rtype: dict or None
+        """
+        if namespace not in self.namespaces:
+            self.namespaces[namespace] = self.module.get_namespace(
+                namespace, exit_on_error=False
+            )
+        return self.namespaces[namespace]
+
+    def process(self, params):
+        """Create, update, or delete a repository.
+
+        :param params: The repository description, with the same keys as the
+                       :py:data:``REPOSITORY_ARGSPEC`` options.
+        :type params: dict
+
+        :raises APIModuleError: An API error occurred or a parameter is not
+                                valid.
+
+        :return: ``True`` if the repository has been changed, ``False``
+                 otherwise.
+        :rtype: bool
+        """
+        module = self.module
+        visibility = params.get("visibility")
+        description = params.get("description")
+        perms = params.get("perms")
+        append = params.get("append")
+        star = params.get("star")
+        repo_state = params.get("repo_state")
+        auto_prune_method = params.get("auto_prune_method")
+        auto_prune_value = self.get_auto_prune_value(
+            auto_prune_method, params.get("auto_prune_value")
+        )
+        state = params.get("state")
+
+        namespace, repo_shortname = self.split_name(params.get("name"))
+        full_repo_name = "{namespace}/{repository}".format(
+            namespace=namespace, repository=repo_shortname
+        )
+
+        # Get the repository details
+        #
+        # GET /api/v1/repository/{namespace}/{repository}
+        # {
+        #   "namespace": "production",
+        #   "name": "busybox",
+        #   "kind": "image",
+        #   "description": "Busybox images",
+        #   "is_public": true,
+        #   "is_organization": true,
+        #   "is_starred": false,
+        #   "status_token": "",
+        #   "trust_enabled": false,
+        #   "tag_expiration_s": 86400,
+        #   "is_free_account": true,
+        #   "state": "NORMAL",
+        #   "tags": {},
+        #   "can_write": true,
+        #   "can_admin": true
+        # }
+        repo_details = module.get_object_path(
+            "repository/{full_repo_name}",
+            ok_error_codes=[404, 403],
+            exit_on_error=False,
+            full_repo_name=full_repo_name,
+        )
+
+        # Remove the repository
+        if state == "absent":
+            return module.delete(
+                repo_details,
+                "repository",
+                full_repo_name,
+                "repository/{full_repo_name}",
+                auto_exit=False,
+                exit_on_error=False,
+                full_repo_name=full_repo_name,
+            )
+
+        # Check whether namespace exists (organization or user account)
+        namespace_details = self.get_namespace(namespace)
+        if not namespace_details:
+            raise APIModuleError(
+                "The {namespace} namespace does not exist.".format(namespace=namespace)
+            )
+
+        changed = False
+        if not repo_details:
+            # Create the repository
+            new_fields = {
+                "namespace": namespace,
+                "repository": repo_shortname,
+                "repo_kind": "image",
+            }
+            new_fields["description"] = description if description else ""
+            new_fields["visibility"] = visibility if visibility else "private"
+            module.create(
+                "repository",
+                full_repo_name,
+                "repository",
+                new_fields,
+                auto_exit=False,
+                exit_on_error=False,
+            )
+            changed = True
+        else:
+            # Update description
+            if description is not None:
+                updated, _not_used = module.update(
+                    repo_details,
+                    "repository",
+                    full_repo_name,
+                    "repository/{full_repo_name}",
+                    {"description": description},
+                    auto_exit=False,
+                    exit_on_error=False,
+                    full_repo_name=full_repo_name,
+                )
+                if updated:
+                    changed = True
+            # Update visibility
+            if (
+                visibility
+                and "is_public" in repo_details
+                and (
+                    repo_details["is_public"]
+                    and visibility == "private"
+                    or not repo_details["is_public"]
+                    and visibility == "public"
+                )
+            ):
+                module.create(
+                    "repository",
+                    full_repo_name,
+                    "repository/{full_repo_name}/changevisibility",
+                    {"visibility": visibility},
+                    auto_exit=False,
+                    exit_on_error=False,
+                    full_repo_name=full_repo_name,
+                )
+                changed = True
+
+        if repo_state is not None and (
+            not repo_details
+            and repo_state != "NORMAL"
+            or repo_details
+            and repo_details.get("state") != repo_state
+        ):
+            # Update repo_state
+            module.unconditional_update(
+                "repository",
+                full_repo_name,
+                "repository/{full_repo_name}/changestate",
+                {"state": repo_state},
+                exit_on_error=False,
+                full_repo_name=full_repo_name,
+            )
+            changed = True
+
+        if star is not None and module.authenticated:
+            if star and (not repo_details or not repo_details.get("is_starred")):
+                module.create(
+                    "repository",
+                    full_repo_name,
+                    "user/starred",
+                    {"namespace": namespace, "repository": repo_shortname},
+                    auto_exit=False,
+                    exit_on_error=False,
+                )
+                changed = True
+            if not star and repo_details and repo_details.get("is_starred"):
+                module.delete(
+                    repo_details,
+                    "repository",
+                    full_repo_name,
+                    "user/starred/{full_repo_name}",
+                    auto_exit=False,
+                    exit_on_error=False,
+                    full_repo_name=full_repo_name,
+                )
+                changed = True
+
+        if auto_prune_method is not None:
+            if self.process_auto_prune(full_repo_name, auto_prune_method, auto_prune_value):
+                changed = True
+
+        if perms is not None:
+            if self.process_perms(namespace, full_repo_name, perms, append):
+                changed = True
+        return changed
+
+    def process_auto_prune(self, full_repo_name, auto_prune_method, auto_prune_value):
+        """Process the auto-pruning tags policy configuration.
+
+        :param full_repo_name: The repository name (``namespace/shortname``).
+        :type full_repo_name: str
+        :param auto_prune_method: The auto-pruning method (``none``, ``tags``,
+                                  or ``date``).
+        :type auto_prune_method: str
+        :param auto_prune_value: The validated auto-pruning value.
+        :type auto_prune_value: int or str
+
+        :raises APIModuleError: An API error occurred.
+
+        :return: ``True`` if the policy has been changed, ``False`` otherwise.
+        :rtype: bool
+        """
+        module = self.module
+
+        # Get the current auto-pruning tags policy:
+        #
+        # GET /api/v1/repository/{namespace}/{repository}/autoprunepolicy/
+        # {
+        #   "policies": [
+        #     {
+        #       "uuid": "e54f146d-eb0e-446c-9057-61291a0b257c",
+        #       "method": "creation_date",
+        #       "value": "7h"
+        #     }
+        #   ]
+        # }
+        #
+        # If no policy is defined, then the returned data is {"policies": []}
+        prune_details = module.get_object_path(
+            "repository/{full_repo_name}/autoprunepolicy/",
+            exit_on_error=False,
+            full_repo_name=full_repo_name,
+        )
+        try:
+            policies = prune_details["policies"]
+        except (TypeError, IndexError):
+            policies = []
+
+        # Removing the auto-prune policies (the UI only manages one policy, but
+        # the backend seems to allow several policies)
+        if auto_prune_method == "none":
+            deleted = False
+            for policy in policies:
+                uuid = policy.get("uuid")
+                if module.delete(
+                    uuid,
+                    "repository auto-prune policy",
+                    full_repo_name,
+                    "repository/{full_repo_name}/autoprunepolicy/{uuid}",
+                    auto_exit=False,
+                    exit_on_error=False,
+                    full_repo_name=full_repo_name,
+                    uuid=uuid,
+                ):
+                    deleted = True
+            return deleted
+
+        # Compose the request
+        method = "creation_date" if auto_prune_method == "date" else "number_of_tags"
+        new_policy = {
+            "method": method,
+            "value": auto_prune_value,
+        }
+
+        # Verify whether the policy already exists
+        for policy in policies:
+            # The policy already exists
+            if policy.get("method") == method and policy.get("value") == auto_prune_value:
+                return False
+
+        # The policy does not exist. If a policy is not already defined,
+        # then create the policy
+        if len(policies) == 0 or policies[0].get("uuid") is None:
+            module.create(
+                "repository auto-prune policy",
+                full_repo_name,
+                "repository/{full_repo_name}/autoprunepolicy/",
+                new_policy,
+                auto_exit=False,
+                exit_on_error=False,
+                full_repo_name=full_repo_name,
+            )
+        else:
+            # Update the existing policy (the first one in the list)
+            uuid = policies[0]["uuid"]
+            new_policy["uuid"] = uuid
+            module.unconditional_update(
+                "repository auto-prune policy",
+                full_repo_name,
+                "repository/{full_repo_name}/autoprunepolicy/{uuid}",
+                new_policy,
+                exit_on_error=False,
+                full_repo_name=full_repo_name,
+                uuid=uuid,
+            )
+        return True
+
+    def process_perms(self, namespace, full_repo_name, perms, append):
+        """Set the team and user permissions of the repository.
+
+        The method retrieves the current permissions, looks up the teams and
+        the accounts, and then sends the PUT and DELETE requests in parallel
+        when the module can send parallel requests (``quay_parallel_requests``
+        parameter greater than 1). The method validates all the teams and
+        accounts before changing any permission.
+
+        :param namespace: The repository namespace.
+        :type namespace: str
+        :param full_repo_name: The repository name (``namespace/shortname``).
+        :type full_repo_name: str
+        :param perms: The list of permissions. Each permission is a dictionary
+                      with the ``type``, ``name``, and ``role`` keys.
+        :type perms: list
+        :param append: If ``True``, then only add the given permissions.
+                       Otherwise, also remove the permissions that are not in
+                       the list.
+        :type append: bool
+
+        :raises APIModuleError: An API error occurred, or a team or an account
+                                does not exist.
+
+        :return: ``True`` if the permissions have been changed, ``False``
+                 otherwise.
+        :rtype: bool
+        """
+        module = self.module
+
+        def get_perms(kind):
+            # Get the team permissions
+            #
+            # GET /api/v1/repository/{namespace}/{repository}/permissions/team/
+            # {
+            #   "permissions": {
+            #     "developers": {
+            #       "role": "write",
+            #       "name": "developers",
+            #       "avatar": {
+            #         "name": "developers",
+            #         "hash": "5760...397e",
+            #         "color": "#9c9ede",
+            #         "kind": "team"
+            #       }
+            #     }
+            #   }
+            # }
+            #
+            # Get the user permissions
+            #
+            # GET /api/v1/repository/{namespace}/{repository}/permissions/user/
+            # {
+            #   "permissions": {
+            #     "admin": {
+            #       "role": "admin",
+            #       "name": "admin",
+            #       "is_robot": false,
+            #       "avatar": {
+            #         "name": "admin",
+            #         "hash": "258d...da4f",
+            #         "color": "#98df8a",
+            #         "kind": "user"
+            #       },
+            #       "is_org_member": true
+            #     },
+            #     "operator2": {
+            #       "role": "write",
+            #       "name": "operator2",
+            #       "is_robot": false,
+            #       "avatar": {
+            #         "name": "operator2",
+            #         "hash": "4eaf...94b0",
+            #         "color": "#7f7f7f",
+            #         "kind": "user"
+            #       },
+            #       "is_org_member": false
+            #     }
+            #   }
+            # }
+            try:
+                perms = module.get_object_path(
+                    "repository/{full_repo_name}/permissions/{kind}/",
+                    exit_on_error=False,
+                    full_repo_name=full_repo_name,
+                    kind=kind,
+                )
+            except APIModuleError as e:
+                return (None, e)
+            return (perms, None)
+
+        current = {}
+        for kind, (kind_perms, error) in zip(
+            ("team", "user"), module.map_parallel(get_perms, ("team", "user"))
+        ):
+            if error is not None:
+                raise error
+            # Set of (<name>, <perm>) tuples
+            current[kind] = set(
+                [
+                    (p["name"], p["role"])
+                    for _not_used, p in (kind_perms or {}).get("permissions", {}).items()
+                ]
+            )
+
+        # List of (<kind>, <name>, <role>) tuples. The role is None for the
+        # permissions to remove.
+        operations = []
+        to_add = {}
+        for kind in ("team", "user"):
+            new_perms = set(
+                [(p["name"], p["role"]) for p in perms if p.get("type", "user") == kind]
+            )
+            to_add[kind] = new_perms - current[kind]
+            if not append:
+                # Changing the role of an account does not require removing
+                # the previous permission first. The PUT request replaces it.
+                names = set([perm[0] for perm in to_add[kind]])
+                for perm in current[kind] - new_perms:
+                    if perm[0] not in names:
+                        operations.append((kind, perm[0], None))
+            for perm in to_add[kind]:
+                operations.append((kind, perm[0], perm[1]))
+
+        # Checking that all the teams to add exist
+        teams_not_found = []
+        for team in to_add["team"]:
+            if module.get_team(namespace, team[0], exit_on_error=False) is None:
+                teams_not_found.append(team[0])
+        if teams_not_found:
+            raise APIModuleError(
+                (
+                    "At least one team to associate to the repository does not"
+                    " exist: {teams}."
+                ).format(teams=", ".join(teams_not_found))
+            )
+
+        # Checking that all the user accounts to add exist
+        accounts = module.get_accounts(
+            [member[0] for member in to_add["user"]], exit_on_error=False
+        )
+        accounts_not_found = [name for name, account in accounts.items() if account is None]
+        if accounts_not_found:
+            raise APIModuleError(
+                "At least one user to add as team member does not exist: {users}.".format(
+                    users=", ".join(accounts_not_found)
+                )
+            )
+
+        def apply(operation):
+            kind, name, role = operation
+            object_type = "{kind} repository permission".format(kind=kind)
+            endpoint = "repository/{full_repo_name}/permissions/" + kind + "/{name}"
+            try:
+                if role is None:
+                    module.delete(
+                        True,
+                        object_type,
+                        name,
+                        endpoint,
+                        auto_exit=False,
+                        exit_on_error=False,
+                        full_repo_name=full_repo_name,
+                        name=name,
+                    )
+                else:
+                    module.unconditional_update(
+                        object_type,
+                        name,
+                        endpoint,
+                        {"role": role},
+                        exit_on_error=False,
+                        full_repo_name=full_repo_name,
+                        name=name,
+                    )
+            except APIModuleError as e:
+                return e
+            return None
+
+        errors = [e for e in module.map_parallel(apply, operations) if e is not None]
+        if errors:
+            raise APIModuleError(" ".join(str(e) for e in errors))
+        return len(operations) > 0
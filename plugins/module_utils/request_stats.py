@@ -0,0 +1,107 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import math
+import threading
+
+
+def percentile(values, percent):
+    """Return the percentile of the given values (nearest-rank method).
+
+    :param values: The values, sorted in ascending order.
+    :type values: list
+    :param percent: The percentile to compute, between 0 and 100.
+    :type percent: int
+
+    :return: The percentile, or ``0`` if the list is empty.
+    :rtype: float
+    """
+    if not values:
+        return 0
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class RequestStats(object):
+    """Record the API requests that a module sends.
+
+    For each request, the object keeps the HTTP method, the endpoint
+    template (``repository/{full_repo_name}/tag/`` for example), the
+    returned status code, the size of the response, and the duration.
+    """
+
+    def __init__(self):
+        """Initialize the object."""
+        self.lock = threading.Lock()
+        self.requests = []
+
+    def record(self, method, endpoint, status, size, duration):
+        """Record a request.
+
+        :param method: The HTTP method.
+        :type method: str
+        :param endpoint: The endpoint template, without the ``/api/v1/``
+                         prefix.
+        :type endpoint: str
+        :param status: The HTTP status code, or ``0`` for network errors.
+        :type status: int
+        :param size: The size of the response body in bytes.
+        :type size: int
+        :param duration: The duration of the request in seconds.
+        :type duration: float
+        """
+        with self.lock:
+            self.requests.append((method, endpoint, status, size, duration))
+
+    def summarize(self, requests):
+        """Return the count, size, and latency of the given requests.
+
+        :param requests: The requests, as recorded by :py:meth:``record``.
+        :type requests: list
+
+        :return: The aggregated values.
+        :rtype: dict
+        """
+        durations = sorted(r[4] for r in requests)
+        return {
+            "count": len(requests),
+            "bytes": sum(r[3] for r in requests),
+            "total_time": round(sum(durations), 4),
+            "p50": round(percentile(durations, 50), 4),
+            "p95": round(percentile(durations, 95), 4),
+        }
+
+    def get_summary(self):
+        """Return the aggregated statistics.
+
+        :return: The statistics for all the requests, the number of requests
+                 for each status code, and the statistics for each endpoint,
+                 the most expensive endpoints first.
+        :rtype: dict
+        """
+        with self.lock:
+            requests = list(self.requests)
+
+        status_codes = {}
+        endpoints = {}
+        for r in requests:
+            status_codes[str(r[2])] = status_codes.get(str(r[2]), 0) + 1
+            endpoints.setdefault((r[0], r[1]), []).append(r)
+
+        per_endpoint = []
+        for (method, endpoint), reqs in endpoints.items():
+            summary = self.summarize(reqs)
+            summary["method"] = method
+            summary["endpoint"] = endpoint
+            per_endpoint.append(summary)
+        per_endpoint.sort(key=lambda e: e["total_time"], reverse=True)
+
+        summary = self.summarize(requests)
+        summary["status_codes"] = status_codes
+        summary["endpoints"] = per_endpoint
+        return summary
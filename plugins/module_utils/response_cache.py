@@ -0,0 +1,342 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+from ansible.module_utils._text import to_bytes
+
+
+class ResponseCache(object):
+    """Store API responses in a local directory.
+
+    Only the responses from endpoints that are addressed by a manifest digest
+    are stored. The manifest itself never changes for a given digest and is
+    kept until it is evicted. Manifest labels and security reports can change
+    over time, and are kept for a limited period (``ttl``).
+
+    The responses from a few other endpoints (``REVALIDATED_ENDPOINTS``) are
+    stored when the server returns validators (``ETag`` or ``Last-Modified``
+    headers). Those responses are never used without asking the server
+    first: the module sends a conditional request (``If-None-Match`` or
+    ``If-Modified-Since``) and uses the stored response only when the server
+    answers ``304 Not Modified``. The endpoints that return secrets, such as
+    robot account tokens or OAuth application secrets, are not in that list.
+
+    Each response is stored in a JSON file that only the current user can
+    read. The file name starts with a hash of the URL path, so that all the
+    responses for the same path, with different query strings, can be
+    removed together. When the total size of the directory exceeds
+    ``max_size``, the least recently used files are removed.
+
+    :param path: Directory where to store the cached responses. The directory
+                 is created if it does not exist.
+    :type path: str
+    :param max_size: Maximum size of the cache directory in bytes.
+    :type max_size: int
+    :param ttl: Time in seconds during which the manifest labels and security
+                reports stay valid in the cache.
+    :type ttl: int
+    :param identity: String that identifies the user accessing the API. The
+                     responses stored for a user are not returned to other
+                     users.
+    :type identity: str
+    """
+
+    # Endpoints that can be cached, with a flag that indicates whether the
+    # returned data never change for the given digest.
+    ENDPOINTS = [
+        (re.compile(r"^repository/[^/]+/[^/]+/manifest/[a-z0-9]+:[a-f0-9]+$"), True),
+        (re.compile(r"^repository/[^/]+/[^/]+/manifest/[a-z0-9]+:[a-f0-9]+/labels$"), False),
+        (
+            re.compile(r"^repository/[^/]+/[^/]+/manifest/[a-z0-9]+:[a-f0-9]+/security$"),
+            False,
+        ),
+    ]
+
+    # Endpoints which responses can be stored and revalidated with a
+    # conditional request. These responses do not include any secret.
+    REVALIDATED_ENDPOINTS = [
+        re.compile(r"^repository/[^/]+/[^/]+$"),
+        re.compile(r"^repository/[^/]+/[^/]+/tag$"),
+        re.compile(r"^repository/[^/]+/[^/]+/permissions/(user|team)$"),
+        re.compile(r"^repository/[^/]+/[^/]+/autoprunepolicy$"),
+        re.compile(r"^organization/[^/]+$"),
+        re.compile(r"^organization/[^/]+/team/[^/]+/members$"),
+        re.compile(r"^organization/[^/]+/prototypes$"),
+        re.compile(r"^organization/[^/]+/autoprunepolicy$"),
+        re.compile(r"^organization/[^/]+/quota$"),
+    ]
+
+    # Security scan statuses for which the report is final
+    SECURITY_FINAL_STATUS = ["scanned", "unsupported"]
+
+    def __init__(self, path, max_size, ttl, identity=""):
+        """Initialize the object."""
+        self.path = os.path.expanduser(path)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.identity = identity
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0o700)
+
+    def get_policy(self, endpoint):
+        """Return whether the response from the endpoint never changes.
+
+        :param endpoint: API endpoint path, without the ``/api/v1/`` prefix.
+        :type endpoint: str
+
+        :return: ``True`` if the response never changes, ``False`` if the
+                 response must expire after ``ttl`` seconds, and ``None`` if
+                 the response cannot be cached.
+        :rtype: bool or None
+        """
+        endpoint = endpoint.strip("/")
+        for regex, immutable in self.ENDPOINTS:
+            if regex.match(endpoint):
+                return immutable
+        return None
+
+    def is_revalidated(self, endpoint):
+        """Tell if the response from the endpoint can be stored for revalidation.
+
+        :param endpoint: API endpoint path, without the ``/api/v1/`` prefix.
+        :type endpoint: str
+
+        :return: ``True`` if the response can be stored when the server
+                 returns validators.
+        :rtype: bool
+        """
+        endpoint = endpoint.strip("/")
+        return any(regex.match(endpoint) for regex in self.REVALIDATED_ENDPOINTS)
+
+    def get_prefix(self, url):
+        """Return the beginning of the file names for the URL path.
+
+        :param url: The URL of the API call. The query string is ignored.
+        :type url: :py:class:``urllib.parse.ParseResult``
+
+        :return: The file name prefix.
+        :rtype: str
+        """
+        key = self.identity + "\n" + url.netloc + url.path.rstrip("/")
+        return hashlib.sha256(to_bytes(key)).hexdigest()[:32] + "-"
+
+    def get_filename(self, url):
+        """Return the path to the file that stores the response for the URL.
+
+        :param url: The URL of the API call.
+        :type url: :py:class:``urllib.parse.ParseResult``
+
+        :return: The path to the cache file.
+        :rtype: str
+        """
+        digest = hashlib.sha256(to_bytes(url.query)).hexdigest()[:32]
+        return os.path.join(self.path, self.get_prefix(url) + digest + ".json")
+
+    def get(self, endpoint, url):
+        """Return the cached response for the given URL.
+
+        :param endpoint: API endpoint path, without the ``/api/v1/`` prefix.
+        :type endpoint: str
+        :param url: The URL of the API call.
+        :type url: :py:class:``urllib.parse.ParseResult``
+
+        :return: The response in JSON format or ``None`` if the response is
+                 not in the cache or has expired.
+        :rtype: dict or None
+        """
+        immutable = self.get_policy(endpoint)
+        if immutable is None:
+            return None
+        filename = self.get_filename(url)
+        try:
+            with open(filename, "r") as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        if not immutable and entry.get("stored", 0) + self.ttl < time.time():
+            self.misses += 1
+            # Keep the response if it can be revalidated with the server
+            if not self.get_validators(entry):
+                self.remove(filename)
+            return None
+        # Update the access time for the LRU eviction
+        try:
+            os.utime(filename, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return entry.get("json")
+
+    def get_validators(self, entry):
+        """Return the request headers for revalidating a stored response.
+
+        :param entry: The stored response, or the response headers.
+        :type entry: dict
+
+        :return: The ``If-None-Match`` and ``If-Modified-Since`` headers, or
+                 an empty dictionary if the server did not provide validators.
+        :rtype: dict
+        """
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def get_stale(self, endpoint, url):
+        """Return a stored response that must be revalidated before use.
+
+        :param endpoint: API endpoint path, without the ``/api/v1/`` prefix.
+        :type endpoint: str
+        :param url: The URL of the API call.
+        :type url: :py:class:``urllib.parse.ParseResult``
+
+        :return: A tuple with the stored response in JSON format and the
+                 headers for the conditional request, or ``None`` if no
+                 response with validators is stored for the URL.
+        :rtype: tuple or None
+        """
+        if self.get_policy(endpoint) is True:
+            return None
+        if self.get_policy(endpoint) is None and not self.is_revalidated(endpoint):
+            return None
+        try:
+            with open(self.get_filename(url), "r") as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        validators = self.get_validators(entry)
+        if not validators:
+            return None
+        return (entry.get("json"), validators)
+
+    def refresh(self, url):
+        """Record that the server has confirmed a stored response (``304``).
+
+        :param url: The URL of the API call.
+        :type url: :py:class:``urllib.parse.ParseResult``
+        """
+        self.revalidated += 1
+        try:
+            os.utime(self.get_filename(url), None)
+        except OSError:
+            pass
+
+    def set(self, endpoint, url, response_json, headers=None):
+        """Store a response in the cache.
+
+        :param endpoint: API endpoint path, without the ``/api/v1/`` prefix.
+        :type endpoint: str
+        :param url: The URL of the API call.
+        :type url: :py:class:``urllib.parse.ParseResult``
+        :param response_json: The response to store.
+        :type response_json: dict
+        :param headers: The response headers, from which the ``ETag`` and
+                        ``Last-Modified`` validators are extracted.
+        :type headers: dict
+        """
+        headers = dict((k.lower(), v) for k, v in (headers or {}).items())
+        validators = {
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+        }
+        if self.get_policy(endpoint) is None and (
+            not self.is_revalidated(endpoint) or not self.get_validators(validators)
+        ):
+            return
+        # Do not store the security report when the scan is not complete
+        if (
+            endpoint.strip("/").endswith("/security")
+            and isinstance(response_json, dict)
+            and response_json.get("status") not in self.SECURITY_FINAL_STATUS
+        ):
+            return
+
+        entry = {"url": url.geturl(), "stored": time.time(), "json": response_json}
+        entry.update(validators)
+        try:
+            fd, tmp_name = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        except (IOError, OSError):
+            return
+        try:
+            # mkstemp() already creates the file with the 0600 permissions,
+            # but do not depend on it: the responses must stay private
+            os.chmod(tmp_name, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.rename(tmp_name, self.get_filename(url))
+        except (IOError, OSError, TypeError, ValueError):
+            self.remove(tmp_name)
+            return
+        self.evict()
+
+    def invalidate(self, endpoint, url):
+        """Remove the cached responses for the given URL path.
+
+        The responses for all the query strings of the path are removed, such
+        as the pages of a listing.
+
+        :param endpoint: API endpoint path, without the ``/api/v1/`` prefix.
+        :type endpoint: str
+        :param url: The URL of the API call. The query string is ignored.
+        :type url: :py:class:``urllib.parse.ParseResult``
+        """
+        prefix = self.get_prefix(url)
+        try:
+            filenames = os.listdir(self.path)
+        except OSError:
+            return
+        for name in filenames:
+            if name.startswith(prefix):
+                self.remove(os.path.join(self.path, name))
+
+    def remove(self, filename):
+        """Remove a file from the cache directory, ignoring errors."""
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def evict(self):
+        """Remove the least recently used files until the cache fits."""
+        entries = []
+        total_size = 0
+        try:
+            filenames = os.listdir(self.path)
+        except OSError:
+            return
+        for name in filenames:
+            if not name.endswith(".json"):
+                continue
+            filename = os.path.join(self.path, name)
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, filename))
+            total_size += st.st_size
+
+        if total_size <= self.max_size:
+            return
+        entries.sort()
+        for _mtime, size, filename in entries:
+            self.remove(filename)
+            total_size -= size
+            if total_size <= self.max_size:
+                break
@@ -0,0 +1,164 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import random
+import socket
+import threading
+import time
+from email.utils import parsedate_tz, mktime_tz
+
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.error import HTTPError, URLError
+
+
+class RetryPolicy(object):
+    """Decide whether and when to send a failed API request again.
+
+    The requests are sent again when the server returns a temporary error
+    (``429``, ``502``, ``503``, or ``504``) or when a network error occurs.
+    The delay between the attempts grows exponentially, with a random part
+    (jitter) so that parallel requests do not retry at the same time. When
+    the server returns a ``Retry-After`` header, that delay is used instead.
+
+    Only the idempotent methods (``GET``, ``HEAD``, ``PUT``, ``DELETE``, ...)
+    are retried after a server or a network error, because the server might
+    have processed the request before failing. Other methods, such as
+    ``POST``, are only retried when the server explicitly rejects the request
+    with a ``429`` code.
+
+    :param max_retries: Maximum number of times a request is sent again.
+                        ``0`` disables the retries.
+    :type max_retries: int
+    :param backoff: Base delay in seconds. The delay before the nth retry is a
+                    random value between ``0`` and ``backoff * 2^(n-1)``.
+    :type backoff: float
+    :param max_delay: Maximum delay in seconds between two attempts, including
+                      the delay requested by the ``Retry-After`` header.
+    :type max_delay: float
+    """
+
+    RETRY_STATUS_CODES = [429, 502, 503, 504]
+    IDEMPOTENT_METHODS = ["GET", "HEAD", "OPTIONS", "TRACE", "PUT", "DELETE"]
+
+    def __init__(self, max_retries=3, backoff=1.0, max_delay=30.0):
+        """Initialize the object."""
+        self.max_retries = max(max_retries or 0, 0)
+        self.backoff = max(backoff or 0, 0)
+        self.max_delay = max(max_delay or 0, 0)
+        self.lock = threading.Lock()
+        self.retries = 0
+
+    def is_retryable(self, method, error):
+        """Tell if a request that failed with the given error can be retried.
+
+        :param method: The HTTP method of the request.
+        :type method: str
+        :param error: The exception raised when sending the request.
+        :type error: Exception
+
+        :return: ``True`` if the request can be sent again.
+        :rtype: bool
+        """
+        if isinstance(error, HTTPError):
+            if error.code not in self.RETRY_STATUS_CODES:
+                return False
+            return error.code == 429 or method.upper() in self.IDEMPOTENT_METHODS
+        if isinstance(error, (URLError, socket.error, http_client.HTTPException)):
+            return method.upper() in self.IDEMPOTENT_METHODS
+        return False
+
+    def get_retry_after(self, error):
+        """Return the delay that the server requests in ``Retry-After``.
+
+        :param error: The HTTP error returned by the server.
+        :type error: :py:class:``urllib.error.HTTPError``
+
+        :return: The delay in seconds or ``None`` if the header is missing or
+                 invalid. The header can provide a number of seconds or a date.
+        :rtype: float or None
+        """
+        headers = getattr(error, "headers", None)
+        if headers is None:
+            return None
+        value = headers.get("Retry-After")
+        if not value:
+            return None
+        value = value.strip()
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        date = parsedate_tz(value)
+        if date is None:
+            return None
+        return max(mktime_tz(date) - time.time(), 0)
+
+    def get_delay(self, attempt, error=None):
+        """Return the time to wait before the next attempt.
+
+        :param attempt: The number of the attempt that just failed, starting
+                        at 1.
+        :type attempt: int
+        :param error: The exception raised by the failed attempt.
+        :type error: Exception
+
+        :return: The delay in seconds.
+        :rtype: float
+        """
+        delay = self.get_retry_after(error) if isinstance(error, HTTPError) else None
+        if delay is None:
+            delay = random.uniform(0, self.backoff * (2 ** (attempt - 1)))
+        return min(delay, self.max_delay)
+
+    def get_retry_delay(self, method, attempt, error):
+        """Return the time to wait if the request can be sent again.
+
+        The method counts the retry but does not wait.
+        :py:meth:``should_retry``, which the
+        :py:meth:``api_module.APIModule.send_request`` loop calls after each
+        failed attempt, sleeps for the returned delay.
+
+        :param method: The HTTP method of the request.
+        :type method: str
+        :param attempt: The number of the attempt that just failed, starting
+                        at 1.
+        :type attempt: int
+        :param error: The exception raised by the failed attempt.
+        :type error: Exception
+
+        :return: The delay in seconds before the next attempt, or ``None`` if
+                 the error is final.
+        :rtype: float or None
+        """
+        if attempt > self.max_retries or not self.is_retryable(method, error):
+            return None
+        with self.lock:
+            self.retries += 1
+        return self.get_delay(attempt, error)
+
+    def should_retry(self, method, attempt, error):
+        """Wait before the next attempt if the request can be sent again.
+
+        :param method: The HTTP method of the request.
+        :type method: str
+        :param attempt: The number of the attempt that just failed, starting
+                        at 1.
+        :type attempt: int
+        :param error: The exception raised by the failed attempt.
+        :type error: Exception
+
+        :return: ``True`` if the caller must send the request again, after the
+                 method has waited for the delay, or ``False`` if the error is
+                 final.
+        :rtype: bool
+        """
+        delay = self.get_retry_delay(method, attempt, error)
+        if delay is None:
+            return False
+        time.sleep(delay)
+        return True
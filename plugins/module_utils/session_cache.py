@@ -0,0 +1,167 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from ansible.module_utils._text import to_bytes, to_text
+from ansible.module_utils.six.moves import http_cookiejar
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+
+# Cookie attributes to save and restore
+COOKIE_ATTRIBUTES = [
+    "version",
+    "name",
+    "value",
+    "port",
+    "port_specified",
+    "domain",
+    "domain_specified",
+    "domain_initial_dot",
+    "path",
+    "path_specified",
+    "secure",
+    "expires",
+    "discard",
+    "comment",
+    "comment_url",
+    "rfc2109",
+]
+
+
+class SessionCache(object):
+    """Save and restore web sessions between module runs.
+
+    When authenticating with a username and a password, the module signs in
+    to Quay, which returns session cookies and a CSRF token. The object stores
+    those cookies and that token in a file, so that later tasks can reuse the
+    session instead of signing in again.
+
+    The file is encrypted with a key derived from the user's password. Only
+    the tasks that know the password can read the session.
+
+    :param path: Directory where to store the sessions. The directory is
+                 created if it does not exist.
+    :type path: str
+    :param host: The URL of the Quay server.
+    :type host: str
+    :param username: The name of the user who owns the session.
+    :type username: str
+    :param password: The user's password, used to encrypt the session.
+    :type password: str
+    """
+
+    PBKDF2_ITERATIONS = 100000
+
+    def __init__(self, path, host, username, password):
+        """Initialize the object."""
+        self.path = os.path.expanduser(path)
+        self.host = host
+        self.username = username
+        self.password = password
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0o700)
+        name = hashlib.sha256(to_bytes(host + "\n" + username)).hexdigest()
+        self.filename = os.path.join(self.path, name + ".session")
+
+    def get_fernet(self, salt):
+        """Return the object that encrypts and decrypts the session.
+
+        :param salt: Random data used to derive the key from the password.
+        :type salt: bytes
+
+        :return: The encryption object.
+        :rtype: :py:class:``cryptography.fernet.Fernet``
+        """
+        key = hashlib.pbkdf2_hmac(
+            "sha256",
+            to_bytes(self.password),
+            salt + to_bytes(self.host + "\n" + self.username),
+            self.PBKDF2_ITERATIONS,
+        )
+        return Fernet(base64.urlsafe_b64encode(key))
+
+    def load(self, cookies):
+        """Restore a session.
+
+        :param cookies: The cookie jar in which to add the session cookies.
+        :type cookies: :py:class:``http.cookiejar.CookieJar``
+
+        :return: The CSRF token of the session, or ``None`` if no session has
+                 been saved or if the session cannot be read.
+        :rtype: str or None
+        """
+        try:
+            with open(self.filename, "r") as f:
+                entry = json.load(f)
+            salt = base64.b64decode(entry["salt"])
+            data = self.get_fernet(salt).decrypt(to_bytes(entry["data"]))
+            session = json.loads(to_text(data))
+        except (IOError, OSError, ValueError, KeyError, TypeError, InvalidToken):
+            return None
+
+        for c in session.get("cookies", []):
+            try:
+                cookie = http_cookiejar.Cookie(
+                    rest={}, **dict((k, c.get(k)) for k in COOKIE_ATTRIBUTES)
+                )
+            except TypeError:
+                continue
+            cookies.set_cookie(cookie)
+        return session.get("token")
+
+    def save(self, cookies, token):
+        """Save a session.
+
+        :param cookies: The cookie jar that contains the session cookies.
+        :type cookies: :py:class:``http.cookiejar.CookieJar``
+        :param token: The CSRF token of the session.
+        :type token: str
+        """
+        session = {
+            "token": token,
+            "saved": time.time(),
+            "cookies": [dict((k, getattr(c, k)) for k in COOKIE_ATTRIBUTES) for c in cookies],
+        }
+        salt = os.urandom(16)
+        data = self.get_fernet(salt).encrypt(to_bytes(json.dumps(session)))
+        entry = {
+            "salt": to_text(base64.b64encode(salt)),
+            "data": to_text(data),
+        }
+        try:
+            fd, tmp_name = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.rename(tmp_name, self.filename)
+        except (IOError, OSError):
+            try:
+                os.remove(tmp_name)
+            except OSError:
+                pass
+
+    def remove(self):
+        """Remove the saved session."""
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
@@ -189,31 +189,44 @@ def main():
             ).format(name=image)
         )
 
-    # Check whether the namespace exists (organization or user account)
-    namespace_details = module.get_namespace(namespace)
-    if not namespace_details:
-        if state == "absent":
-            module.exit_json(changed=False)
-        module.fail_json(
-            msg="The {namespace} namespace does not exist.".format(namespace=namespace)
+    # Get the digest with the registry API. When the registry resolves the
+    # tag, the namespace exists.
+    manifest_digest = None
+    if not img.digest:
+        manifest_digest = module.digest_resolver.get_registry_digest(
+            namespace, img.repository, img.tag
         )
 
-    # Get the digest
-    if img.digest:
-        manifest_digest = img.digest
-    else:
-        tags = module.get_tags(namespace, img.repository, img.tag, only_active_tags=False)
-        if not tags:
-            module.fail_json(msg="The {image} image does not exist.".format(image=image))
-        try:
-            manifest_digest = tags[0]["manifest_digest"]
-        except KeyError:
+    if not manifest_digest:
+        # Check whether the namespace exists (organization or user account)
+        namespace_details = module.get_namespace(namespace)
+        if not namespace_details:
+            if state == "absent":
+                module.exit_json(changed=False)
             module.fail_json(
-                msg="Cannot retrieve the manifest digest for the {image} image.".format(
-                    image=image
-                )
+                msg="The {namespace} namespace does not exist.".format(namespace=namespace)
             )
 
+        # Get the digest
+        if img.digest:
+            manifest_digest = img.digest
+        else:
+            # Only the first tag in the tag history is needed
+            tag_details = next(
+                module.iter_tags(namespace, img.repository, img.tag, only_active_tags=False),
+                None,
+            )
+            if not tag_details:
+                module.fail_json(msg="The {image} image does not exist.".format(image=image))
+            try:
+                manifest_digest = tag_details["manifest_digest"]
+            except KeyError:
+                module.fail_json(
+                    msg="Cannot retrieve the manifest digest for the {image} image.".format(
+                        image=image
+                    )
+                )
+
     full_repo_name = "{namespace}/{repository}".format(
         namespace=namespace, repository=img.repository
     )
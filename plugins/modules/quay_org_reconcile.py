@@ -0,0 +1,1424 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# For accessing the API documentation from a running system, use the swagger-ui
+# container image:
+#
+#  $ podman run -p 8888:8080 --name=swag -d --rm \
+#      -e API_URL=http://your.quay.installation:8080/api/v1/discovery \
+#      docker.io/swaggerapi/swagger-ui
+#
+#  (replace the hostname and port in API_URL with your own installation)
+#
+# And then navigate to http://localhost:8888
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+DOCUMENTATION = r"""
+---
+module: quay_org_reconcile
+short_description: Configure a Quay Container Registry organization in a single task
+description:
+  - Create an organization and configure its user accounts, robot accounts,
+    teams, default permissions, OAuth applications, repositories, and quota
+    in a single task.
+  - The module uses the same data model as the P(herve4m.quay.quay_org#role)
+    role.
+  - The module retrieves the current state of the organization once, computes
+    the changes, and then applies them in order. User and robot accounts
+    first, then teams, default permissions, applications, repositories, and
+    finally the quota.
+version_added: '1.6.0'
+author: Hervé Quatremain (@herve4m)
+options:
+  name:
+    description:
+      - Name of the organization to create or update.
+      - The name must be in lowercase and must not contain white spaces. For
+        compatibility with earlier versions of Docker, the name must be at
+        least four characters long.
+    required: true
+    type: str
+  email:
+    description:
+      - Email address to associate with the organization.
+      - If your Quay administrator has enabled the mailing capability of your
+        Quay installation (C(FEATURE_MAILING) to C(true) in C(config.yaml)),
+        then this I(email) parameter is mandatory when you create the
+        organization.
+    type: str
+  auto_prune_method:
+    description:
+      - Method to use for the auto-pruning tags policy of the organization.
+      - If C(none), then the module ensures that no policy is in place. The
+        tags are not pruned.
+      - If C(tags), then the policy keeps only the number of tags that you
+        specify in I(auto_prune_value).
+      - If C(date), then the policy deletes the tags older than the time period
+        that you specify in I(auto_prune_value).
+      - I(auto_prune_value) is required when I(auto_prune_method) is C(tags)
+        or C(date).
+    type: str
+    choices: [none, tags, date]
+  auto_prune_value:
+    description:
+      - Number of tags to keep when I(auto_prune_value) is C(tags). The value
+        must be 1 or more.
+      - Period of time when I(auto_prune_value) is C(date). The value must be
+        1 or more, and must be followed by a suffix; s (for second), m (for
+        minute), h (for hour), d (for day), or w (for week).
+      - I(auto_prune_method) is required when I(auto_prune_value) is set.
+    type: str
+  users:
+    description:
+      - List of user accounts to create.
+      - The module sets the password only when it creates the account.
+    type: list
+    elements: dict
+    suboptions:
+      username:
+        description:
+          - Name of the user account.
+        required: true
+        type: str
+      email:
+        description:
+          - User's email address.
+        type: str
+      password:
+        description:
+          - User's password as a clear string.
+          - The password must be at least eight characters long and must not
+            contain white spaces.
+        type: str
+  robots:
+    description:
+      - List of robot accounts to create in the organization.
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description:
+          - Name of the robot account. You can omit the C(organization)+
+            prefix.
+        required: true
+        type: str
+      description:
+        description:
+          - Description of the robot account. You cannot update the description
+            of existing robot accounts.
+        type: str
+  teams:
+    description:
+      - List of teams to create or update in the organization.
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description:
+          - Name of the team.
+        required: true
+        type: str
+      role:
+        description:
+          - Role of the team within the organization. If not set, then the new
+            team has the C(member) role.
+        type: str
+        choices: [member, creator, admin]
+      description:
+        description:
+          - Text in Markdown format that describes the team.
+        type: str
+      members:
+        description:
+          - List of the user or robot accounts in the team. Use the syntax
+            C(organization)+C(robotshortname) for robot accounts.
+          - The module removes the members that are not in the list.
+          - If you do not set the parameter, then the module does not change
+            the team members.
+        type: list
+        elements: str
+  default_perms:
+    description:
+      - List of the default permissions to assign to the repositories that
+        users create in the organization.
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description:
+          - Name of the user or team that gets permission to new created
+            repositories in the organization.
+          - For robot accounts use the C(organization)+C(shortrobotname)
+            format.
+        required: true
+        type: str
+      type:
+        description:
+          - Type of the account defined in I(name).
+          - With C(robot), you can omit the C(organization)+ prefix in
+            I(name).
+        type: str
+        choices: [user, robot, team]
+        default: user
+      role:
+        description:
+          - Permission that Quay automatically grants to the user or team on
+            new created repositories in the organization.
+          - If you do not set the parameter, then the module uses C(read) when
+            it creates the default permission.
+        type: str
+        choices: [read, write, admin]
+      creator:
+        description:
+          - Quay applies the default permission only when repositories are
+            created by the user that you define in I(creator).
+          - You can only use regular user accounts.
+        type: str
+  applications:
+    description:
+      - List of the OAuth applications to create or update in the
+        organization.
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description:
+          - Name of the application.
+        required: true
+        type: str
+      description:
+        description:
+          - Description for the application.
+        type: str
+      application_uri:
+        description:
+          - URL to the application home page.
+        type: str
+      redirect_uri:
+        description:
+          - Prefix of the application's OAuth redirection/callback URLs.
+        type: str
+      avatar_email:
+        description:
+          - Email address that represents the avatar for the application.
+        type: str
+  repositories:
+    description:
+      - List of the repositories to create, remove, or modify.
+      - The items accept the same parameters as the items of the
+        I(repositories) parameter of the M(herve4m.quay.quay_repositories)
+        module.
+      - If you omit the namespace part in the repository name, then the
+        module creates the repository in the organization.
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description:
+          - Name of the repository.
+        required: true
+        type: str
+      visibility:
+        description:
+          - Visibility of the repository.
+        type: str
+        choices: [public, private]
+      description:
+        description:
+          - Text in Markdown format that describes the repository.
+        type: str
+      perms:
+        description:
+          - User, robot, and team permissions to associate with the
+            repository.
+        type: list
+        elements: dict
+        suboptions:
+          type:
+            description:
+              - Specifies the type of the account. Choose C(user) for both
+                user and robot accounts.
+            type: str
+            choices: [user, team]
+            default: user
+          name:
+            description:
+              - Name of the account.
+            required: true
+            type: str
+          role:
+            description:
+              - Type of permission to grant.
+            type: str
+            choices: [read, write, admin]
+            default: read
+      append:
+        description:
+          - If C(yes), then add the permission defined in I(perms) to the
+            repository.
+          - If C(no), then the module sets the permissions specified in
+            I(perms), removing all others permissions from the repository.
+        type: bool
+        default: yes
+      star:
+        description:
+          - If C(yes), then add a star to the repository. If C(no), then remove
+            the star.
+        type: bool
+      repo_state:
+        description:
+          - State of the repository.
+        type: str
+        choices: [NORMAL, READ_ONLY, MIRROR]
+      auto_prune_method:
+        description:
+          - Method to use for the auto-pruning tags policy.
+        type: str
+        choices: [none, tags, date]
+      auto_prune_value:
+        description:
+          - Number of tags to keep, or period of time, depending on
+            I(auto_prune_method).
+        type: str
+      state:
+        description:
+          - If C(absent), then the module deletes the repository.
+          - If C(present), then the module creates or updates the repository.
+        type: str
+        default: present
+        choices: [absent, present]
+  quota:
+    description:
+      - Quota that Quay uses to compute the warning and reject limits for the
+        organization.
+      - You specify a quota in bytes, but you can also use the K[i]B, M[i]B,
+        G[i]B, or T[i]B suffixes.
+    type: str
+  warning_pct:
+    description:
+      - Warning (soft) limit as a percentage of the quota.
+      - Set I(warning_pct) to C(0) to remove the warning limit.
+    type: int
+  reject_pct:
+    description:
+      - Reject (hard) limit as a percentage of the quota.
+      - Set I(reject_pct) to C(0) to remove the reject limit.
+    type: int
+notes:
+  - The module processes the items of each list in parallel when you set the
+    I(quay_parallel_requests) parameter to a value greater than 1.
+  - The module processes all the items of a list even if some of them fail.
+    It then reports the failures and does not process the following lists,
+    which might depend on the failed items.
+  - The module does not remove the user accounts, robot accounts, teams,
+    default permissions, and applications that are not listed in the
+    parameters.
+  - Creating user accounts requires superuser permissions.
+  - Supports C(check_mode).
+  - The token that you provide in I(quay_token) must have the "Administer
+    Organization", "Administer Repositories", "Create Repositories", and
+    "Super User Access" permissions.
+extends_documentation_fragment:
+  - herve4m.quay.auth
+  - herve4m.quay.auth.login
+"""
+
+EXAMPLES = r"""
+- name: Ensure the production organization is configured
+  herve4m.quay.quay_org_reconcile:
+    name: production
+    email: production@example.com
+    auto_prune_method: tags
+    auto_prune_value: 15
+    users:
+      - username: lvasquez
+        email: lvasquez@example.com
+        password: vs9mrD55NP
+      - username: dwilde
+        email: dwilde@example.com
+    robots:
+      - name: robotprod
+    teams:
+      - name: qa
+        role: member
+        members:
+          - lvasquez
+      - name: ops
+        description: Operators
+        role: creator
+        members:
+          - dwilde
+          - production+robotprod
+    default_perms:
+      - name: ops
+        type: team
+        role: write
+    applications:
+      - name: oauth_app
+    repositories:
+      - name: small_image
+        visibility: private
+        perms:
+          - name: qa
+            type: team
+            role: read
+    quota: 1.5 TiB
+    warning_pct: 90
+    reject_pct: 97
+    quay_parallel_requests: 8
+    quay_host: https://quay.example.com
+    quay_token: vgfH9zH5q6eV16Con7SvDQYSr0KPYQimMHVehZv7
+
+- name: Ensure the organization from the quay_org role variables is configured
+  herve4m.quay.quay_org_reconcile:
+    name: "{{ quay_org_name }}"
+    email: "{{ quay_org_email | default(omit) }}"
+    users: "{{ quay_org_users | default(omit) }}"
+    robots: "{{ quay_org_robots | default(omit) }}"
+    teams: "{{ quay_org_teams | default(omit) }}"
+    default_perms: "{{ quay_org_default_perms | default(omit) }}"
+    applications: "{{ quay_org_applications | default(omit) }}"
+    repositories: "{{ quay_org_repositories | default(omit) }}"
+    quay_parallel_requests: 8
+    quay_host: https://quay.example.com
+    quay_token: vgfH9zH5q6eV16Con7SvDQYSr0KPYQimMHVehZv7
+"""
+
+RETURN = r"""
+organization:
+  description: Whether the organization or its auto-pruning policy changed.
+  returned: always
+  type: bool
+  sample: false
+users:
+  description: Result of the processing of each user account.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: Name of the object.
+      type: str
+      returned: always
+      sample: lvasquez
+    changed:
+      description: Whether the object has been changed.
+      type: bool
+      returned: always
+      sample: true
+    failed:
+      description: Whether the processing of the object has failed.
+      type: bool
+      returned: always
+      sample: false
+    msg:
+      description: Error message.
+      type: str
+      returned: when the processing of the object has failed
+      sample: "Unable to create user lvasquez: 403"
+robots:
+  description:
+    - Result of the processing of each robot account.
+    - The items have the same format as the items in I(users).
+  returned: always
+  type: list
+  elements: dict
+teams:
+  description:
+    - Result of the processing of each team.
+    - The items have the same format as the items in I(users).
+  returned: always
+  type: list
+  elements: dict
+default_perms:
+  description:
+    - Result of the processing of each default permission.
+    - The items have the same format as the items in I(users).
+  returned: always
+  type: list
+  elements: dict
+applications:
+  description:
+    - Result of the processing of each application.
+    - The items have the same format as the items in I(users).
+  returned: always
+  type: list
+  elements: dict
+repositories:
+  description:
+    - Result of the processing of each repository.
+    - The items have the same format as the items in I(users).
+  returned: always
+  type: list
+  elements: dict
+quota:
+  description: Whether the quota changed.
+  returned: always
+  type: bool
+  sample: false
+"""
+
+from ..module_utils.api_module import APIModule, APIModuleError
+from ..module_utils.repository import (
+    REPOSITORY_ARGSPEC,
+    REPOSITORY_REQUIRED_BY,
+    REPOSITORY_REQUIRED_IF,
+    RepositoryManager,
+)
+
+
+# Multipliers for the quota suffixes, in the order in which the suffixes are
+# looked for
+QUOTA_UNITS = [
+    ("tib", 1024 * 1024 * 1024 * 1024),
+    ("tb", 1000 * 1000 * 1000 * 1000),
+    ("gib", 1024 * 1024 * 1024),
+    ("gb", 1000 * 1000 * 1000),
+    ("mib", 1024 * 1024),
+    ("mb", 1000 * 1000),
+    ("kib", 1024),
+    ("kb", 1000),
+]
+
+
+def parse_quota(quota):
+    """Convert the given quota to bytes.
+
+    :param quota: The quota, with an optional unit suffix (``1.5 TiB``).
+    :type quota: str
+
+    :raises APIModuleError: The quota has a wrong format.
+
+    :return: The quota in bytes.
+    :rtype: int
+    """
+    q = quota.lower()
+    mult = 1
+    for suffix, value in QUOTA_UNITS:
+        if suffix in q:
+            q = q.replace(suffix, "")
+            mult = value
+            break
+    try:
+        return int(float(q.replace(" ", "")) * mult)
+    except ValueError:
+        raise APIModuleError(
+            "Wrong format for the `quota' parameter: {quota} is not a float.".format(
+                quota=quota
+            )
+        )
+
+
+def run_phase(module, function, items, key="name"):
+    """Process items in parallel and return the result for each item.
+
+    :param module: The module object.
+    :type module: :py:class:``APIModule``
+    :param function: The function that processes an item. The function
+                     returns ``True`` if the item has changed, and raises
+                     :py:class:``APIModuleError`` on error.
+    :type function: function
+    :param items: The items to process.
+    :type items: list
+    :param key: The item key that gives the name of the item.
+    :type key: str
+
+    :return: A dictionary for each item, with the ``name``, ``changed``,
+             ``failed``, and ``msg`` keys.
+    :rtype: list
+    """
+
+    def run(item):
+        result = {"name": item[key], "changed": False, "failed": False}
+        try:
+            result["changed"] = bool(function(item))
+        except APIModuleError as e:
+            result["failed"] = True
+            result["msg"] = str(e)
+        return result
+
+    return module.map_parallel(run, items)
+
+
+def find_prototype(prototypes, name, kind, creator):
+    """Return the default permission that matches the given parameters.
+
+    :param prototypes: The default permissions that the API returns.
+    :type prototypes: list
+    :param name: The name of the user, robot, or team.
+    :type name: str
+    :param kind: The type of account (``user`` or ``team``).
+    :type kind: str
+    :param creator: The user that creates the repositories, or ``None``.
+    :type creator: str
+
+    :return: The matching default permission, or ``None``.
+    :rtype: dict
+    """
+    for proto in prototypes:
+        delegate = proto.get("delegate") or {}
+        if delegate.get("name") != name or delegate.get("kind") != kind:
+            continue
+        activating_user = (proto.get("activating_user") or {}).get("name")
+        if (creator or None) != (activating_user or None):
+            continue
+        return proto
+    return None
+
+
+def process_auto_prune(module, orgname, policies, auto_prune_method, auto_prune_value):
+    """Create, update, or remove the auto-pruning policy of the organization.
+
+    :param module: The module object.
+    :type module: :py:class:``APIModule``
+    :param orgname: The name of the organization.
+    :type orgname: str
+    :param policies: The current policies.
+    :type policies: list
+    :param auto_prune_method: The auto-pruning method (``none``, ``tags``, or
+                              ``date``).
+    :type auto_prune_method: str
+    :param auto_prune_value: The validated auto-pruning value.
+    :type auto_prune_value: int or str
+
+    :return: ``True`` if the policy has changed.
+    :rtype: bool
+    """
+    if auto_prune_method == "none":
+        changed = False
+        for policy in policies:
+            uuid = policy.get("uuid")
+            if module.delete(
+                uuid,
+                "organization auto-prune policy",
+                orgname,
+                "organization/{orgname}/autoprunepolicy/{uuid}",
+                auto_exit=False,
+                exit_on_error=False,
+                orgname=orgname,
+                uuid=uuid,
+            ):
+                changed = True
+        return changed
+
+    method = "creation_date" if auto_prune_method == "date" else "number_of_tags"
+    new_policy = {"method": method, "value": auto_prune_value}
+    for policy in policies:
+        if policy.get("method") == method and policy.get("value") == auto_prune_value:
+            return False
+    if not policies or policies[0].get("uuid") is None:
+        module.create(
+            "organization auto-prune policy",
+            orgname,
+            "organization/{orgname}/autoprunepolicy/",
+            new_policy,
+            auto_exit=False,
+            exit_on_error=False,
+            orgname=orgname,
+        )
+        return True
+    uuid = policies[0]["uuid"]
+    new_policy["uuid"] = uuid
+    module.unconditional_update(
+        "organization auto-prune policy",
+        orgname,
+        "organization/{orgname}/autoprunepolicy/{uuid}",
+        new_policy,
+        exit_on_error=False,
+        orgname=orgname,
+        uuid=uuid,
+    )
+    return True
+
+
+def process_limit(module, orgname, qid, limit_type, pct, current_id, current_pct):
+    """Create, update, or remove a quota limit.
+
+    :param module: The module object.
+    :type module: :py:class:``APIModule``
+    :param orgname: The name of the organization.
+    :type orgname: str
+    :param qid: The quota ID.
+    :type qid: str
+    :param limit_type: The type of limit (``Warning`` or ``Reject``).
+    :type limit_type: str
+    :param pct: The requested percentage. ``0`` removes the limit.
+    :type pct: int
+    :param current_id: The ID of the existing limit, or ``None``.
+    :type current_id: str
+    :param current_pct: The percentage of the existing limit.
+    :type current_pct: int
+
+    :return: ``True`` if the limit has changed.
+    :rtype: bool
+    """
+    object_type = "{type} limit".format(type=limit_type.lower())
+    if pct == 0:
+        return module.delete(
+            current_id,
+            object_type,
+            orgname,
+            "organization/{orgname}/quota/{qid}/limit/{lid}",
+            auto_exit=False,
+            exit_on_error=False,
+            orgname=orgname,
+            qid=qid,
+            lid=current_id,
+        )
+    if not pct or pct == current_pct:
+        return False
+    new_fields = {"type": limit_type, "threshold_percent": pct}
+    if current_id is None:
+        module.create(
+            object_type,
+            orgname,
+            "organization/{orgname}/quota/{qid}/limit",
+            new_fields,
+            auto_exit=False,
+            exit_on_error=False,
+            orgname=orgname,
+            qid=qid,
+        )
+    else:
+        module.unconditional_update(
+            object_type,
+            orgname,
+            "organization/{orgname}/quota/{qid}/limit/{lid}",
+            new_fields,
+            exit_on_error=False,
+            orgname=orgname,
+            qid=qid,
+            lid=current_id,
+        )
+    return True
+
+
+def process_quota(module, orgname, org_details, quota, warning_pct, reject_pct):
+    """Create or update the quota and its limits.
+
+    :param module: The module object.
+    :type module: :py:class:``APIModule``
+    :param orgname: The name of the organization.
+    :type orgname: str
+    :param org_details: The organization details, or ``None`` if the
+                        organization does not exist yet (check mode).
+    :type org_details: dict
+    :param quota: The quota in bytes, or ``None``.
+    :type quota: int
+    :param warning_pct: The warning limit, or ``None``.
+    :type warning_pct: int
+    :param reject_pct: The reject limit, or ``None``.
+    :type reject_pct: int
+
+    :return: ``True`` if the quota has changed.
+    :rtype: bool
+    """
+    quotas = org_details.get("quotas") if org_details else None
+    quota_details = quotas[0] if quotas else {}
+    qid = str(quota_details.get("id", 0))
+    changed = False
+
+    # Without quota, the limits apply to a default quota of 8 TB
+    if quota is None and not quota_details:
+        if warning_pct is None and reject_pct is None:
+            return False
+        quota = 8000000 * 1000 * 1000 * 1000 * 1000
+
+    if quota is not None:
+        if quota_details:
+            changed, _not_used = module.update(
+                quota_details,
+                "quota",
+                orgname,
+                "organization/{orgname}/quota/{qid}",
+                {"limit_bytes": quota},
+                auto_exit=False,
+                exit_on_error=False,
+                orgname=orgname,
+                qid=qid,
+            )
+        else:
+            module.create(
+                "quota",
+                orgname,
+                "organization/{orgname}/quota",
+                {"limit_bytes": quota},
+                auto_exit=False,
+                exit_on_error=False,
+                orgname=orgname,
+            )
+            if module.check_mode:
+                return True
+            changed = True
+            obj = module.get_object_path(
+                "organization/{orgname}/quota", exit_on_error=False, orgname=orgname
+            )
+            try:
+                quota_details = obj[0]
+                qid = str(quota_details["id"])
+            except (TypeError, IndexError, KeyError):
+                raise APIModuleError(
+                    "Cannot retrieve the new quota for the {org} organization.".format(
+                        org=orgname
+                    )
+                )
+
+    current = {}
+    for limit in quota_details.get("limits", []):
+        current[limit.get("type")] = (str(limit.get("id")), limit.get("limit_percent"))
+    for limit_type, pct in (("Warning", warning_pct), ("Reject", reject_pct)):
+        current_id, current_pct = current.get(limit_type, (None, None))
+        if process_limit(module, orgname, qid, limit_type, pct, current_id, current_pct):
+            changed = True
+    return changed
+
+
+def main():
+    argument_spec = dict(
+        name=dict(required=True),
+        email=dict(),
+        auto_prune_method=dict(choices=["none", "tags", "date"]),
+        auto_prune_value=dict(),
+        users=dict(
+            type="list",
+            elements="dict",
+            options=dict(
+                username=dict(required=True),
+                email=dict(),
+                password=dict(no_log=True),
+            ),
+        ),
+        robots=dict(
+            type="list",
+            elements="dict",
+            options=dict(name=dict(required=True), description=dict()),
+        ),
+        teams=dict(
+            type="list",
+            elements="dict",
+            options=dict(
+                name=dict(required=True),
+                role=dict(choices=["member", "creator", "admin"]),
+                description=dict(),
+                members=dict(type="list", elements="str"),
+            ),
+        ),
+        default_perms=dict(
+            type="list",
+            elements="dict",
+            options=dict(
+                name=dict(required=True),
+                type=dict(choices=["user", "robot", "team"], default="user"),
+                role=dict(choices=["read", "write", "admin"]),
+                creator=dict(),
+            ),
+        ),
+        applications=dict(
+            type="list",
+            elements="dict",
+            options=dict(
+                name=dict(required=True),
+                description=dict(),
+                application_uri=dict(),
+                redirect_uri=dict(),
+                avatar_email=dict(),
+            ),
+        ),
+        repositories=dict(
+            type="list",
+            elements="dict",
+            options=REPOSITORY_ARGSPEC,
+            required_if=REPOSITORY_REQUIRED_IF,
+            required_by=REPOSITORY_REQUIRED_BY,
+        ),
+        quota=dict(),
+        warning_pct=dict(type="int"),
+        reject_pct=dict(type="int"),
+    )
+
+    # Create a module for ourselves
+    module = APIModule(
+        argument_spec=argument_spec,
+        required_if=[
+            ("auto_prune_method", "tags", ["auto_prune_value"]),
+            ("auto_prune_method", "date", ["auto_prune_value"]),
+        ],
+        required_by={
+            "auto_prune_value": "auto_prune_method",
+        },
+        supports_check_mode=True,
+    )
+
+    # Extract our parameters
+    orgname = module.params.get("name")
+    email = module.params.get("email")
+    auto_prune_method = module.params.get("auto_prune_method")
+    auto_prune_value = module.params.get("auto_prune_value")
+    users = module.params.get("users") or []
+    robots = module.params.get("robots") or []
+    teams = module.params.get("teams") or []
+    default_perms = module.params.get("default_perms") or []
+    applications = module.params.get("applications") or []
+    repositories = module.params.get("repositories") or []
+    quota = module.params.get("quota")
+    warning_pct = module.params.get("warning_pct")
+    reject_pct = module.params.get("reject_pct")
+
+    result = {
+        "changed": False,
+        "organization": False,
+        "users": [],
+        "robots": [],
+        "teams": [],
+        "default_perms": [],
+        "applications": [],
+        "repositories": [],
+        "quota": False,
+    }
+
+    def end_phase(phase):
+        """Record the results of a phase and stop the module on failures."""
+        result[phase] = results = result[phase] + phase_results
+        if any(r["changed"] for r in results):
+            result["changed"] = True
+        failures = [r for r in results if r["failed"]]
+        if failures:
+            result["msg"] = "Cannot process {count} {phase}: {errors}".format(
+                count=len(failures),
+                phase=phase.replace("_", " "),
+                errors=" ".join(
+                    "{name}: {msg}".format(name=r["name"], msg=r["msg"]) for r in failures
+                ),
+            )
+            module.fail_json(**result)
+
+    #
+    # Validate the parameters before doing any change
+    #
+
+    manager = RepositoryManager(module)
+    try:
+        if auto_prune_method is not None:
+            auto_prune_value = manager.get_auto_prune_value(
+                auto_prune_method, auto_prune_value
+            )
+        if quota is not None:
+            quota = parse_quota(quota)
+    except APIModuleError as e:
+        module.fail_json(msg=str(e))
+
+    for robot in robots:
+        if "+" in robot["name"]:
+            namespace, shortname = robot["name"].split("+", 1)
+            if namespace != orgname:
+                module.fail_json(
+                    msg="The {robot} robot account is not in the {org} organization.".format(
+                        robot=robot["name"], org=orgname
+                    )
+                )
+            robot["shortname"] = shortname
+        else:
+            robot["shortname"] = robot["name"]
+            robot["name"] = "{orgname}+{shortname}".format(
+                orgname=orgname, shortname=robot["shortname"]
+            )
+
+    for perm in default_perms:
+        if perm["type"] == "robot":
+            if "+" not in perm["name"]:
+                perm["name"] = "{orgname}+{name}".format(orgname=orgname, name=perm["name"])
+            perm["type"] = "user"
+
+    names = set()
+    for repo in repositories:
+        if "/" not in repo["name"].strip("/"):
+            repo["name"] = "{orgname}/{name}".format(
+                orgname=orgname, name=repo["name"].strip("/")
+            )
+        if repo["name"] in names:
+            module.fail_json(
+                msg="The {name} repository is listed several times.".format(name=repo["name"])
+            )
+        names.add(repo["name"])
+
+    # Accounts that the module creates. In check mode, they are considered as
+    # existing.
+    planned_accounts = set(u["username"] for u in users) | set(r["name"] for r in robots)
+
+    #
+    # User accounts
+    #
+
+    if users:
+        # Retrieve all the user accounts at once. The list also provides the
+        # account details for the team members and the permissions.
+        #
+        # GET /api/v1/superuser/users/
+        # {
+        #   "users": [
+        #     {
+        #       "kind": "user",
+        #       "name": "lvasquez",
+        #       "username": "lvasquez",
+        #       "email": "lvasquez@example.com",
+        #       "verified": true,
+        #       "avatar": {...},
+        #       "super_user": false,
+        #       "enabled": true
+        #     }
+        #   ]
+        # }
+        user_list = module.get_object_path("superuser/users/")
+        existing_users = {}
+        for user in user_list.get("users", []) if user_list else []:
+            if user.get("username"):
+                existing_users[user["username"]] = user
+        module.cache_accounts(
+            dict(
+                (n, {"name": n, "kind": "user", "is_organization": False, "is_robot": False})
+                for n in existing_users
+            )
+        )
+
+        def process_user(params):
+            username = params["username"]
+            user_details = existing_users.get(username)
+            if user_details and user_details.get("super_user"):
+                # Superusers cannot be updated
+                return False
+            created = False
+            if user_details is None:
+                new_fields = {"username": username}
+                if params.get("email"):
+                    new_fields["email"] = params["email"]
+                module.create(
+                    "user",
+                    username,
+                    "superuser/users/",
+                    new_fields,
+                    auto_exit=False,
+                    exit_on_error=False,
+                )
+                user_details = dict(new_fields, enabled=True)
+                created = True
+            new_fields = {}
+            if params.get("email"):
+                new_fields["email"] = params["email"]
+            if created and params.get("password"):
+                new_fields["password"] = params["password"]
+            updated, _not_used = module.update(
+                user_details,
+                "user",
+                username,
+                "superuser/users/{username}",
+                new_fields,
+                auto_exit=False,
+                exit_on_error=False,
+                username=username,
+            )
+            if created and not module.check_mode:
+                module.cache_accounts(
+                    {
+                        username: {
+                            "name": username,
+                            "kind": "user",
+                            "is_organization": False,
+                            "is_robot": False,
+                        }
+                    }
+                )
+            return created or updated
+
+        phase_results = run_phase(module, process_user, users, key="username")
+        end_phase("users")
+
+    #
+    # Organization
+    #
+
+    org_details = module.get_organization(orgname)
+    if not org_details:
+        new_fields = {"name": orgname}
+        if email:
+            new_fields["email"] = email
+        module.create("organization", orgname, "organization/", new_fields, auto_exit=False)
+        result["organization"] = result["changed"] = True
+        if not module.check_mode:
+            # Retrieve the new organization, with its default owners team
+            module.cache_org.pop(orgname, None)
+            org_details = module.get_organization(orgname)
+            if not org_details:
+                module.fail_json(
+                    msg="Cannot retrieve the new {orgname} organization.".format(
+                        orgname=orgname
+                    ),
+                    **result
+                )
+    elif email:
+        updated, _not_used = module.update(
+            org_details,
+            "organization",
+            orgname,
+            "organization/{orgname}",
+            {"email": email},
+            auto_exit=False,
+            orgname=orgname,
+        )
+        if updated:
+            result["organization"] = result["changed"] = True
+
+    #
+    # Retrieve the current state of the organization
+    #
+
+    state = {"robots": [], "prototypes": [], "applications": [], "policies": []}
+    members = {}
+    org_teams = org_details.setdefault("teams", {}) if org_details else {}
+
+    def read_list(key, endpoint):
+        def read():
+            data = module.get_object_path(endpoint, exit_on_error=False, orgname=orgname)
+            state[key] = data.get(key, []) if isinstance(data, dict) else []
+
+        return read
+
+    def read_members(team_name):
+        def read():
+            # GET /api/v1/organization/{orgname}/team/{teamname}/members
+            data = module.get_object_path(
+                "organization/{orgname}/team/{teamname}/members",
+                query_params={"includePending": True},
+                exit_on_error=False,
+                orgname=orgname,
+                teamname=team_name,
+            )
+            members[team_name] = set(
+                m["name"] for m in (data or {}).get("members", []) if "name" in m
+            )
+
+        return read
+
+    readers = []
+    if org_details:
+        if robots:
+            readers.append(read_list("robots", "organization/{orgname}/robots"))
+        if default_perms:
+            readers.append(read_list("prototypes", "organization/{orgname}/prototypes"))
+        if applications:
+            readers.append(read_list("applications", "organization/{orgname}/applications"))
+        if auto_prune_method is not None:
+            readers.append(read_list("policies", "organization/{orgname}/autoprunepolicy/"))
+        for team in teams:
+            if team.get("members") is not None and team["name"] in org_teams:
+                readers.append(read_members(team["name"]))
+
+    def run_reader(reader):
+        try:
+            reader()
+        except APIModuleError as e:
+            return str(e)
+        return None
+
+    for error in module.map_parallel(run_reader, readers):
+        if error:
+            module.fail_json(msg=error, **result)
+
+    # The robot accounts of the organization do not need to be looked up
+    existing_robots = {}
+    for robot in state["robots"]:
+        if robot.get("name"):
+            existing_robots[robot["name"]] = robot
+    module.cache_accounts(
+        dict(
+            (n, dict(r, is_organization=False, is_robot=True))
+            for n, r in existing_robots.items()
+        )
+    )
+
+    #
+    # Auto-pruning policy
+    #
+
+    if auto_prune_method is not None:
+        try:
+            if process_auto_prune(
+                module, orgname, state["policies"], auto_prune_method, auto_prune_value
+            ):
+                result["organization"] = result["changed"] = True
+        except APIModuleError as e:
+            module.fail_json(msg=str(e), **result)
+
+    #
+    # Robot accounts
+    #
+
+    def process_robot(params):
+        if params["name"] in existing_robots:
+            return False
+        new_fields = {}
+        if params.get("description"):
+            new_fields["description"] = params["description"]
+        data = module.unconditional_update(
+            "robot account",
+            params["name"],
+            "organization/{orgname}/robots/{robot_shortname}",
+            new_fields,
+            exit_on_error=False,
+            orgname=orgname,
+            robot_shortname=params["shortname"],
+        )
+        if data:
+            module.cache_accounts({params["name"]: dict(data, is_robot=True)})
+        return True
+
+    phase_results = run_phase(module, process_robot, robots)
+    end_phase("robots")
+
+    # Look up all the remaining accounts at once
+    account_names = set()
+    for team in teams:
+        account_names.update(team.get("members") or [])
+    for perm in default_perms:
+        if perm["type"] == "user":
+            account_names.add(perm["name"])
+        if perm.get("creator"):
+            account_names.add(perm["creator"])
+    for repo in repositories:
+        for perm in repo.get("perms") or []:
+            if perm["type"] == "user":
+                account_names.add(perm["name"])
+    if module.check_mode:
+        account_names -= planned_accounts
+    accounts = module.get_accounts(sorted(account_names))
+
+    def account_exists(name):
+        return accounts.get(name) is not None or (
+            module.check_mode and name in planned_accounts
+        )
+
+    #
+    # Teams
+    #
+
+    def process_team(params):
+        team_name = params["name"]
+        team_details = org_teams.get(team_name)
+        new_members = params.get("members")
+        if new_members is not None:
+            missing = sorted(m for m in set(new_members) if not account_exists(m))
+            if missing:
+                raise APIModuleError(
+                    "At least one user to add as team member does not exist: {users}.".format(
+                        users=", ".join(missing)
+                    )
+                )
+
+        new_fields = {"name": team_name}
+        if params.get("description") is not None:
+            new_fields["description"] = params["description"]
+        if params.get("role"):
+            new_fields["role"] = params["role"]
+        elif team_details:
+            new_fields["role"] = team_details.get("role", "member")
+        else:
+            new_fields["role"] = "member"
+        changed, _not_used = module.update(
+            team_details,
+            "team",
+            team_name,
+            "organization/{orgname}/team/{teamname}",
+            new_fields,
+            auto_exit=False,
+            exit_on_error=False,
+            orgname=orgname,
+            teamname=team_name,
+        )
+        if new_members is None:
+            return changed
+
+        current_members = members.get(team_name, set())
+        for member in sorted(set(new_members) - current_members):
+            module.unconditional_update(
+                "team member",
+                member,
+                "organization/{orgname}/team/{teamname}/members/{member}",
+                {},
+                exit_on_error=False,
+                orgname=orgname,
+                teamname=team_name,
+                member=member,
+            )
+            changed = True
+        for member in sorted(current_members - set(new_members)):
+            module.delete(
+                True,
+                "team member",
+                member,
+                "organization/{orgname}/team/{teamname}/members/{member}",
+                auto_exit=False,
+                exit_on_error=False,
+                orgname=orgname,
+                teamname=team_name,
+                member=member,
+            )
+            changed = True
+        return changed
+
+    phase_results = run_phase(module, process_team, teams)
+    end_phase("teams")
+    # Record the new teams in the cached organization details, for the
+    # repository permissions
+    for team in teams:
+        org_teams.setdefault(team["name"], {"name": team["name"]})
+    team_names = set(org_teams)
+
+    #
+    # Default permissions
+    #
+
+    def process_default_perm(params):
+        name = params["name"]
+        kind = params["type"]
+        role = params.get("role")
+        creator = params.get("creator")
+        if kind == "user" and not account_exists(name):
+            raise APIModuleError(
+                "The {user} user or robot account does not exist.".format(user=name)
+            )
+        if kind == "team" and name not in team_names:
+            raise APIModuleError(
+                "The {team} team does not exist in the {orgname} organization.".format(
+                    team=name, orgname=orgname
+                )
+            )
+        if creator:
+            if not account_exists(creator):
+                raise APIModuleError(
+                    "The {user} user account does not exist.".format(user=creator)
+                )
+            if (accounts.get(creator) or {}).get("is_robot"):
+                raise APIModuleError(
+                    (
+                        "Robot accounts cannot be used for `creator':"
+                        " {user} must be a user account."
+                    ).format(user=creator)
+                )
+
+        prototype = find_prototype(state["prototypes"], name, kind, creator)
+        if not prototype:
+            new_fields = {"delegate": {"name": name, "kind": kind}, "role": role or "read"}
+            if creator:
+                new_fields["activating_user"] = {"name": creator}
+            module.create(
+                "default permission",
+                name,
+                "organization/{orgname}/prototypes",
+                new_fields,
+                auto_exit=False,
+                exit_on_error=False,
+                orgname=orgname,
+            )
+            return True
+        if not role:
+            return False
+        updated, _not_used = module.update(
+            prototype,
+            "default permission",
+            name,
+            "organization/{orgname}/prototypes/{uuid}",
+            {"role": role},
+            auto_exit=False,
+            exit_on_error=False,
+            orgname=orgname,
+            uuid=prototype.get("id", ""),
+        )
+        return updated
+
+    phase_results = run_phase(module, process_default_perm, default_perms)
+    end_phase("default_perms")
+
+    #
+    # Applications
+    #
+
+    existing_apps = {}
+    for application in state["applications"]:
+        existing_apps[application.get("name", "")] = application
+
+    def process_application(params):
+        name = params["name"]
+        app_details = existing_apps.get(name)
+        new_fields = {"name": name}
+        for key in ("description", "application_uri", "redirect_uri"):
+            if params.get(key) is not None:
+                new_fields[key] = params[key]
+            elif app_details:
+                new_fields[key] = app_details.get(key, "")
+        if params.get("avatar_email") is not None:
+            new_fields["avatar_email"] = params["avatar_email"]
+        elif app_details and app_details.get("avatar_email"):
+            new_fields["avatar_email"] = app_details["avatar_email"]
+
+        if not app_details:
+            module.create(
+                "application",
+                name,
+                "organization/{orgname}/applications",
+                new_fields,
+                auto_exit=False,
+                exit_on_error=False,
+                orgname=orgname,
+            )
+            return True
+        updated, _not_used = module.update(
+            app_details,
+            "application",
+            name,
+            "organization/{orgname}/applications/{id}",
+            new_fields,
+            auto_exit=False,
+            exit_on_error=False,
+            orgname=orgname,
+            id=app_details.get("client_id", ""),
+        )
+        return updated
+
+    phase_results = run_phase(module, process_application, applications)
+    end_phase("applications")
+
+    #
+    # Repositories
+    #
+
+    def process_repository(params):
+        # The organization does not exist yet (check mode)
+        if not org_details and params["name"].startswith(orgname + "/"):
+            return params.get("state") == "present"
+        return manager.process(params)
+
+    phase_results = run_phase(module, process_repository, repositories)
+    end_phase("repositories")
+
+    #
+    # Quota
+    #
+
+    try:
+        if process_quota(module, orgname, org_details, quota, warning_pct, reject_pct):
+            result["quota"] = result["changed"] = True
+    except APIModuleError as e:
+        module.fail_json(msg=str(e), **result)
+
+    module.exit_json(**result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# For accessing the API documentation from a running system, use the swagger-ui
+# container image:
+#
+#  $ podman run -p 8888:8080 --name=swag -d --rm \
+#      -e API_URL=http://your.quay.installation:8080/api/v1/discovery \
+#      docker.io/swaggerapi/swagger-ui
+#
+#  (replace the hostname and port in API_URL with your own installation)
+#
+# And then navigate to http://localhost:8888
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+DOCUMENTATION = r"""
+---
+module: quay_repositories
+short_description: Manage several Quay Container Registry repositories at once
+description:
+  - Create, delete, and update several repositories in Quay Container Registry
+    in a single task.
+  - The module accepts the same repository parameters as the
+    M(herve4m.quay.quay_repository) module, but retrieves the namespaces, the
+    teams, and the user accounts only once for all the repositories.
+version_added: '1.6.0'
+author: Hervé Quatremain (@herve4m)
+options:
+  repositories:
+    description:
+      - List of the repositories to create, remove, or modify.
+    required: true
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description:
+          - Name of the repository to create, remove, or modify. The format for
+            the name is C(namespace)/C(shortname). The namespace can be an
+            organization or a personal namespace.
+          - The name must be in lowercase and must not contain white spaces.
+          - If you omit the namespace part in the name, then the module uses
+            your personal namespace.
+        required: true
+        type: str
+      visibility:
+        description:
+          - If C(public), then anyone can pull images from the repository.
+          - If C(private), then nobody can access the repository and you need
+            to explicitly grant access to users, robots, and teams.
+          - If you do not set the parameter when you create a repository, then
+            it defaults to C(private).
+        type: str
+        choices: [public, private]
+      description:
+        description:
+          - Text in Markdown format that describes the repository.
+        type: str
+      perms:
+        description:
+          - User, robot, and team permissions to associate with the repository.
+        type: list
+        elements: dict
+        suboptions:
+          type:
+            description:
+              - Specifies the type of the account. Choose C(user) for both user
+                and robot accounts.
+            type: str
+            choices: [user, team]
+            default: user
+          name:
+            description:
+              - Name of the account. The format for robot accounts is
+                C(namespace)+C(shortrobotname).
+            required: true
+            type: str
+          role:
+            description:
+              - Type of permission to grant.
+            type: str
+            choices: [read, write, admin]
+            default: read
+      append:
+        description:
+          - If C(yes), then add the permission defined in I(perms) to the
+            repository.
+          - If C(no), then the module sets the permissions specified in
+            I(perms), removing all others permissions from the repository.
+        type: bool
+        default: yes
+      star:
+        description:
+          - If C(yes), then add a star to the repository. If C(no), then remove
+            the star.
+          - To star or unstar a repository you must provide the I(quay_token)
+            parameter to authenticate. If you are not authenticated, then the
+            module ignores the I(star) parameter.
+        type: bool
+      repo_state:
+        description:
+          - If C(NORMAL), then the repository is in the default state
+            (read/write).
+          - If C(READ_ONLY), then the repository is read-only.
+          - If C(MIRROR), then the repository is a mirror and you can configure
+            it by using the M(herve4m.quay.quay_repository_mirror) module.
+          - You must enable the mirroring capability of your Quay installation
+            to use this I(repo_state) parameter.
+        type: str
+        choices: [NORMAL, READ_ONLY, MIRROR]
+      auto_prune_method:
+        description:
+          - Method to use for the auto-pruning tags policy.
+          - If C(none), then the module ensures that no policy is in place. The
+            tags are not pruned.
+          - If C(tags), then the policy keeps only the number of tags that you
+            specify in I(auto_prune_value).
+          - If C(date), then the policy deletes the tags older than the time
+            period that you specify in I(auto_prune_value).
+          - I(auto_prune_value) is required when I(auto_prune_method) is
+            C(tags) or C(date).
+        type: str
+        choices: [none, tags, date]
+      auto_prune_value:
+        description:
+          - Number of tags to keep when I(auto_prune_value) is C(tags).
+            The value must be 1 or more.
+          - Period of time when I(auto_prune_value) is C(date). The value must
+            be 1 or more, and must be followed by a suffix; s (for second), m
+            (for minute), h (for hour), d (for day), or w (for week).
+          - I(auto_prune_method) is required when I(auto_prune_value) is set.
+        type: str
+      state:
+        description:
+          - If C(absent), then the module deletes the repository.
+          - The module does not fail if the repository does not exist, because
+            the state is already as expected.
+          - If C(present), then the module creates the repository if it does
+            not already exist.
+          - If the repository already exists, then the module updates its
+            state.
+        type: str
+        default: present
+        choices: [absent, present]
+notes:
+  - The module processes the repositories in parallel when you set the
+    I(quay_parallel_requests) parameter to a value greater than 1.
+  - The module processes all the repositories even if some of them fail. The
+    module reports the failures at the end.
+  - Your Quay administrator must enable the mirroring capability of your Quay
+    installation (C(FEATURE_REPO_MIRROR) in C(config.yaml)) to use the
+    I(repo_state) parameter.
+  - Your Quay administrator must enable the auto-prune capability of your Quay
+    installation (C(FEATURE_AUTO_PRUNE) in C(config.yaml)) to use the
+    I(auto_prune_method) and I(auto_prune_value) parameters.
+  - Supports C(check_mode).
+  - The token that you provide in I(quay_token) must have the "Administer
+    Repositories" and "Create Repositories" permissions.
+extends_documentation_fragment:
+  - herve4m.quay.auth
+  - herve4m.quay.auth.login
+"""
+
+EXAMPLES = r"""
+- name: Ensure the repositories exist in the production organization
+  herve4m.quay.quay_repositories:
+    repositories:
+      - name: production/smallimage
+        visibility: private
+        perms:
+          - name: operators
+            type: team
+            role: read
+          - name: production+automationrobot
+            type: user
+            role: admin
+      - name: production/bigimage
+        visibility: public
+        auto_prune_method: tags
+        auto_prune_value: 20
+      - name: production/testimg
+        state: absent
+    quay_parallel_requests: 8
+    quay_host: https://quay.example.com
+    quay_token: vgfH9zH5q6eV16Con7SvDQYSr0KPYQimMHVehZv7
+
+- name: Ensure the repositories from the inventory variable exist
+  herve4m.quay.quay_repositories:
+    repositories: "{{ quay_org_repositories }}"
+    quay_parallel_requests: 8
+    quay_host: https://quay.example.com
+    quay_token: vgfH9zH5q6eV16Con7SvDQYSr0KPYQimMHVehZv7
+"""
+
+RETURN = r"""
+repositories:
+  description: Result of the processing of each repository.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: Name of the repository.
+      type: str
+      returned: always
+      sample: production/smallimage
+    changed:
+      description: Whether the repository has been changed.
+      type: bool
+      returned: always
+      sample: true
+    failed:
+      description: Whether the processing of the repository has failed.
+      type: bool
+      returned: always
+      sample: false
+    msg:
+      description: Error message.
+      type: str
+      returned: when the processing of the repository has failed
+      sample: "The production namespace does not exist."
+  sample: [
+            {
+              "name": "production/smallimage",
+              "changed": true,
+              "failed": false
+            },
+            {
+              "name": "production/bigimage",
+              "changed": false,
+              "failed": false
+            }
+          ]
+"""
+
+from ..module_utils.api_module import APIModule, APIModuleError
+from ..module_utils.repository import (
+    REPOSITORY_ARGSPEC,
+    REPOSITORY_REQUIRED_BY,
+    REPOSITORY_REQUIRED_IF,
+    RepositoryManager,
+)
+
+
+def main():
+    argument_spec = dict(
+        repositories=dict(
+            type="list",
+            elements="dict",
+            required=True,
+            options=REPOSITORY_ARGSPEC,
+            required_if=REPOSITORY_REQUIRED_IF,
+            required_by=REPOSITORY_REQUIRED_BY,
+        ),
+    )
+
+    # Create a module for ourselves
+    module = APIModule(argument_spec=argument_spec, supports_check_mode=True)
+
+    # Extract our parameters
+    repositories = module.params.get("repositories")
+
+    manager = RepositoryManager(module)
+
+    # Verify the repository names before doing any change
+    names = set()
+    namespaces = set()
+    for repo in repositories:
+        try:
+            namespace, repo_shortname = manager.split_name(repo["name"])
+        except APIModuleError as e:
+            module.fail_json(msg=str(e))
+        full_repo_name = "{namespace}/{repository}".format(
+            namespace=namespace, repository=repo_shortname
+        )
+        if full_repo_name in names:
+            module.fail_json(
+                msg="The {name} repository is listed several times.".format(
+                    name=full_repo_name
+                )
+            )
+        names.add(full_repo_name)
+        if repo.get("state") == "present":
+            namespaces.add(namespace)
+
+    # Retrieve the namespaces only once for all the repositories
+    def get_namespace(namespace):
+        try:
+            manager.get_namespace(namespace)
+        except APIModuleError as e:
+            return str(e)
+        return None
+
+    for error in module.map_parallel(get_namespace, sorted(namespaces)):
+        if error:
+            module.fail_json(msg=error)
+
+    # Process the repositories
+    def process(repo):
+        result = {"name": repo["name"], "changed": False, "failed": False}
+        try:
+            result["changed"] = manager.process(repo)
+        except APIModuleError as e:
+            result["failed"] = True
+            result["msg"] = str(e)
+        return result
+
+    results = module.map_parallel(process, repositories)
+    changed = any(r["changed"] for r in results)
+    failures = [r for r in results if r["failed"]]
+    if failures:
+        module.fail_json(
+            msg="Cannot process {count} repositories: {errors}".format(
+                count=len(failures),
+                errors=" ".join(
+                    "{name}: {msg}".format(name=r["name"], msg=r["msg"]) for r in failures
+                ),
+            ),
+            changed=changed,
+            repositories=results,
+        )
+    module.exit_json(changed=changed, repositories=results)
+
+
+if __name__ == "__main__":
+    main()
@@ -119,6 +119,10 @@ notes:
   - Your Quay administrator must enable the mirroring capability of your Quay
     installation (C(FEATURE_REPO_MIRROR) in C(config.yaml)) to use the
     I(repo_state) parameter.
+  - When I(quay_parallel_requests) is greater than 1, the module sends the
+    requests that add, update, and remove the permissions in parallel. The
+    module checks that all the teams and accounts exist before changing the
+    permissions.
   - Supports C(check_mode).
   - The token that you provide in I(quay_token) must have the "Administer
     Repositories" and "Create Repositories" permissions.
@@ -215,480 +219,33 @@ EXAMPLES = r"""
 
 RETURN = r""" # """
 
-import re
-
-from ..module_utils.api_module import APIModule
+from ..module_utils.api_module import APIModule, APIModuleError
+from ..module_utils.repository import (
+    REPOSITORY_ARGSPEC,
+    REPOSITORY_REQUIRED_BY,
+    REPOSITORY_REQUIRED_IF,
+    RepositoryManager,
+)
 
 
 def main():
-    argument_spec = dict(
-        name=dict(required=True),
-        visibility=dict(choices=["public", "private"]),
-        description=dict(),
-        perms=dict(
-            type="list",
-            elements="dict",
-            options=dict(
-                type=dict(choices=["user", "team"], default="user"),
-                name=dict(required=True),
-                role=dict(choices=["read", "write", "admin"], default="read"),
-            ),
-        ),
-        append=dict(type="bool", default=True),
-        star=dict(type="bool"),
-        repo_state=dict(choices=["NORMAL", "READ_ONLY", "MIRROR"]),
-        auto_prune_method=dict(choices=["none", "tags", "date"]),
-        auto_prune_value=dict(),
-        state=dict(choices=["present", "absent"], default="present"),
-    )
+    argument_spec = dict(REPOSITORY_ARGSPEC)
 
     # Create a module for ourselves
     module = APIModule(
         argument_spec=argument_spec,
-        required_if=[
-            ("auto_prune_method", "tags", ["auto_prune_value"]),
-            ("auto_prune_method", "date", ["auto_prune_value"]),
-        ],
-        required_by={
-            "auto_prune_value": "auto_prune_method",
-        },
+        required_if=REPOSITORY_REQUIRED_IF,
+        required_by=REPOSITORY_REQUIRED_BY,
         supports_check_mode=True,
     )
 
-    # Extract our parameters
-    name = module.params.get("name").strip("/")
-    visibility = module.params.get("visibility")
-    description = module.params.get("description")
-    perms = module.params.get("perms")
-    append = module.params.get("append")
-    star = module.params.get("star")
-    repo_state = module.params.get("repo_state")
-    auto_prune_method = module.params.get("auto_prune_method")
-    auto_prune_value = module.params.get("auto_prune_value")
-    state = module.params.get("state")
-
-    # Validate the auto-pruning tags values
-    if auto_prune_method == "tags":
-        try:
-            auto_prune_value = int(auto_prune_value)
-        except ValueError:
-            module.fail_json(
-                msg=(
-                    "Wrong format for the `auto_prune_value' parameter:"
-                    " {auto_prune_value} is not a positive integer."
-                ).format(auto_prune_value=auto_prune_value)
-            )
-        if auto_prune_value <= 0:
-            module.fail_json(
-                msg=(
-                    "Wrong format for the `auto_prune_value' parameter:"
-                    " {auto_prune_value} is not a positive integer."
-                ).format(auto_prune_value=auto_prune_value)
-            )
-    if auto_prune_method == "date":
-        value = "".join(auto_prune_value.split())
-        if not re.match(r"[1-9]\d*[smhdw]$", value):
-            module.fail_json(
-                msg=(
-                    "Wrong format for the `auto_prune_value' parameter:"
-                    " {auto_prune_value} is not a positive integer followed by"
-                    " the s, m, h, d, or w suffix."
-                ).format(auto_prune_value=auto_prune_value)
-            )
-        auto_prune_value = value
-
-    my_name = module.who_am_i()
+    # The repository management logic is shared with the quay_repositories
+    # module
+    manager = RepositoryManager(module)
     try:
-        namespace, repo_shortname = name.split("/", 1)
-    except ValueError:
-        # No namespace part in the repository name. Therefore, the repository
-        # is in the user's personal namespace
-        if my_name:
-            namespace = my_name
-            repo_shortname = name
-        else:
-            module.fail_json(
-                msg=(
-                    "The `name' parameter must include the"
-                    " organization: <organization>/{name}."
-                ).format(name=name)
-            )
-
-    full_repo_name = "{namespace}/{repository}".format(
-        namespace=namespace, repository=repo_shortname
-    )
-
-    # Get the repository details
-    #
-    # GET /api/v1/repository/{namespace}/{repository}
-    # {
-    #   "namespace": "production",
-    #   "name": "busybox",
-    #   "kind": "image",
-    #   "description": "Busybox images",
-    #   "is_public": true,
-    #   "is_organization": true,
-    #   "is_starred": false,
-    #   "status_token": "",
-    #   "trust_enabled": false,
-    #   "tag_expiration_s": 86400,
-    #   "is_free_account": true,
-    #   "state": "NORMAL",
-    #   "tags": {},
-    #   "can_write": true,
-    #   "can_admin": true
-    # }
-    repo_details = module.get_object_path(
-        "repository/{full_repo_name}",
-        ok_error_codes=[404, 403],
-        full_repo_name=full_repo_name,
-    )
-
-    # Remove the repository
-    if state == "absent":
-        module.delete(
-            repo_details,
-            "repository",
-            full_repo_name,
-            "repository/{full_repo_name}",
-            full_repo_name=full_repo_name,
-        )
-
-    # Check whether namespace exists (organization or user account)
-    namespace_details = module.get_namespace(namespace)
-    if not namespace_details:
-        module.fail_json(
-            msg="The {namespace} namespace does not exist.".format(namespace=namespace)
-        )
-
-    changed = False
-    if not repo_details:
-        # Create the repository
-        new_fields = {
-            "namespace": namespace,
-            "repository": repo_shortname,
-            "repo_kind": "image",
-        }
-        new_fields["description"] = description if description else ""
-        new_fields["visibility"] = visibility if visibility else "private"
-        module.create("repository", full_repo_name, "repository", new_fields, auto_exit=False)
-        changed = True
-    else:
-        # Update description
-        if description is not None:
-            updated, _not_used = module.update(
-                repo_details,
-                "repository",
-                full_repo_name,
-                "repository/{full_repo_name}",
-                {"description": description},
-                auto_exit=False,
-                full_repo_name=full_repo_name,
-            )
-            if updated:
-                changed = True
-        # Update visibility
-        if (
-            visibility
-            and "is_public" in repo_details
-            and (
-                repo_details["is_public"]
-                and visibility == "private"
-                or not repo_details["is_public"]
-                and visibility == "public"
-            )
-        ):
-            module.create(
-                "repository",
-                full_repo_name,
-                "repository/{full_repo_name}/changevisibility",
-                {"visibility": visibility},
-                auto_exit=False,
-                full_repo_name=full_repo_name,
-            )
-            changed = True
-
-    if repo_state is not None and (
-        not repo_details
-        and repo_state != "NORMAL"
-        or repo_details
-        and repo_details.get("state") != repo_state
-    ):
-        # Update repo_state
-        module.unconditional_update(
-            "repository",
-            full_repo_name,
-            "repository/{full_repo_name}/changestate",
-            {"state": repo_state},
-            full_repo_name=full_repo_name,
-        )
-        changed = True
-
-    if star is not None and module.authenticated:
-        if star and (not repo_details or not repo_details.get("is_starred")):
-            module.create(
-                "repository",
-                full_repo_name,
-                "user/starred",
-                {"namespace": namespace, "repository": repo_shortname},
-                auto_exit=False,
-            )
-            changed = True
-        if not star and repo_details and repo_details.get("is_starred"):
-            module.delete(
-                repo_details,
-                "repository",
-                full_repo_name,
-                "user/starred/{full_repo_name}",
-                auto_exit=False,
-                full_repo_name=full_repo_name,
-            )
-            changed = True
-
-    #
-    # Process the auto-pruning tags policy configuration
-    #
-
-    if auto_prune_method is not None:
-
-        # Get the current auto-pruning tags policy:
-        #
-        # GET /api/v1/repository/{namespace}/{repository}/autoprunepolicy/
-        # {
-        #   "policies": [
-        #     {
-        #       "uuid": "e54f146d-eb0e-446c-9057-61291a0b257c",
-        #       "method": "creation_date",
-        #       "value": "7h"
-        #     }
-        #   ]
-        # }
-        #
-        # If no policy is defined, then the returned data is {"policies": []}
-        prune_details = module.get_object_path(
-            "repository/{full_repo_name}/autoprunepolicy/", full_repo_name=full_repo_name
-        )
-        try:
-            policies = prune_details["policies"]
-        except (TypeError, IndexError):
-            policies = []
-
-        # Removing the auto-prune policies (the UI only manages one policy, but
-        # the backend seems to allow several policies)
-        if auto_prune_method == "none":
-            deleted = False
-            for policy in policies:
-                uuid = policy.get("uuid")
-                if module.delete(
-                    uuid,
-                    "repository auto-prune policy",
-                    full_repo_name,
-                    "repository/{full_repo_name}/autoprunepolicy/{uuid}",
-                    auto_exit=False,
-                    full_repo_name=full_repo_name,
-                    uuid=uuid,
-                ):
-                    deleted = True
-            if deleted:
-                changed = True
-        else:
-            # Compose the request
-            method = "creation_date" if auto_prune_method == "date" else "number_of_tags"
-            new_policy = {
-                "method": method,
-                "value": auto_prune_value,
-            }
-
-            # Verify whether the policy already exists
-            for policy in policies:
-                # The policy already exists
-                if policy.get("method") == method and policy.get("value") == auto_prune_value:
-                    break
-            else:
-                # The policy does not exist. If a policy is not already defined,
-                # then create the policy
-                if len(policies) == 0 or policies[0].get("uuid") is None:
-                    module.create(
-                        "repository auto-prune policy",
-                        full_repo_name,
-                        "repository/{full_repo_name}/autoprunepolicy/",
-                        new_policy,
-                        auto_exit=False,
-                        full_repo_name=full_repo_name,
-                    )
-                    changed = True
-                else:
-                    # Update the existing policy (the first one in the list)
-                    uuid = policies[0]["uuid"]
-                    new_policy["uuid"] = uuid
-                    module.unconditional_update(
-                        "repository auto-prune policy",
-                        full_repo_name,
-                        "repository/{full_repo_name}/autoprunepolicy/{uuid}",
-                        new_policy,
-                        full_repo_name=full_repo_name,
-                        uuid=uuid,
-                    )
-                    changed = True
-
-    # No permission to change. Exit
-    if perms is None:
-        module.exit_json(changed=changed)
-
-    # Get the team permissions
-    #
-    # GET /api/v1/repository/{namespace}/{repository}/permissions/team/
-    # {
-    #   "permissions": {
-    #     "developers": {
-    #       "role": "write",
-    #       "name": "developers",
-    #       "avatar": {
-    #         "name": "developers",
-    #         "hash": "5760...397e",
-    #         "color": "#9c9ede",
-    #         "kind": "team"
-    #       }
-    #     }
-    #   }
-    # }
-    team_perms = module.get_object_path(
-        "repository/{full_repo_name}/permissions/team/", full_repo_name=full_repo_name
-    )
-
-    # Set of (<team>, <perm>) tuples
-    current_team_perms = set(
-        [(p["name"], p["role"]) for _not_used, p in team_perms.get("permissions", {}).items()]
-    )
-    new_team_perms = set(
-        [(p["name"], p["role"]) for p in perms if p.get("type", "user") == "team"]
-    )
-
-    to_add = new_team_perms - current_team_perms
-    if append:
-        to_delete = set()
-    else:
-        to_delete = current_team_perms - new_team_perms
-
-    # Checking that all the teams to add exist
-    teams_not_found = []
-    for team in to_add:
-        if module.get_team(namespace, team[0]) is None:
-            teams_not_found.append(team[0])
-    if teams_not_found:
-        module.fail_json(
-            msg=(
-                "At least one team to associate to the repository does not exist: {teams}."
-            ).format(teams=", ".join(teams_not_found))
-        )
-
-    for perm in to_delete:
-        module.delete(
-            True,
-            "team repository permission",
-            perm[0],
-            "repository/{full_repo_name}/permissions/team/{team}",
-            auto_exit=False,
-            full_repo_name=full_repo_name,
-            team=perm[0],
-        )
-        changed = True
-
-    for perm in to_add:
-        module.unconditional_update(
-            "team repository permission",
-            perm[0],
-            "repository/{full_repo_name}/permissions/team/{team}",
-            {"role": perm[1]},
-            full_repo_name=full_repo_name,
-            team=perm[0],
-        )
-        changed = True
-
-    # Get the user permissions
-    #
-    # GET /api/v1/repository/{namespace}/{repository}/permissions/user/
-    # {
-    #   "permissions": {
-    #     "admin": {
-    #       "role": "admin",
-    #       "name": "admin",
-    #       "is_robot": false,
-    #       "avatar": {
-    #         "name": "admin",
-    #         "hash": "258d...da4f",
-    #         "color": "#98df8a",
-    #         "kind": "user"
-    #       },
-    #       "is_org_member": true
-    #     },
-    #     "operator2": {
-    #       "role": "write",
-    #       "name": "operator2",
-    #       "is_robot": false,
-    #       "avatar": {
-    #         "name": "operator2",
-    #         "hash": "4eaf...94b0",
-    #         "color": "#7f7f7f",
-    #         "kind": "user"
-    #       },
-    #       "is_org_member": false
-    #     }
-    #   }
-    # }
-    user_perms = module.get_object_path(
-        "repository/{full_repo_name}/permissions/user/", full_repo_name=full_repo_name
-    )
-
-    # Set of (<user>, <perm>) tuples
-    current_user_perms = set(
-        [(p["name"], p["role"]) for _not_used, p in user_perms.get("permissions", {}).items()]
-    )
-    new_user_perms = set(
-        [(p["name"], p["role"]) for p in perms if p.get("type", "user") == "user"]
-    )
-
-    to_add = new_user_perms - current_user_perms
-    if append:
-        to_delete = set()
-    else:
-        to_delete = current_user_perms - new_user_perms
-
-    # Checking that all the user account to add exist
-    accounts_not_found = []
-    for member in to_add:
-        if module.get_account(member[0]) is None:
-            accounts_not_found.append(member[0])
-    if accounts_not_found:
-        module.fail_json(
-            msg="At least one user to add as team member does not exist: {users}.".format(
-                users=", ".join(accounts_not_found)
-            )
-        )
-
-    for perm in to_delete:
-        module.delete(
-            True,
-            "user repository permission",
-            perm[0],
-            "repository/{full_repo_name}/permissions/user/{user}",
-            auto_exit=False,
-            full_repo_name=full_repo_name,
-            user=perm[0],
-        )
-        changed = True
-
-    for perm in to_add:
-        module.unconditional_update(
-            "user repository permission",
-            perm[0],
-            "repository/{full_repo_name}/permissions/user/{user}",
-            {"role": perm[1]},
-            full_repo_name=full_repo_name,
-            user=perm[0],
-        )
-        changed = True
-
+        changed = manager.process(module.params)
+    except APIModuleError as e:
+        module.fail_json(msg=str(e))
     module.exit_json(changed=changed)
 
 
@@ -176,14 +176,26 @@ def main():
             msg="Because you use a digest in image, the tag parameter is mandatory."
         )
 
-    # Check whether the namespace exists (organization or user account)
-    namespace_details = module.get_namespace(namespace)
-    if not namespace_details:
-        if state == "absent":
-            module.exit_json(changed=False)
-        module.fail_json(
-            msg="The {namespace} namespace does not exist.".format(namespace=namespace)
+    # When the module adds a tag to an image given by its tag, only the digest
+    # of that image is needed. The registry API returns that digest, and then
+    # the namespace exists.
+    tags = None
+    if state == "present" and img.tag and tag and tag != img.tag:
+        manifest_digest = module.digest_resolver.get_registry_digest(
+            namespace, img.repository, img.tag
         )
+        if manifest_digest:
+            tags = [{"name": img.tag, "manifest_digest": manifest_digest}]
+
+    if tags is None:
+        # Check whether the namespace exists (organization or user account)
+        namespace_details = module.get_namespace(namespace)
+        if not namespace_details:
+            if state == "absent":
+                module.exit_json(changed=False)
+            module.fail_json(
+                msg="The {namespace} namespace does not exist.".format(namespace=namespace)
+            )
 
     full_repo_name = "{namespace}/{repository}".format(
         namespace=namespace, repository=img.repository
@@ -223,7 +235,8 @@ def main():
     #        "expiration": "Sat, 02 Oct 2021 13:00:54 -0000"
     #      }
     #   ]
-    tags = module.get_tags(namespace, img.repository, img.tag, img.digest)
+    if tags is None:
+        tags = module.get_tags(namespace, img.repository, img.tag, img.digest)
     tag_list = [t["name"] for t in tags if "name" in t]
 
     # No tag to set and no expiration date/time to update. Exit (no change)
@@ -301,12 +314,12 @@ def main():
 
     # The user has specified a tag in `tag'. Verify if that tag already exists
     # and if it points to the same image as the one provided in `image'.
-    tags = module.get_tags(namespace, img.repository, tag)
+    tag_details = next(module.iter_tags(namespace, img.repository, tag), None)
 
     # The two tags point to the same image. No need to create the tag, only
     # the expiration need updating.
-    if len(tags) > 0 and tags[0].get("manifest_digest") == manifest_digest:
-        new_tag_details = tags[0]
+    if tag_details and tag_details.get("manifest_digest") == manifest_digest:
+        new_tag_details = tag_details
         if "end_ts" in new_tag_details:
             new_tag_details["expiration"] = new_tag_details["end_ts"]
         created = False
@@ -320,6 +333,7 @@ def main():
             full_repo_name=full_repo_name,
             tag=tag,
         )
+        module.digest_resolver.set_digest(namespace, img.repository, tag, manifest_digest)
         new_tag_details = {}
         created = True
 
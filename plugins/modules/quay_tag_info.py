@@ -62,6 +62,94 @@ options:
         or deletion date.
     type: bool
     default: no
+  fields:
+    description:
+      - List of the tag attributes to return, such as C(name) and
+        C(manifest_digest).
+      - The module only keeps those attributes while it retrieves the tags,
+        which reduces the memory usage and the size of the result for
+        repositories with many tags.
+      - By default, the module returns all the attributes.
+      - Mutually exclusive with I(names_only).
+    type: list
+    elements: str
+    version_added: '1.6.0'
+  names_only:
+    description:
+      - If C(true), then the module only returns the tag names, in the
+        I(names) return value, instead of the tag details.
+      - When you also set I(only_active_tags) to C(true), and do not set
+        I(tag), I(digest), I(newer_than), I(older_than), or I(limit), then the
+        module lists the tag names with the registry API, which returns the
+        names by larger pages. In that case, the names are usually in lexical
+        order. Otherwise, the module returns the names in the same order as
+        the tags, the most recent tags first.
+      - Mutually exclusive with I(fields).
+    type: bool
+    default: false
+    version_added: '1.6.0'
+  name_glob:
+    description:
+      - Only return the tags which names match that shell-style pattern,
+        such as C(v1.*) or C(release-?).
+      - Mutually exclusive with I(tag) and I(name_regex).
+    type: str
+    version_added: '1.6.0'
+  name_regex:
+    description:
+      - Only return the tags which names match that Python regular expression.
+      - The expression can match anywhere in the name. Use the C(^) and C($)
+        anchors to match the whole name.
+      - Mutually exclusive with I(tag) and I(name_glob).
+    type: str
+    version_added: '1.6.0'
+  newer_than:
+    description:
+      - Only return the tags that have been created or moved during that
+        period, such as C(12h) or C(7d). The value is a positive integer
+        followed by the C(s), C(m), C(h), C(d), or C(w) suffix.
+      - The comparison uses the C(start_ts) attribute of the tags. Because
+        Quay lists the most recent tags first, the module stops retrieving
+        the tags as soon as it reaches an older tag.
+    type: str
+    version_added: '1.6.0'
+  older_than:
+    description:
+      - Only return the tags that have not been created or moved during that
+        period, such as C(30d) or C(4w). The value is a positive integer
+        followed by the C(s), C(m), C(h), C(d), or C(w) suffix.
+      - The comparison uses the C(start_ts) attribute of the tags.
+    type: str
+    version_added: '1.6.0'
+  limit:
+    description:
+      - Maximum number of tags to return.
+      - When you do not set I(sort), the module returns the most recent tags,
+        also when you set I(names_only) to C(true).
+      - When you do not set I(sort), or when you sort by C(start_ts) in
+        descending order, the module stops retrieving the tags as soon as it
+        has enough tags. Otherwise, the module retrieves all the tags, sorts
+        them, and then returns the first ones.
+    type: int
+    version_added: '1.6.0'
+  sort:
+    description:
+      - Sort the tags by name or by date (C(start_ts) attribute).
+      - By default, the module returns the tags in the order that Quay lists
+        them, the most recent tags first. When you set I(names_only) to
+        C(true) without I(limit), I(newer_than), or I(older_than), the names
+        might be in lexical order instead (see I(names_only)).
+    type: str
+    choices: [name, start_ts]
+    version_added: '1.6.0'
+  sort_order:
+    description:
+      - Sort the tags in ascending or descending order.
+      - Only used when you set the I(sort) parameter.
+    type: str
+    choices: [ascending, descending]
+    default: ascending
+    version_added: '1.6.0'
 extends_documentation_fragment:
   - herve4m.quay.auth
   - herve4m.quay.auth.login
@@ -84,6 +172,48 @@ EXAMPLES = r"""
     quay_token: vgfH9zH5q6eV16Con7SvDQYSr0KPYQimMHVehZv7
   register: tag_info
 
+- name: Retrieve the name and the digest of the tags in a large repository
+  herve4m.quay.quay_tag_info:
+    repository: production/bigimage
+    only_active_tags: true
+    fields:
+      - name
+      - manifest_digest
+    quay_host: https://quay.example.com
+    quay_token: vgfH9zH5q6eV16Con7SvDQYSr0KPYQimMHVehZv7
+  register: tags
+
+- name: Retrieve the names of the active tags
+  herve4m.quay.quay_tag_info:
+    repository: production/bigimage
+    only_active_tags: true
+    names_only: true
+    quay_host: https://quay.example.com
+    quay_token: vgfH9zH5q6eV16Con7SvDQYSr0KPYQimMHVehZv7
+  register: tag_names
+
+- name: Retrieve the five most recent v2 tags that are older than a week
+  herve4m.quay.quay_tag_info:
+    repository: production/bigimage
+    only_active_tags: true
+    name_glob: "v2.*"
+    older_than: 7d
+    limit: 5
+    quay_host: https://quay.example.com
+    quay_token: vgfH9zH5q6eV16Con7SvDQYSr0KPYQimMHVehZv7
+  register: tags
+
+- name: Retrieve the names of the tags pushed during the last 24 hours
+  herve4m.quay.quay_tag_info:
+    repository: production/bigimage
+    only_active_tags: true
+    newer_than: 24h
+    names_only: true
+    sort: name
+    quay_host: https://quay.example.com
+    quay_token: vgfH9zH5q6eV16Con7SvDQYSr0KPYQimMHVehZv7
+  register: tag_names
+
 - name: Retrieve the tags from the images with the given digest
   herve4m.quay.quay_tag_info:
     repository: production/smallimage
@@ -96,8 +226,11 @@ EXAMPLES = r"""
 
 RETURN = r"""
 tags:
-  description: List of the tags in the repository.
-  returned: always
+  description:
+    - List of the tags in the repository.
+    - When you set the I(fields) parameter, each tag only includes the
+      requested attributes.
+  returned: when I(names_only) is C(false)
   type: list
   elements: dict
   contains:
@@ -175,21 +308,73 @@ tags:
               "expiration": "Fri, 24 Dec 2021 08:54:00 -0000"
             }
           ]
+names:
+  description: List of the tag names in the repository.
+  returned: when I(names_only) is C(true)
+  type: list
+  elements: str
+  sample: ["1.33.1", "1.34.0", "latest"]
+  version_added: '1.6.0'
 """
 
+import fnmatch
+import itertools
+import re
+import time
+
 from ..module_utils.api_module import APIModule
 from ..module_utils.quay_image import QuayImage
 
 
+def get_timestamp_for_period(module, param_name):
+    """Return the Unix timestamp of the given period before the current time.
+
+    :param module: The module object.
+    :type module: :py:class:``APIModule``
+    :param param_name: The name of the module parameter that provides the
+                       period, such as ``7d``.
+    :type param_name: str
+
+    :return: The timestamp, or ``None`` if the parameter is not set.
+    :rtype: int
+    """
+    period = module.params.get(param_name)
+    if period is None:
+        return None
+    value = "".join(period.split())
+    if not re.match(r"[1-9]\d*[smhdw]$", value):
+        module.fail_json(
+            msg=(
+                "Wrong format for the `{param}' parameter: {period} is not a"
+                " positive integer followed by the s, m, h, d, or w suffix."
+            ).format(param=param_name, period=period)
+        )
+    multipliers = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    return int(time.time()) - int(value[:-1]) * multipliers[value[-1]]
+
+
 def main():
     argument_spec = dict(
         repository=dict(required=True),
         tag=dict(),
         digest=dict(),
         only_active_tags=dict(type="bool", default=False),
+        fields=dict(type="list", elements="str"),
+        names_only=dict(type="bool", default=False),
+        name_glob=dict(),
+        name_regex=dict(),
+        newer_than=dict(),
+        older_than=dict(),
+        limit=dict(type="int"),
+        sort=dict(choices=["name", "start_ts"]),
+        sort_order=dict(choices=["ascending", "descending"], default="ascending"),
     )
 
-    mutually_exclusive = [("tag", "digest")]
+    mutually_exclusive = [
+        ("tag", "digest"),
+        ("fields", "names_only"),
+        ("tag", "name_glob", "name_regex"),
+    ]
 
     # Create a module for ourselves
     module = APIModule(
@@ -203,6 +388,33 @@ def main():
     tag = module.params.get("tag")
     digest = module.params.get("digest")
     only_active_tags = module.params.get("only_active_tags")
+    fields = module.params.get("fields")
+    names_only = module.params.get("names_only")
+    name_glob = module.params.get("name_glob")
+    name_regex = module.params.get("name_regex")
+    limit = module.params.get("limit")
+    sort = module.params.get("sort")
+    descending = module.params.get("sort_order") == "descending"
+
+    if limit is not None and limit <= 0:
+        module.fail_json(
+            msg=(
+                "Wrong value for the `limit' parameter: {limit} is not a positive integer."
+            ).format(limit=limit)
+        )
+    newer_than = get_timestamp_for_period(module, "newer_than")
+    older_than = get_timestamp_for_period(module, "older_than")
+    if name_glob:
+        name_regex = fnmatch.translate(name_glob)
+    if name_regex:
+        try:
+            name_regex = re.compile(name_regex)
+        except re.error as e:
+            module.fail_json(
+                msg="Wrong regular expression in the `name_regex' parameter: {error}.".format(
+                    error=e
+                )
+            )
 
     # Get the components of the given image (namespace, repository)
     img = QuayImage(module, name)
@@ -218,8 +430,32 @@ def main():
     # Check whether namespace exists (organization or user account)
     namespace_details = module.get_namespace(namespace)
     if not namespace_details:
+        if names_only:
+            module.exit_json(changed=False, names=[])
         module.exit_json(changed=False, tags=[])
 
+    # Quay lists the most recent tags first. When the tags do not have to be
+    # sorted differently, the module can stop at the limit.
+    listing_order = sort is None or (sort == "start_ts" and descending)
+
+    if names_only and sort != "start_ts":
+        tag_names = module.get_tags(
+            namespace,
+            img.repository,
+            tag,
+            digest,
+            only_active_tags,
+            names_only=True,
+            name_regex=name_regex,
+            newer_than=newer_than,
+            older_than=older_than,
+            limit=limit if listing_order else None,
+        )
+        if sort == "name":
+            tag_names.sort(reverse=descending)
+            tag_names = tag_names[:limit]
+        module.exit_json(changed=False, names=tag_names)
+
     # Get the tags
     #   [
     #     {
@@ -263,7 +499,33 @@ def main():
     #       "expiration": "Thu, 30 Sep 2021 06:10:22 -0000"
     #     }
     #   ]
-    tag_list = module.get_tags(namespace, img.repository, tag, digest, only_active_tags)
+    tags = module.iter_tags(
+        namespace,
+        img.repository,
+        tag,
+        digest,
+        only_active_tags,
+        name_regex=name_regex,
+        newer_than=newer_than,
+        older_than=older_than,
+    )
+    if not listing_order:
+        if sort == "name":
+            tags = sorted(tags, key=lambda t: t.get("name", ""), reverse=descending)
+        else:
+            tags = sorted(tags, key=lambda t: t.get("start_ts", 0))
+    if limit:
+        tags = itertools.islice(tags, limit)
+
+    if names_only:
+        module.exit_json(changed=False, names=[t["name"] for t in tags if "name" in t])
+    if not fields:
+        module.exit_json(changed=False, tags=list(tags))
+
+    # Only keep the requested attributes, page after page
+    tag_list = []
+    for t in tags:
+        tag_list.append(dict((k, t[k]) for k in fields if k in t))
     module.exit_json(changed=False, tags=tag_list)
 
 
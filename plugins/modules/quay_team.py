@@ -82,6 +82,12 @@ options:
 notes:
   - To synchronize teams with LDAP groups, see the
     M(herve4m.quay.quay_team_ldap) module.
+  - The module adds and removes the team members in parallel when you set the
+    I(quay_parallel_requests) parameter to a value greater than 1.
+  - The module verifies that all the accounts to add exist before changing
+    the team membership. If an API request then fails for a member, the
+    module still processes the other members, and then reports the failures
+    in the I(members) return value.
   - Supports C(check_mode).
   - The token that you provide in I(quay_token) must have the "Administer
     Organization" and "Administer User" permissions.
@@ -141,9 +147,43 @@ EXAMPLES = r"""
     quay_token: vgfH9zH5q6eV16Con7SvDQYSr0KPYQimMHVehZv7
 """
 
-RETURN = r""" # """
+RETURN = r"""
+members:
+  description: Result of the addition or removal of each team member.
+  returned: when I(state) is C(present)
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: Name of the user or robot account.
+      type: str
+      returned: always
+      sample: lvasquez
+    action:
+      description: Whether the module adds (C(add)) or removes (C(remove))
+        the account.
+      type: str
+      returned: always
+      sample: add
+    changed:
+      description: Whether the team membership of the account has changed.
+      type: bool
+      returned: always
+      sample: true
+    failed:
+      description: Whether the processing of the account has failed.
+      type: bool
+      returned: always
+      sample: false
+    msg:
+      description: Error message.
+      type: str
+      returned: when the processing of the account has failed
+      sample: "You do not have permission to PUT
+        /api/v1/organization/production/team/operators/members/jdoe (HTTP 403)."
+"""
 
-from ..module_utils.api_module import APIModule
+from ..module_utils.api_module import APIModule, APIModuleError
 
 
 def main():
@@ -365,11 +405,10 @@ def main():
     else:
         to_delete = current_members - new_members
 
-    # Checking that all the user account to add exist
-    accounts_not_found = []
-    for member in to_add:
-        if module.get_account(member) is None:
-            accounts_not_found.append(member)
+    # Checking that all the user accounts to add exist before changing the
+    # team membership. The accounts are looked up at once.
+    accounts = module.get_accounts(sorted(to_add))
+    accounts_not_found = [member for member in sorted(to_add) if accounts[member] is None]
     if accounts_not_found:
         module.fail_json(
             msg="At least one user to add as team member does not exist: {users}.".format(
@@ -377,29 +416,58 @@ def main():
             )
         )
 
-    for member in to_add:
-        module.unconditional_update(
-            "team member",
-            member,
-            "organization/{orgname}/team/{teamname}/members/{member}",
-            {},
-            orgname=organization,
-            teamname=name,
-            member=member,
-        )
-    for member in to_delete:
-        module.delete(
-            True,
-            "team member",
-            member,
-            "organization/{orgname}/team/{teamname}/members/{member}",
-            auto_exit=False,
-            orgname=organization,
-            teamname=name,
-            member=member,
-        )
+    def process_member(item):
+        member, action = item
+        result = {"name": member, "action": action, "changed": False, "failed": False}
+        try:
+            if action == "remove":
+                result["changed"] = module.delete(
+                    True,
+                    "team member",
+                    member,
+                    "organization/{orgname}/team/{teamname}/members/{member}",
+                    auto_exit=False,
+                    exit_on_error=False,
+                    orgname=organization,
+                    teamname=name,
+                    member=member,
+                )
+            else:
+                module.unconditional_update(
+                    "team member",
+                    member,
+                    "organization/{orgname}/team/{teamname}/members/{member}",
+                    {},
+                    exit_on_error=False,
+                    orgname=organization,
+                    teamname=name,
+                    member=member,
+                )
+                result["changed"] = True
+        except APIModuleError as e:
+            result["failed"] = True
+            result["msg"] = str(e)
+        return result
+
+    results = module.map_parallel(
+        process_member,
+        [(m, "add") for m in sorted(to_add)] + [(m, "remove") for m in sorted(to_delete)],
+    )
+    changed = updated or any(r["changed"] for r in results)
 
-    module.exit_json(changed=updated or len(to_add) or len(to_delete))
+    failures = [r for r in results if r["failed"]]
+    if failures:
+        module.fail_json(
+            msg="Cannot process {count} team members: {errors}".format(
+                count=len(failures),
+                errors=" ".join(
+                    "{name}: {msg}".format(name=r["name"], msg=r["msg"]) for r in failures
+                ),
+            ),
+            changed=changed,
+            members=results,
+        )
+    module.exit_json(changed=changed, members=results)
 
 
 if __name__ == "__main__":
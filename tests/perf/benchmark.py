@@ -0,0 +1,387 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Benchmark the collection modules against the fake Quay API.
+
+Each scenario runs a module in a separate Python process, against a fresh
+fake Quay API server (see ``fake_quay.py``) loaded with a large synthetic
+dataset. For each scenario, the script reports the number of HTTP requests
+that the server receives, the wall time of the module, and the peak memory
+(RSS) of the module process.
+
+The results are compared to the baselines stored in ``baselines.json``:
+
+* The number of requests is deterministic and must not exceed the baseline.
+* The wall time and the peak RSS depend on the system. They must not exceed
+  the baseline by more than the tolerance (``--tolerance``).
+
+The script exits with a non-zero status when a scenario regresses.
+
+    $ python tests/perf/benchmark.py
+    $ python tests/perf/benchmark.py --scenario quay_team_add_members
+    $ python tests/perf/benchmark.py --update-baselines
+
+The ``ansible-core`` package must be installed.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_quay import Dataset, FakeQuay
+
+PERF_DIR = os.path.dirname(os.path.abspath(__file__))
+COLLECTION_DIR = os.path.dirname(os.path.dirname(PERF_DIR))
+BASELINES = os.path.join(PERF_DIR, "baselines.json")
+
+# Python code that runs a module in a child process, and then writes the
+# peak RSS of the process to the file given as second argument
+RUNNER = """
+import atexit, json, resource, sys
+from ansible.module_utils import basic
+
+def report():
+    with open(sys.argv[2], "w") as f:
+        f.write(str(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+atexit.register(report)
+if hasattr(basic, "_ANSIBLE_PROFILE"):
+    basic._ANSIBLE_PROFILE = "legacy"
+args = {"ANSIBLE_MODULE_ARGS": json.loads(sys.stdin.read())}
+basic._ANSIBLE_ARGS = json.dumps(args).encode()
+module = __import__(
+    "ansible_collections.herve4m.quay.plugins.modules." + sys.argv[1], fromlist=["main"]
+)
+module.main()
+"""
+
+# Modules that the fake Quay API does not support
+NOT_COVERED = {
+    "quay_api_token": "OAuth applications and authorization flow are not implemented",
+    "quay_application": "OAuth applications are not implemented",
+    "quay_docker_token": "the Docker registry API is not implemented",
+    "quay_first_user": "the user initialization endpoint is not implemented",
+    "quay_message": "global messages are not implemented",
+    "quay_notification": "repository notifications are not implemented",
+    "quay_proxy_cache": "proxy cache configurations are not implemented",
+    "quay_quota": "quotas are not implemented",
+    "quay_repository_mirror": "repository mirroring is not implemented",
+    "quay_team_ldap": "LDAP team synchronization is not implemented",
+    "quay_team_oidc": "OIDC team synchronization is not implemented",
+}
+
+
+def build_dataset():
+    """Return the dataset used by all the scenarios.
+
+    * 500 repositories in the ``org0`` organization, with five tags each.
+    * The ``org0/bigrepo`` repository with 10000 tags, one per minute up to
+      the current time.
+    * 1000 user accounts, all members of the ``org0/bigteam`` team.
+    """
+    dataset = Dataset(orgs=1, repos=500, tags=5, users=1000, teams=2, team_members=5)
+    dataset.add_repo("org0", "bigrepo", 10000)
+    team = dataset.add_team(dataset.orgs["org0"], "bigteam", "member")
+    team["members"] = sorted(n for n in dataset.users if n != "admin")
+    return dataset
+
+
+# Scenarios: name, module, and module parameters (without the connection
+# parameters)
+SCENARIOS = [
+    ("quay_tag_info_all", "quay_tag_info", {"repository": "org0/bigrepo"}),
+    (
+        "quay_tag_info_one",
+        "quay_tag_info",
+        {"repository": "org0/bigrepo", "tag": "v9999"},
+    ),
+    (
+        "quay_tag_info_names",
+        "quay_tag_info",
+        {"repository": "org0/bigrepo", "only_active_tags": True, "names_only": True},
+    ),
+    (
+        "quay_tag_info_fields",
+        "quay_tag_info",
+        {"repository": "org0/bigrepo", "fields": ["name", "manifest_digest"]},
+    ),
+    (
+        "quay_tag_info_recent",
+        "quay_tag_info",
+        {"repository": "org0/bigrepo", "newer_than": "2h"},
+    ),
+    (
+        "quay_tag_info_limit",
+        "quay_tag_info",
+        {"repository": "org0/bigrepo", "name_glob": "v9*", "limit": 10},
+    ),
+    ("quay_tag", "quay_tag", {"image": "org0/bigrepo:v5000", "tag": "prod"}),
+    ("quay_layer_info", "quay_layer_info", {"image": "org0/bigrepo:v9000"}),
+    ("quay_vulnerability_info", "quay_vulnerability_info", {"image": "org0/bigrepo:v9000"}),
+    ("quay_manifest_label_info", "quay_manifest_label_info", {"image": "org0/bigrepo:v9000"}),
+    (
+        "quay_manifest_label",
+        "quay_manifest_label",
+        {"image": "org0/bigrepo:v9000", "key": "env", "value": "prod"},
+    ),
+    (
+        "quay_repository",
+        "quay_repository",
+        {
+            "name": "org0/repo42",
+            "description": "Benchmark",
+            "perms": [{"name": "user{i}".format(i=i), "role": "write"} for i in range(20)]
+            + [{"name": "team0", "type": "team"}, {"name": "org0+robot0"}],
+        },
+    ),
+    (
+        "quay_repository_perms_parallel",
+        "quay_repository",
+        {
+            "name": "org0/repo43",
+            "perms": [{"name": "user{i}".format(i=i), "role": "write"} for i in range(50)]
+            + [{"name": "team0", "type": "team"}, {"name": "team1", "type": "team"}],
+            "append": False,
+            "quay_parallel_requests": 8,
+        },
+    ),
+    (
+        "quay_repositories",
+        "quay_repositories",
+        {
+            "repositories": [
+                {
+                    "name": "org0/bulk{i}".format(i=i),
+                    "perms": [
+                        {"name": "user{i}".format(i=i)},
+                        {"name": "team1", "type": "team"},
+                    ],
+                }
+                for i in range(50)
+            ]
+        },
+    ),
+    (
+        "quay_team_add_members",
+        "quay_team",
+        {
+            "name": "team0",
+            "organization": "org0",
+            "members": ["user{i}".format(i=i) for i in range(1000)],
+        },
+    ),
+    (
+        "quay_team_no_change",
+        "quay_team",
+        {
+            "name": "bigteam",
+            "organization": "org0",
+            "members": ["user{i}".format(i=i) for i in range(1000)],
+        },
+    ),
+    (
+        "quay_team_sync_parallel",
+        "quay_team",
+        {
+            "name": "bigteam",
+            "organization": "org0",
+            "members": ["user{i}".format(i=i) for i in range(500, 1000)] + ["org0+robot0"],
+            "append": False,
+            "quay_parallel_requests": 8,
+        },
+    ),
+    ("quay_robot", "quay_robot", {"name": "org0+benchrobot", "description": "Benchmark"}),
+    (
+        "quay_organization",
+        "quay_organization",
+        {"name": "benchorg", "email": "bench@example.com"},
+    ),
+    (
+        "quay_default_perm",
+        "quay_default_perm",
+        {"organization": "org0", "name": "user5", "role": "write"},
+    ),
+    ("quay_user", "quay_user", {"username": "benchuser", "email": "benchuser@example.com"}),
+]
+
+
+def collection_path():
+    """Return a directory from which the collection can be imported.
+
+    The directory contains the ``ansible_collections/herve4m/quay`` symbolic
+    link to the collection source.
+    """
+    path = tempfile.mkdtemp(prefix="quay-bench-")
+    namespace = os.path.join(path, "ansible_collections", "herve4m")
+    os.makedirs(namespace)
+    os.symlink(COLLECTION_DIR, os.path.join(namespace, "quay"))
+    return path
+
+
+def run_scenario(module, params, latency, pythonpath):
+    """Run a module against a fresh fake Quay API server.
+
+    :return: The measurements and the module result.
+    :rtype: tuple
+    """
+    with FakeQuay(build_dataset(), latency=latency) as quay:
+        args = dict(params)
+        args["quay_host"] = quay.url
+        args["quay_token"] = quay.token
+        env = dict(os.environ)
+        env["PYTHONPATH"] = pythonpath
+        rss_file = tempfile.NamedTemporaryFile(delete=False)
+        rss_file.close()
+        try:
+            start = time.time()
+            proc = subprocess.run(
+                [sys.executable, "-c", RUNNER, module, rss_file.name],
+                input=json.dumps(args),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                env=env,
+            )
+            wall_time = time.time() - start
+            with open(rss_file.name) as f:
+                peak_rss = int(f.read() or 0)
+        finally:
+            os.remove(rss_file.name)
+        stats = quay.get_stats()
+
+    try:
+        result = json.loads(proc.stdout[proc.stdout.index("{") :])
+    except ValueError:
+        result = {"failed": True, "msg": proc.stderr.strip() or proc.stdout.strip()}
+    return (
+        {
+            "requests": stats["requests"],
+            "connections": stats["connections"],
+            "wall_time": round(wall_time, 3),
+            "peak_rss_kb": peak_rss,
+        },
+        result,
+    )
+
+
+def compare(name, measures, baseline, tolerance):
+    """Return the list of regressions for a scenario."""
+    if not baseline:
+        return []
+    regressions = []
+    if measures["requests"] > baseline["requests"]:
+        regressions.append(
+            "{name}: {n} requests (baseline {b})".format(
+                name=name, n=measures["requests"], b=baseline["requests"]
+            )
+        )
+    for key in ("wall_time", "peak_rss_kb"):
+        if measures[key] > baseline[key] * (1 + tolerance):
+            regressions.append(
+                "{name}: {key} {n} (baseline {b}, tolerance {t:.0%})".format(
+                    name=name, key=key, n=measures[key], b=baseline[key], t=tolerance
+                )
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Quay collection modules")
+    parser.add_argument(
+        "--scenario", action="append", help="Scenario to run (all scenarios by default)"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.002,
+        help="Seconds that the fake server waits for each request",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed increase of the wall time and RSS over the baselines (0.5 = 50%%)",
+    )
+    parser.add_argument(
+        "--update-baselines", action="store_true", help="Store the results as the baselines"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the results in JSON")
+    args = parser.parse_args()
+
+    names = [s[0] for s in SCENARIOS]
+    for name in args.scenario or []:
+        if name not in names:
+            parser.error(
+                "unknown scenario {name} (choose from {names})".format(
+                    name=name, names=", ".join(names)
+                )
+            )
+
+    try:
+        with open(BASELINES) as f:
+            baselines = json.load(f)
+    except (IOError, OSError, ValueError):
+        baselines = {}
+
+    pythonpath = collection_path()
+    results = {}
+    regressions = []
+    failures = []
+    if not args.json:
+        print(
+            "{0:<28} {1:>9} {2:>6} {3:>10} {4:>10}   {5}".format(
+                "scenario", "requests", "conns", "wall (s)", "RSS (KiB)", "baseline requests"
+            )
+        )
+    for name, module, params in SCENARIOS:
+        if args.scenario and name not in args.scenario:
+            continue
+        measures, result = run_scenario(module, params, args.latency, pythonpath)
+        results[name] = measures
+        if result.get("failed"):
+            failures.append("{name}: {msg}".format(name=name, msg=result.get("msg")))
+        baseline = baselines.get(name)
+        regressions.extend(compare(name, measures, baseline, args.tolerance))
+        if not args.json:
+            print(
+                "{0:<28} {1:>9} {2:>6} {3:>10.3f} {4:>10}   {5}".format(
+                    name,
+                    measures["requests"],
+                    measures["connections"],
+                    measures["wall_time"],
+                    measures["peak_rss_kb"],
+                    baseline["requests"] if baseline else "-",
+                )
+            )
+
+    if args.json:
+        print(json.dumps({"results": results, "not_covered": NOT_COVERED}, indent=2))
+    else:
+        print("\nModules not covered:")
+        for module, reason in sorted(NOT_COVERED.items()):
+            print("  {module}: {reason}".format(module=module, reason=reason))
+
+    if args.update_baselines and not failures:
+        baselines.update(results)
+        with open(BASELINES, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("\nBaselines updated: {path}".format(path=BASELINES), file=sys.stderr)
+
+    for msg in failures:
+        print("FAILED: " + msg, file=sys.stderr)
+    for msg in regressions:
+        print("REGRESSION: " + msg, file=sys.stderr)
+    return 1 if failures or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
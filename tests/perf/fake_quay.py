@@ -0,0 +1,1607 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Lightweight stand-in for the Quay Container Registry API.
+
+The server implements, in memory, the subset of the Quay API that the
+collection modules use: users, organizations, teams and team members, robot
+accounts, repositories, permissions, default permissions, auto-prune
+policies, tags (with pagination), manifests, manifest labels, and security
+reports. For the registry API (``/v2/``), the server only implements the
+token endpoint, the tag listing, and the manifest requests by tag or digest.
+
+The server is not a Quay emulator. It does not enforce permissions and it
+only returns the fields that the modules read. Its purpose is to run the
+modules offline, with a reproducible dataset and a configurable latency, so
+that the number of API requests and the time spent by the modules can be
+measured.
+
+The server can run in the current process:
+
+    with FakeQuay(Dataset(tags=10000), latency=0.01) as quay:
+        # quay.url is the URL to use for the quay_host parameter
+        # quay.token is a valid OAuth access token for the admin user
+        ...
+
+Or from the command line:
+
+    $ python tests/perf/fake_quay.py --port 8080 --tags 10000 --latency 0.01
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import argparse
+import base64
+import bisect
+import email.utils
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+import zlib
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Maximum number of tags that the tag listing endpoint returns per page
+TAG_PAGE_LIMIT = 100
+
+# Maximum number of tag names that the registry API returns per page
+REGISTRY_TAG_PAGE_LIMIT = 1000
+
+CSRF_TOKEN = "fake-csrf-token"
+
+
+def digest_of(*parts):
+    """Return a deterministic sha256 digest for the given strings."""
+    return "sha256:" + hashlib.sha256("/".join(parts).encode("utf-8")).hexdigest()
+
+
+def avatar(name, kind="user"):
+    """Return an avatar description, as embedded in most Quay responses."""
+    return {
+        "name": name,
+        "hash": hashlib.md5(name.encode("utf-8")).hexdigest(),
+        "color": "#1f77b4",
+        "kind": kind,
+    }
+
+
+class Dataset(object):
+    """Synthetic data served by the fake Quay API.
+
+    The data is generated deterministically from the given sizes. The
+    ``admin`` user is a superuser that owns all the organizations. The
+    ``user<n>`` users are members of the ``team<n>`` teams of each
+    organization.
+
+    :param orgs: Number of organizations (``org0``, ``org1``, ...).
+    :type orgs: int
+    :param repos: Number of repositories in each organization.
+    :type repos: int
+    :param tags: Number of tags in each repository.
+    :type tags: int
+    :param users: Number of user accounts, in addition to ``admin``.
+    :type users: int
+    :param teams: Number of teams in each organization, in addition to the
+                  ``owners`` team.
+    :type teams: int
+    :param team_members: Number of members in each team.
+    :type team_members: int
+    :param robots: Number of robot accounts in each organization.
+    :type robots: int
+    :param password: Password of all the user accounts.
+    :type password: str
+    :param token: OAuth access token of the ``admin`` user.
+    :type token: str
+    """
+
+    def __init__(
+        self,
+        orgs=1,
+        repos=5,
+        tags=20,
+        users=20,
+        teams=2,
+        team_members=5,
+        robots=2,
+        password="password",
+        token="fake-admin-token",
+    ):
+        self.password = password
+        self.tokens = {token: "admin"}
+        self.tag_count = tags
+        self.users = {}
+        self.orgs = {}
+        self.repos = {}
+        self.user_robots = {}
+        self.starred = {}
+        self.lock = threading.RLock()
+
+        self.add_user("admin", super_user=True)
+        for i in range(users):
+            self.add_user("user{i}".format(i=i))
+        user_names = sorted(n for n in self.users if n != "admin")
+
+        for o in range(orgs):
+            org = self.add_org("org{o}".format(o=o), "admin")
+            for t in range(teams):
+                team = self.add_team(org, "team{t}".format(t=t), "member")
+                for m in range(min(team_members, len(user_names))):
+                    team["members"].append(
+                        user_names[(t * team_members + m) % len(user_names)]
+                    )
+            for r in range(robots):
+                self.add_robot(org["robots"], org["name"], "robot{r}".format(r=r))
+            for r in range(repos):
+                self.add_repo(org["name"], "repo{r}".format(r=r), tags)
+
+    def add_user(self, name, super_user=False):
+        """Create a user account and return its description."""
+        user = {
+            "username": name,
+            "email": "{name}@example.com".format(name=name),
+            "verified": True,
+            "super_user": super_user,
+            "enabled": True,
+            "avatar": avatar(name),
+        }
+        self.users[name] = user
+        return user
+
+    def add_org(self, name, owner, email=None):
+        """Create an organization with its ``owners`` team."""
+        org = {
+            "name": name,
+            "email": email or "{name}@example.com".format(name=name),
+            "teams": {},
+            "robots": {},
+            "prototypes": [],
+            "policies": [],
+            "applications": [],
+        }
+        self.orgs[name] = org
+        team = self.add_team(org, "owners", "admin")
+        team["members"].append(owner)
+        return org
+
+    def add_team(self, org, name, role, description=""):
+        """Create a team in the given organization."""
+        team = {"name": name, "role": role, "description": description, "members": []}
+        org["teams"][name] = team
+        return team
+
+    def add_robot(self, robots, namespace, shortname, description=""):
+        """Create a robot account in the given robot dictionary."""
+        name = "{namespace}+{shortname}".format(namespace=namespace, shortname=shortname)
+        robot = {
+            "name": name,
+            "created": email.utils.formatdate(0, usegmt=True),
+            "last_accessed": None,
+            "description": description,
+            "token": hashlib.sha1(name.encode("utf-8")).hexdigest().upper(),
+            "unstructured_metadata": {},
+        }
+        robots[shortname] = robot
+        return robot
+
+    def add_repo(self, namespace, name, tags=0, visibility="private", description=""):
+        """Create a repository with the given number of tags."""
+        full_name = "{namespace}/{name}".format(namespace=namespace, name=name)
+        repo = {
+            "namespace": namespace,
+            "name": name,
+            "description": description,
+            "is_public": visibility == "public",
+            "state": "NORMAL",
+            "tags": [],
+            "user_perms": {},
+            "team_perms": {},
+            "policies": [],
+            "labels": {},
+        }
+        # Most recent tags first, like the tag listing endpoint returns them.
+        # One tag per minute up to now, so that the age filters have something
+        # to select.
+        now = int(time.time())
+        for t in range(tags):
+            tag_name = "v{t}".format(t=t)
+            repo["tags"].append(
+                self.make_tag(tag_name, digest_of(full_name, tag_name), now - t * 60)
+            )
+        self.repos[full_name] = repo
+        return repo
+
+    def make_tag(self, name, manifest_digest, start_ts):
+        """Return a tag description."""
+        return {
+            "name": name,
+            "reversion": False,
+            "start_ts": start_ts,
+            "manifest_digest": manifest_digest,
+            "is_manifest_list": False,
+            "size": 2815971,
+            "last_modified": email.utils.formatdate(start_ts, usegmt=True),
+        }
+
+    def add_tag(self, repo, name, manifest_digest):
+        """Add or move a tag in a repository, in first position (most recent)."""
+        repo["tags"] = [t for t in repo["tags"] if t["name"] != name]
+        tag = self.make_tag(name, manifest_digest, int(time.time()))
+        repo["tags"].insert(0, tag)
+        return tag
+
+    def get_account(self, name):
+        """Return the user or robot account with the given name, or ``None``."""
+        if name in self.users:
+            return self.users[name]
+        namespace, _sep, shortname = name.partition("+")
+        if not shortname:
+            return None
+        if namespace in self.orgs:
+            return self.orgs[namespace]["robots"].get(shortname)
+        return self.user_robots.get(namespace, {}).get(shortname)
+
+
+def error(status, message):
+    """Return a (status, body) tuple for an API error."""
+    return (
+        status,
+        {
+            "detail": message,
+            "error_message": message,
+            "error_type": "invalid_request",
+            "status": status,
+            "title": "invalid_request",
+        },
+    )
+
+
+class Route(object):
+    """Map an HTTP method and a path pattern to a handler method."""
+
+    def __init__(self, method, pattern, handler, anonymous=False):
+        self.method = method
+        self.template = pattern
+        regex = re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", pattern)
+        # The repository name includes the namespace
+        regex = regex.replace("(?P<full_repo_name>[^/]+)", "(?P<full_repo_name>[^/]+/[^/]+)")
+        self.regex = re.compile("^" + regex + "$")
+        self.handler = handler
+        self.anonymous = anonymous
+
+
+class FakeQuayAPI(object):
+    """Implementation of the API endpoints.
+
+    Each handler receives the authenticated user name (or ``None``), the
+    query parameters, the JSON body, and the path parameters. It returns a
+    (status, body) tuple.
+    """
+
+    def __init__(self, dataset):
+        self.data = dataset
+        self.routes = [
+            Route("POST", "signin", self.signin, anonymous=True),
+            Route("POST", "signout", self.signout, anonymous=True),
+            Route("GET", "user/", self.get_user),
+            Route("GET", "user/robots/", self.list_user_robots),
+            Route("GET", "user/robots/{shortname}", self.get_user_robot),
+            Route("PUT", "user/robots/{shortname}", self.put_user_robot),
+            Route("DELETE", "user/robots/{shortname}", self.delete_user_robot),
+            Route("GET", "user/starred", self.get_starred),
+            Route("POST", "user/starred", self.post_starred),
+            Route("DELETE", "user/starred/{full_repo_name}", self.delete_starred),
+            Route("GET", "entities/{prefix}", self.search_entities),
+            Route("POST", "entities/link/{username}", self.link_entity),
+            Route("GET", "superuser/users/", self.list_users),
+            Route("POST", "superuser/users/", self.create_user),
+            Route("GET", "superuser/users/{username}", self.get_superuser_user),
+            Route("PUT", "superuser/users/{username}", self.update_user),
+            Route("DELETE", "superuser/users/{username}", self.delete_user),
+            Route("PUT", "superuser/organizations/{orgname}", self.rename_org),
+            Route("POST", "organization/", self.create_org),
+            Route("GET", "organization/{orgname}", self.get_org),
+            Route("PUT", "organization/{orgname}", self.update_org),
+            Route("DELETE", "organization/{orgname}", self.delete_org),
+            Route("GET", "organization/{orgname}/team/{teamname}", self.get_team),
+            Route("PUT", "organization/{orgname}/team/{teamname}", self.put_team),
+            Route("DELETE", "organization/{orgname}/team/{teamname}", self.delete_team),
+            Route(
+                "GET", "organization/{orgname}/team/{teamname}/members", self.get_team_members
+            ),
+            Route(
+                "PUT",
+                "organization/{orgname}/team/{teamname}/members/{member}",
+                self.put_team_member,
+            ),
+            Route(
+                "DELETE",
+                "organization/{orgname}/team/{teamname}/members/{member}",
+                self.delete_team_member,
+            ),
+            Route("GET", "organization/{orgname}/robots", self.list_org_robots),
+            Route("GET", "organization/{orgname}/robots/{shortname}", self.get_org_robot),
+            Route("PUT", "organization/{orgname}/robots/{shortname}", self.put_org_robot),
+            Route(
+                "DELETE", "organization/{orgname}/robots/{shortname}", self.delete_org_robot
+            ),
+            Route("GET", "organization/{orgname}/prototypes", self.get_prototypes),
+            Route("POST", "organization/{orgname}/prototypes", self.create_prototype),
+            Route("PUT", "organization/{orgname}/prototypes/{uuid}", self.update_prototype),
+            Route(
+                "DELETE", "organization/{orgname}/prototypes/{uuid}", self.delete_prototype
+            ),
+            Route("GET", "organization/{orgname}/applications", self.list_applications),
+            Route("POST", "organization/{orgname}/applications", self.create_application),
+            Route(
+                "PUT",
+                "organization/{orgname}/applications/{client_id}",
+                self.update_application,
+            ),
+            Route("GET", "organization/{orgname}/autoprunepolicy/", self.get_org_policies),
+            Route("POST", "organization/{orgname}/autoprunepolicy/", self.create_org_policy),
+            Route(
+                "PUT", "organization/{orgname}/autoprunepolicy/{uuid}", self.update_org_policy
+            ),
+            Route(
+                "DELETE",
+                "organization/{orgname}/autoprunepolicy/{uuid}",
+                self.delete_org_policy,
+            ),
+            Route("POST", "repository", self.create_repo),
+            Route("GET", "repository/{full_repo_name}", self.get_repo, anonymous=True),
+            Route("PUT", "repository/{full_repo_name}", self.update_repo),
+            Route("DELETE", "repository/{full_repo_name}", self.delete_repo),
+            Route(
+                "POST", "repository/{full_repo_name}/changevisibility", self.change_visibility
+            ),
+            Route("PUT", "repository/{full_repo_name}/changestate", self.change_state),
+            Route(
+                "GET", "repository/{full_repo_name}/permissions/user/", self.get_user_perms
+            ),
+            Route(
+                "PUT",
+                "repository/{full_repo_name}/permissions/user/{name}",
+                self.put_user_perm,
+            ),
+            Route(
+                "DELETE",
+                "repository/{full_repo_name}/permissions/user/{name}",
+                self.delete_user_perm,
+            ),
+            Route(
+                "GET", "repository/{full_repo_name}/permissions/team/", self.get_team_perms
+            ),
+            Route(
+                "PUT",
+                "repository/{full_repo_name}/permissions/team/{name}",
+                self.put_team_perm,
+            ),
+            Route(
+                "DELETE",
+                "repository/{full_repo_name}/permissions/team/{name}",
+                self.delete_team_perm,
+            ),
+            Route(
+                "GET", "repository/{full_repo_name}/autoprunepolicy/", self.get_repo_policies
+            ),
+            Route(
+                "POST",
+                "repository/{full_repo_name}/autoprunepolicy/",
+                self.create_repo_policy,
+            ),
+            Route(
+                "PUT",
+                "repository/{full_repo_name}/autoprunepolicy/{uuid}",
+                self.update_repo_policy,
+            ),
+            Route(
+                "DELETE",
+                "repository/{full_repo_name}/autoprunepolicy/{uuid}",
+                self.delete_repo_policy,
+            ),
+            Route("GET", "repository/{full_repo_name}/tag/", self.list_tags, anonymous=True),
+            Route("PUT", "repository/{full_repo_name}/tag/{tag}", self.put_tag),
+            Route("DELETE", "repository/{full_repo_name}/tag/{tag}", self.delete_tag),
+            Route(
+                "GET",
+                "repository/{full_repo_name}/manifest/{digest}",
+                self.get_manifest,
+                anonymous=True,
+            ),
+            Route(
+                "GET",
+                "repository/{full_repo_name}/manifest/{digest}/labels",
+                self.get_labels,
+                anonymous=True,
+            ),
+            Route(
+                "POST", "repository/{full_repo_name}/manifest/{digest}/labels", self.add_label
+            ),
+            Route(
+                "DELETE",
+                "repository/{full_repo_name}/manifest/{digest}/labels/{id}",
+                self.delete_label,
+            ),
+            Route(
+                "GET",
+                "repository/{full_repo_name}/manifest/{digest}/security",
+                self.get_security,
+                anonymous=True,
+            ),
+        ]
+
+    def find_route(self, method, path):
+        """Return the route and the path parameters for the request."""
+        for route in self.routes:
+            if route.method != method:
+                continue
+            m = route.regex.match(path)
+            if m:
+                return route, dict((k, unquote(v)) for k, v in m.groupdict().items())
+        return None, None
+
+    # Authentication
+
+    def signin(self, user, query, body, session=None):
+        username = body.get("username")
+        if username not in self.data.users or body.get("password") != self.data.password:
+            return error(403, "Invalid username or password")
+        session_id = uuid.uuid4().hex
+        session["new"] = (session_id, username)
+        return (200, {"success": True})
+
+    def signout(self, user, query, body, session=None):
+        session["logout"] = True
+        return (200, {"success": True})
+
+    # Users and robots
+
+    def get_user(self, user, query, body):
+        details = dict(self.data.users[user])
+        details["organizations"] = [
+            {"name": name, "avatar": avatar(name, "org")}
+            for name, org in sorted(self.data.orgs.items())
+            if any(user in t["members"] for t in org["teams"].values())
+        ]
+        return (200, details)
+
+    def list_user_robots(self, user, query, body):
+        robots = self.data.user_robots.get(user, {})
+        return (200, {"robots": [robots[n] for n in sorted(robots)]})
+
+    def get_user_robot(self, user, query, body, shortname):
+        robot = self.data.user_robots.get(user, {}).get(shortname)
+        return (
+            (200, robot)
+            if robot
+            else error(400, "Could not find robot with specified username")
+        )
+
+    def put_user_robot(self, user, query, body, shortname):
+        robots = self.data.user_robots.setdefault(user, {})
+        if shortname in robots:
+            robots[shortname]["description"] = body.get("description", "")
+            return (200, robots[shortname])
+        return (
+            201,
+            self.data.add_robot(robots, user, shortname, body.get("description", "")),
+        )
+
+    def delete_user_robot(self, user, query, body, shortname):
+        self.data.user_robots.get(user, {}).pop(shortname, None)
+        return (204, None)
+
+    def get_starred(self, user, query, body):
+        repos = []
+        for name in sorted(self.data.starred.get(user, set())):
+            repo = self.data.repos.get(name)
+            if repo:
+                repos.append(
+                    {
+                        "namespace": repo["namespace"],
+                        "name": repo["name"],
+                        "description": repo["description"],
+                        "is_public": repo["is_public"],
+                    }
+                )
+        return (200, {"repositories": repos})
+
+    def post_starred(self, user, query, body):
+        name = "{namespace}/{repository}".format(
+            namespace=body.get("namespace"), repository=body.get("repository")
+        )
+        if name not in self.data.repos:
+            return error(404, "Not Found")
+        self.data.starred.setdefault(user, set()).add(name)
+        return (
+            201,
+            {"namespace": body.get("namespace"), "repository": body.get("repository")},
+        )
+
+    def delete_starred(self, user, query, body, full_repo_name):
+        self.data.starred.get(user, set()).discard(full_repo_name)
+        return (204, None)
+
+    def search_entities(self, user, query, body, prefix):
+        results = []
+        for name in sorted(self.data.users):
+            if name.startswith(prefix):
+                results.append(
+                    {
+                        "name": name,
+                        "kind": "user",
+                        "is_robot": False,
+                        "avatar": avatar(name),
+                    }
+                )
+            if len(results) >= 20:
+                break
+        return (200, {"results": results})
+
+    def link_entity(self, user, query, body, username):
+        if username not in self.data.users:
+            return error(404, "Not Found")
+        return (200, {"entity": {"name": username, "kind": "user", "is_robot": False}})
+
+    def list_users(self, user, query, body):
+        return (200, {"users": [self.data.users[n] for n in sorted(self.data.users)]})
+
+    def create_user(self, user, query, body):
+        username = body.get("username")
+        if username in self.data.users:
+            return error(400, "Requested username already exists")
+        self.data.add_user(username)
+        if body.get("email"):
+            self.data.users[username]["email"] = body["email"]
+        return (
+            201,
+            {
+                "username": username,
+                "email": self.data.users[username]["email"],
+                "password": self.data.password,
+                "encrypted_password": "",
+            },
+        )
+
+    def get_superuser_user(self, user, query, body, username):
+        details = self.data.users.get(username)
+        return (200, details) if details else error(404, "Not Found")
+
+    def update_user(self, user, query, body, username):
+        details = self.data.users.get(username)
+        if not details:
+            return error(404, "Not Found")
+        for key in ("email", "enabled"):
+            if key in body:
+                details[key] = body[key]
+        if "superuser" in body:
+            details["super_user"] = body["superuser"]
+        return (200, details)
+
+    def delete_user(self, user, query, body, username):
+        if self.data.users.pop(username, None) is None:
+            return error(404, "Not Found")
+        return (204, None)
+
+    # Organizations and teams
+
+    def org_details(self, org):
+        teams = dict(
+            (
+                name,
+                {
+                    "name": name,
+                    "description": t["description"],
+                    "role": t["role"],
+                    "avatar": avatar(name, "team"),
+                    "can_view": True,
+                    "repo_count": 0,
+                    "member_count": len(t["members"]),
+                    "is_synced": False,
+                },
+            )
+            for name, t in org["teams"].items()
+        )
+        return {
+            "name": org["name"],
+            "email": org["email"],
+            "avatar": avatar(org["name"], "org"),
+            "is_admin": True,
+            "is_member": True,
+            "teams": teams,
+            "ordered_teams": sorted(teams),
+            "invoice_email": False,
+            "invoice_email_address": None,
+            "tag_expiration_s": 1209600,
+            "is_free_account": True,
+        }
+
+    def create_org(self, user, query, body):
+        name = body.get("name")
+        if name in self.data.orgs or name in self.data.users:
+            return error(400, "A user or organization with this name already exists")
+        self.data.add_org(name, user, body.get("email"))
+        return (201, "Created")
+
+    def get_org(self, user, query, body, orgname):
+        org = self.data.orgs.get(orgname)
+        return (200, self.org_details(org)) if org else error(404, "Not Found")
+
+    def update_org(self, user, query, body, orgname):
+        org = self.data.orgs.get(orgname)
+        if not org:
+            return error(404, "Not Found")
+        if "email" in body:
+            org["email"] = body["email"]
+        return (200, self.org_details(org))
+
+    def delete_org(self, user, query, body, orgname):
+        if self.data.orgs.pop(orgname, None) is None:
+            return error(404, "Not Found")
+        for name in [n for n in self.data.repos if n.startswith(orgname + "/")]:
+            del self.data.repos[name]
+        return (204, None)
+
+    def rename_org(self, user, query, body, orgname):
+        org = self.data.orgs.pop(orgname, None)
+        if not org:
+            return error(404, "Not Found")
+        org["name"] = body.get("name", orgname)
+        self.data.orgs[org["name"]] = org
+        return (200, self.org_details(org))
+
+    def get_team(self, user, query, body, orgname, teamname):
+        org = self.data.orgs.get(orgname)
+        team = org["teams"].get(teamname) if org else None
+        if not team:
+            return error(404, "Not Found")
+        return (200, self.org_details(org)["teams"][teamname])
+
+    def put_team(self, user, query, body, orgname, teamname):
+        org = self.data.orgs.get(orgname)
+        if not org:
+            return error(404, "Not Found")
+        team = org["teams"].get(teamname)
+        if team is None:
+            team = self.data.add_team(org, teamname, body.get("role", "member"))
+        if "role" in body:
+            team["role"] = body["role"]
+        if "description" in body:
+            team["description"] = body["description"]
+        return (200, self.org_details(org)["teams"][teamname])
+
+    def delete_team(self, user, query, body, orgname, teamname):
+        org = self.data.orgs.get(orgname)
+        if not org or org["teams"].pop(teamname, None) is None:
+            return error(404, "Not Found")
+        return (204, None)
+
+    def get_team_members(self, user, query, body, orgname, teamname):
+        org = self.data.orgs.get(orgname)
+        team = org["teams"].get(teamname) if org else None
+        if not team:
+            return error(404, "Not Found")
+        members = []
+        for name in team["members"]:
+            is_robot = "+" in name
+            members.append(
+                {
+                    "name": name,
+                    "kind": "user",
+                    "is_robot": is_robot,
+                    "avatar": avatar(name, "robot" if is_robot else "user"),
+                    "invited": False,
+                }
+            )
+        return (200, {"name": teamname, "members": members, "can_edit": True})
+
+    def put_team_member(self, user, query, body, orgname, teamname, member):
+        org = self.data.orgs.get(orgname)
+        team = org["teams"].get(teamname) if org else None
+        if not team:
+            return error(404, "Not Found")
+        if self.data.get_account(member) is None:
+            return error(400, "Unknown user")
+        if member not in team["members"]:
+            team["members"].append(member)
+        return (200, {"name": member, "kind": "user", "is_robot": "+" in member})
+
+    def delete_team_member(self, user, query, body, orgname, teamname, member):
+        org = self.data.orgs.get(orgname)
+        team = org["teams"].get(teamname) if org else None
+        if not team or member not in team["members"]:
+            return error(404, "Not Found")
+        team["members"].remove(member)
+        return (204, None)
+
+    def list_org_robots(self, user, query, body, orgname):
+        org = self.data.orgs.get(orgname)
+        if not org:
+            return error(404, "Not Found")
+        return (200, {"robots": [org["robots"][n] for n in sorted(org["robots"])]})
+
+    def get_org_robot(self, user, query, body, orgname, shortname):
+        org = self.data.orgs.get(orgname)
+        robot = org["robots"].get(shortname) if org else None
+        return (
+            (200, robot)
+            if robot
+            else error(400, "Could not find robot with specified username")
+        )
+
+    def put_org_robot(self, user, query, body, orgname, shortname):
+        org = self.data.orgs.get(orgname)
+        if not org:
+            return error(404, "Not Found")
+        if shortname in org["robots"]:
+            org["robots"][shortname]["description"] = body.get("description", "")
+            return (200, org["robots"][shortname])
+        return (
+            201,
+            self.data.add_robot(
+                org["robots"], orgname, shortname, body.get("description", "")
+            ),
+        )
+
+    def delete_org_robot(self, user, query, body, orgname, shortname):
+        org = self.data.orgs.get(orgname)
+        if not org or org["robots"].pop(shortname, None) is None:
+            return error(400, "Could not find robot with specified username")
+        return (204, None)
+
+    # Default permissions
+
+    def get_prototypes(self, user, query, body, orgname):
+        org = self.data.orgs.get(orgname)
+        if not org:
+            return error(404, "Not Found")
+        return (200, {"prototypes": org["prototypes"]})
+
+    def create_prototype(self, user, query, body, orgname):
+        org = self.data.orgs.get(orgname)
+        if not org:
+            return error(404, "Not Found")
+        delegate = body.get("delegate", {})
+        prototype = {
+            "id": str(uuid.uuid4()),
+            "role": body.get("role"),
+            "delegate": {
+                "name": delegate.get("name"),
+                "kind": delegate.get("kind"),
+                "is_robot": "+" in (delegate.get("name") or ""),
+            },
+        }
+        if body.get("activating_user"):
+            prototype["activating_user"] = {"name": body["activating_user"].get("name")}
+        org["prototypes"].append(prototype)
+        return (200, prototype)
+
+    def update_prototype(self, user, query, body, orgname, uuid):
+        org = self.data.orgs.get(orgname)
+        for prototype in org["prototypes"] if org else []:
+            if prototype["id"] == uuid:
+                prototype["role"] = body.get("role", prototype["role"])
+                return (200, prototype)
+        return error(404, "Not Found")
+
+    def delete_prototype(self, user, query, body, orgname, uuid):
+        org = self.data.orgs.get(orgname)
+        if not org:
+            return error(404, "Not Found")
+        org["prototypes"] = [p for p in org["prototypes"] if p["id"] != uuid]
+        return (204, None)
+
+    # OAuth applications
+
+    def list_applications(self, user, query, body, orgname):
+        org = self.data.orgs.get(orgname)
+        if not org:
+            return error(404, "Not Found")
+        return (200, {"applications": org["applications"]})
+
+    def create_application(self, user, query, body, orgname):
+        org = self.data.orgs.get(orgname)
+        if not org:
+            return error(404, "Not Found")
+        application = {
+            "name": body.get("name"),
+            "description": body.get("description", ""),
+            "application_uri": body.get("application_uri", ""),
+            "client_id": uuid.uuid4().hex[:20].upper(),
+            "client_secret": uuid.uuid4().hex.upper(),
+            "redirect_uri": body.get("redirect_uri", ""),
+            "avatar_email": body.get("avatar_email"),
+        }
+        org["applications"].append(application)
+        return (200, application)
+
+    def update_application(self, user, query, body, orgname, client_id):
+        org = self.data.orgs.get(orgname)
+        for application in org["applications"] if org else []:
+            if application["client_id"] == client_id:
+                application.update(body)
+                return (200, application)
+        return error(404, "Not Found")
+
+    # Auto-prune policies
+
+    def get_policies(self, owner):
+        if owner is None:
+            return error(404, "Not Found")
+        return (200, {"policies": owner["policies"]})
+
+    def create_policy(self, owner, body):
+        if owner is None:
+            return error(404, "Not Found")
+        policy = {
+            "uuid": str(uuid.uuid4()),
+            "method": body.get("method"),
+            "value": body.get("value"),
+        }
+        owner["policies"].append(policy)
+        return (201, {"uuid": policy["uuid"]})
+
+    def update_policy(self, owner, body, policy_id):
+        for policy in owner["policies"] if owner else []:
+            if policy["uuid"] == policy_id:
+                policy["method"] = body.get("method", policy["method"])
+                policy["value"] = body.get("value", policy["value"])
+                return (200, {"uuid": policy_id})
+        return error(404, "Not Found")
+
+    def delete_policy(self, owner, policy_id):
+        if owner is None:
+            return error(404, "Not Found")
+        owner["policies"] = [p for p in owner["policies"] if p["uuid"] != policy_id]
+        return (200, {"uuid": policy_id})
+
+    def get_org_policies(self, user, query, body, orgname):
+        return self.get_policies(self.data.orgs.get(orgname))
+
+    def create_org_policy(self, user, query, body, orgname):
+        return self.create_policy(self.data.orgs.get(orgname), body)
+
+    def update_org_policy(self, user, query, body, orgname, uuid):
+        return self.update_policy(self.data.orgs.get(orgname), body, uuid)
+
+    def delete_org_policy(self, user, query, body, orgname, uuid):
+        return self.delete_policy(self.data.orgs.get(orgname), uuid)
+
+    def get_repo_policies(self, user, query, body, full_repo_name):
+        return self.get_policies(self.data.repos.get(full_repo_name))
+
+    def create_repo_policy(self, user, query, body, full_repo_name):
+        return self.create_policy(self.data.repos.get(full_repo_name), body)
+
+    def update_repo_policy(self, user, query, body, full_repo_name, uuid):
+        return self.update_policy(self.data.repos.get(full_repo_name), body, uuid)
+
+    def delete_repo_policy(self, user, query, body, full_repo_name, uuid):
+        return self.delete_policy(self.data.repos.get(full_repo_name), uuid)
+
+    # Repositories and permissions
+
+    def create_repo(self, user, query, body):
+        namespace = body.get("namespace")
+        name = "{namespace}/{repository}".format(
+            namespace=namespace, repository=body.get("repository")
+        )
+        if namespace not in self.data.orgs and namespace not in self.data.users:
+            return error(404, "Not Found")
+        if name in self.data.repos:
+            return error(400, "Repository already exists")
+        self.data.add_repo(
+            namespace,
+            body.get("repository"),
+            visibility=body.get("visibility", "private"),
+            description=body.get("description", ""),
+        )
+        return (
+            201,
+            {"namespace": namespace, "name": body.get("repository"), "kind": "image"},
+        )
+
+    def get_repo(self, user, query, body, full_repo_name):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo or (user is None and not repo["is_public"]):
+            return error(404, "Not Found")
+        return (
+            200,
+            {
+                "namespace": repo["namespace"],
+                "name": repo["name"],
+                "kind": "image",
+                "description": repo["description"],
+                "is_public": repo["is_public"],
+                "is_organization": repo["namespace"] in self.data.orgs,
+                "is_starred": full_repo_name in self.data.starred.get(user, set()),
+                "status_token": "",
+                "trust_enabled": False,
+                "tag_expiration_s": 1209600,
+                "is_free_account": True,
+                "state": repo["state"],
+                "tags": {},
+                "can_write": user is not None,
+                "can_admin": user is not None,
+            },
+        )
+
+    def update_repo(self, user, query, body, full_repo_name):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo:
+            return error(404, "Not Found")
+        repo["description"] = body.get("description", repo["description"])
+        return (200, {"success": True})
+
+    def delete_repo(self, user, query, body, full_repo_name):
+        if self.data.repos.pop(full_repo_name, None) is None:
+            return error(404, "Not Found")
+        return (204, None)
+
+    def change_visibility(self, user, query, body, full_repo_name):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo:
+            return error(404, "Not Found")
+        repo["is_public"] = body.get("visibility") == "public"
+        return (200, {"success": True})
+
+    def change_state(self, user, query, body, full_repo_name):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo:
+            return error(404, "Not Found")
+        repo["state"] = body.get("state", repo["state"])
+        return (200, {"success": True})
+
+    def get_user_perms(self, user, query, body, full_repo_name):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo:
+            return error(404, "Not Found")
+        perms = dict(
+            (
+                name,
+                {
+                    "role": role,
+                    "name": name,
+                    "is_robot": "+" in name,
+                    "avatar": avatar(name),
+                    "is_org_member": True,
+                },
+            )
+            for name, role in repo["user_perms"].items()
+        )
+        return (200, {"permissions": perms})
+
+    def put_user_perm(self, user, query, body, full_repo_name, name):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo:
+            return error(404, "Not Found")
+        if self.data.get_account(name) is None:
+            return error(400, "Invalid username: {name}".format(name=name))
+        repo["user_perms"][name] = body.get("role", "read")
+        return (
+            200,
+            {"role": repo["user_perms"][name], "name": name, "is_robot": "+" in name},
+        )
+
+    def delete_user_perm(self, user, query, body, full_repo_name, name):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo or repo["user_perms"].pop(name, None) is None:
+            return error(400, "User does not have permission for repo.")
+        return (204, None)
+
+    def get_team_perms(self, user, query, body, full_repo_name):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo:
+            return error(404, "Not Found")
+        perms = dict(
+            (name, {"role": role, "name": name, "avatar": avatar(name, "team")})
+            for name, role in repo["team_perms"].items()
+        )
+        return (200, {"permissions": perms})
+
+    def put_team_perm(self, user, query, body, full_repo_name, name):
+        repo = self.data.repos.get(full_repo_name)
+        org = self.data.orgs.get(full_repo_name.split("/", 1)[0])
+        if not repo or not org or name not in org["teams"]:
+            return error(400, "Team does not exist")
+        repo["team_perms"][name] = body.get("role", "read")
+        return (200, {"role": repo["team_perms"][name], "name": name})
+
+    def delete_team_perm(self, user, query, body, full_repo_name, name):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo or repo["team_perms"].pop(name, None) is None:
+            return error(400, "Team does not have permission for repo.")
+        return (204, None)
+
+    # Tags, manifests, labels, and security reports
+
+    def list_tags(self, user, query, body, full_repo_name):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo or (user is None and not repo["is_public"]):
+            return error(404, "Not Found")
+        try:
+            page = max(int(query.get("page", ["1"])[0]), 1)
+            limit = min(max(int(query.get("limit", ["50"])[0]), 1), TAG_PAGE_LIMIT)
+        except ValueError:
+            return error(400, "Invalid page or limit parameter")
+        tags = repo["tags"]
+        specific_tag = query.get("specificTag", [None])[0]
+        if specific_tag:
+            tags = [t for t in tags if t["name"] == specific_tag]
+        start = (page - 1) * limit
+        return (
+            200,
+            {
+                "tags": tags[start : start + limit],
+                "page": page,
+                "has_additional": len(tags) > start + limit,
+            },
+        )
+
+    def put_tag(self, user, query, body, full_repo_name, tag):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo:
+            return error(404, "Not Found")
+        current = [t for t in repo["tags"] if t["name"] == tag]
+        if body.get("manifest_digest"):
+            self.data.add_tag(repo, tag, body["manifest_digest"])
+        elif not current:
+            return error(404, "Not Found")
+        if "expiration" in body:
+            for t in repo["tags"]:
+                if t["name"] == tag:
+                    t["expiration"] = body["expiration"]
+        return (201, "Updated")
+
+    def delete_tag(self, user, query, body, full_repo_name, tag):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo or not any(t["name"] == tag for t in repo["tags"]):
+            return error(404, "Not Found")
+        repo["tags"] = [t for t in repo["tags"] if t["name"] != tag]
+        return (204, None)
+
+    def find_manifest(self, user, full_repo_name, digest):
+        repo = self.data.repos.get(full_repo_name)
+        if not repo or (user is None and not repo["is_public"]):
+            return None
+        for t in repo["tags"]:
+            if t["manifest_digest"] == digest:
+                return repo
+        return None
+
+    def get_manifest(self, user, query, body, full_repo_name, digest):
+        if not self.find_manifest(user, full_repo_name, digest):
+            return error(404, "Not Found")
+        layers = [
+            {
+                "index": i,
+                "compressed_size": 1024 * (i + 1),
+                "is_remote": False,
+                "urls": None,
+                "command": ["/bin/sh", "-c", "step {i}".format(i=i)],
+                "comment": None,
+                "author": None,
+                "blob_digest": digest_of(digest, str(i)),
+                "created_datetime": "Mon, 06 Nov 2023 12:00:00 -0000",
+            }
+            for i in range(3)
+        ]
+        manifest_data = {
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.docker.distribution.manifest.v2+json",
+            "layers": [{"digest": layer["blob_digest"]} for layer in layers],
+        }
+        return (
+            200,
+            {
+                "digest": digest,
+                "is_manifest_list": False,
+                "manifest_data": json.dumps(manifest_data),
+                "config_media_type": "application/vnd.docker.container.image.v1+json",
+                "layers": layers,
+            },
+        )
+
+    def get_labels(self, user, query, body, full_repo_name, digest):
+        repo = self.find_manifest(user, full_repo_name, digest)
+        if not repo:
+            return error(404, "Not Found")
+        return (200, {"labels": repo["labels"].get(digest, [])})
+
+    def add_label(self, user, query, body, full_repo_name, digest):
+        repo = self.find_manifest(user, full_repo_name, digest)
+        if not repo:
+            return error(404, "Not Found")
+        label = {
+            "id": str(uuid.uuid4()),
+            "key": body.get("key"),
+            "value": body.get("value"),
+            "source_type": "api",
+            "media_type": body.get("media_type") or "text/plain",
+        }
+        repo["labels"].setdefault(digest, []).append(label)
+        return (201, {"label": label})
+
+    def delete_label(self, user, query, body, full_repo_name, digest, id):
+        repo = self.find_manifest(user, full_repo_name, digest)
+        if not repo:
+            return error(404, "Not Found")
+        labels = repo["labels"].get(digest, [])
+        repo["labels"][digest] = [label for label in labels if label["id"] != id]
+        return (204, None)
+
+    def get_security(self, user, query, body, full_repo_name, digest):
+        if not self.find_manifest(user, full_repo_name, digest):
+            return error(404, "Not Found")
+        features = [
+            {
+                "Name": "openssl",
+                "VersionFormat": "",
+                "NamespaceName": "",
+                "AddedBy": digest_of(digest, "0"),
+                "Version": "3.0.7-{i}".format(i=i),
+                "Vulnerabilities": [
+                    {
+                        "Severity": "High",
+                        "NamespaceName": "RHEL9",
+                        "Link": "https://access.redhat.com/errata/RHSA-2024:0001",
+                        "FixedBy": "0:3.0.7-27.el9",
+                        "Description": "OpenSSL security update",
+                        "Name": "RHSA-2024:0001",
+                        "Metadata": {},
+                    }
+                ],
+            }
+            for i in range(2)
+        ]
+        return (
+            200,
+            {
+                "status": "scanned",
+                "data": {
+                    "Layer": {
+                        "Name": digest,
+                        "ParentName": "",
+                        "NamespaceName": "",
+                        "IndexedByVersion": 4,
+                        "Features": features,
+                    }
+                },
+            },
+        )
+
+
+class FakeQuay(object):
+    """HTTP server that serves the fake Quay API.
+
+    :param dataset: The data to serve. A small dataset is generated by
+                    default.
+    :type dataset: :py:class:``Dataset``
+    :param latency: Time in seconds that the server waits before processing
+                    each request, to simulate a remote server.
+    :type latency: float
+    :param host: Address to listen on.
+    :type host: str
+    :param port: Port to listen on. ``0`` selects a free port.
+    :type port: int
+    :param etags: Whether to return an ``ETag`` header with the responses to
+                  GET requests, and to answer ``304 Not Modified`` to the
+                  conditional requests (``If-None-Match``).
+    :type etags: bool
+    :param compress: Whether to compress the responses larger than 1 KiB when
+                     the client accepts the gzip or the deflate encoding.
+    :type compress: bool
+    :param registry: Whether to serve the registry API (``/v2/``). When
+                     ``False``, the server returns ``404`` for the registry
+                     API, like a Quay installation behind a proxy that only
+                     forwards ``/api/``.
+    :type registry: bool
+    """
+
+    def __init__(
+        self,
+        dataset=None,
+        latency=0.0,
+        host="127.0.0.1",
+        port=0,
+        etags=False,
+        compress=False,
+        registry=True,
+    ):
+        self.data = dataset if dataset is not None else Dataset()
+        self.api = FakeQuayAPI(self.data)
+        self.latency = latency
+        self.etags = etags
+        self.compress = compress
+        self.registry = registry
+        self.sessions = {}
+        # Registry bearer tokens. Values are (user, repository) tuples.
+        self.registry_tokens = {}
+        self.lock = threading.Lock()
+        self.stats = {}
+        # Sockets of the client connections. The set keeps the sockets and
+        # not their id() values, which Python reuses for new objects after
+        # the server closes and releases a socket.
+        self.connections = set()
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        """URL of the server, for the ``quay_host`` module parameter."""
+        host, port = self.server.server_address[:2]
+        return "http://{host}:{port}".format(host=host, port=port)
+
+    @property
+    def token(self):
+        """OAuth access token of the ``admin`` user."""
+        return next(iter(self.data.tokens))
+
+    def start(self):
+        """Start the server in a background thread."""
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def reset_stats(self):
+        """Reset the request counters."""
+        with self.lock:
+            self.stats = {}
+            self.connections = set()
+
+    def get_stats(self):
+        """Return the request counters.
+
+        :return: The total number of requests, the number of TCP connections,
+                 and the number of requests for each method and endpoint
+                 template.
+        :rtype: dict
+        """
+        with self.lock:
+            return {
+                "requests": sum(self.stats.values()),
+                "connections": len(self.connections),
+                "endpoints": dict(
+                    ("{0} {1}".format(*k), v) for k, v in sorted(self.stats.items())
+                ),
+            }
+
+    def count(self, method, template, connection):
+        with self.lock:
+            key = (method, template)
+            self.stats[key] = self.stats.get(key, 0) + 1
+            self.connections.add(connection)
+
+    def make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Send the headers and the body in one packet. Otherwise, the
+            # Nagle algorithm and the delayed acknowledgments add 40ms to each
+            # request on persistent connections.
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, status, body, headers=None):
+                data = b"" if body is None else json.dumps(body).encode("utf-8")
+                encoding = None
+                if fake.compress and len(data) > 1024:
+                    accept = self.headers.get("Accept-Encoding") or ""
+                    if "gzip" in accept:
+                        encoding = "gzip"
+                        data = gzip.compress(data)
+                    elif "deflate" in accept:
+                        encoding = "deflate"
+                        data = zlib.compress(data)
+                self.send_response(status)
+                if body is not None:
+                    self.send_header("Content-Type", "application/json")
+                if encoding:
+                    self.send_header("Content-Encoding", encoding)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def get_user(self):
+                auth = self.headers.get("Authorization") or ""
+                if auth.startswith("Bearer "):
+                    return fake.data.tokens.get(auth[7:].strip())
+                cookies = self.headers.get("Cookie") or ""
+                m = re.search(r"(?:^|;\s*)session=([0-9a-f]+)", cookies)
+                if m and self.headers.get("X-CSRF-Token") == CSRF_TOKEN:
+                    return fake.sessions.get(m.group(1))
+                return None
+
+            def handle_request(self, method):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+
+                # Root page, which provides the CSRF token
+                if url.path == "/" and method == "GET":
+                    fake.count(method, "/", self.connection)
+                    page = "<script>window.__token = '{t}';</script>".format(t=CSRF_TOKEN)
+                    data = page.encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.send_header("Set-Cookie", "_csrf_token=fake; Path=/")
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+
+                if url.path.startswith("/v2/"):
+                    return self.handle_registry(method, url)
+
+                if not url.path.startswith("/api/v1/"):
+                    fake.count(method, url.path, self.connection)
+                    return self.send_json(*error(404, "Not Found"))
+                path = url.path[len("/api/v1/") :]
+                route, params = fake.api.find_route(method, path)
+                if route is None:
+                    fake.count(method, path, self.connection)
+                    return self.send_json(*error(404, "Not Found"))
+                fake.count(method, route.template, self.connection)
+
+                try:
+                    body = json.loads(raw.decode("utf-8")) if raw else {}
+                except ValueError:
+                    return self.send_json(*error(400, "Invalid JSON"))
+                query = parse_qs(url.query)
+
+                if route.handler in (fake.api.signin, fake.api.signout):
+                    if self.headers.get("X-CSRF-Token") != CSRF_TOKEN:
+                        return self.send_json(
+                            *error(403, "CSRF token was invalid or missing.")
+                        )
+                    session = {}
+                    with fake.data.lock:
+                        status, response = route.handler(None, query, body, session=session)
+                    headers = {"X-Next-CSRF-Token": CSRF_TOKEN}
+                    if "new" in session:
+                        session_id, username = session["new"]
+                        fake.sessions[session_id] = username
+                        headers["Set-Cookie"] = "session={s}; Path=/; HttpOnly".format(
+                            s=session_id
+                        )
+                    return self.send_json(status, response, headers)
+
+                user = self.get_user()
+                if user is None and not route.anonymous:
+                    return self.send_json(*error(401, "Unauthorized"))
+                with fake.data.lock:
+                    status, response = route.handler(user, query, body, **params)
+                if method == "GET" and status == 200 and fake.etags:
+                    data = json.dumps(response).encode("utf-8")
+                    etag = '"{h}"'.format(h=hashlib.md5(data).hexdigest())
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    return self.send_json(status, response, {"ETag": etag})
+                self.send_json(status, response)
+
+            def handle_registry(self, method, url):
+                if not fake.registry:
+                    fake.count(method, url.path, self.connection)
+                    return self.send_json(*error(404, "Not Found"))
+                if url.path == "/v2/auth" and method == "GET":
+                    fake.count(method, "v2/auth", self.connection)
+                    return self.registry_token(parse_qs(url.query))
+                m = re.match(r"^/v2/(.+)/tags/list$", url.path)
+                if m and method == "GET":
+                    fake.count(method, "v2/{repository}/tags/list", self.connection)
+                    if not self.registry_authorized(m.group(1)):
+                        return self.send_registry_unauthorized(m.group(1))
+                    return self.list_tag_names(m.group(1), parse_qs(url.query))
+                m = re.match(r"^/v2/(.+)/manifests/([^/]+)$", url.path)
+                if not m or method not in ("GET", "HEAD"):
+                    fake.count(method, url.path, self.connection)
+                    return self.send_json(*error(404, "Not Found"))
+                fake.count(method, "v2/{repository}/manifests/{reference}", self.connection)
+                full_repo_name, reference = m.groups()
+                if not self.registry_authorized(full_repo_name):
+                    return self.send_registry_unauthorized(full_repo_name)
+                repo = fake.data.repos.get(full_repo_name)
+                field = "manifest_digest" if reference.startswith("sha256:") else "name"
+                tag = next(
+                    (t for t in (repo or {}).get("tags", []) if t[field] == reference), None
+                )
+                if tag is None:
+                    return self.send_json(404, {"errors": [{"code": "MANIFEST_UNKNOWN"}]})
+                data = json.dumps(
+                    {
+                        "schemaVersion": 2,
+                        "mediaType": "application/vnd.oci.image.manifest.v1+json",
+                    }
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/vnd.oci.image.manifest.v1+json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Docker-Content-Digest", tag["manifest_digest"])
+                self.end_headers()
+                if method == "GET":
+                    self.wfile.write(data)
+
+            def registry_authorized(self, full_repo_name):
+                auth = self.headers.get("Authorization") or ""
+                granted = fake.registry_tokens.get(auth[7:].strip(), (None, None))
+                return auth.startswith("Bearer ") and granted[1] == full_repo_name
+
+            def send_registry_unauthorized(self, full_repo_name):
+                return self.send_json(
+                    401,
+                    {"errors": [{"code": "UNAUTHORIZED"}]},
+                    {
+                        "WWW-Authenticate": (
+                            'Bearer realm="{url}/v2/auth",service="{host}",'
+                            'scope="repository:{name}:pull"'
+                        ).format(
+                            url=fake.url, host=self.headers.get("Host"), name=full_repo_name
+                        )
+                    },
+                )
+
+            def list_tag_names(self, full_repo_name, query):
+                repo = fake.data.repos.get(full_repo_name)
+                if not repo:
+                    return self.send_json(404, {"errors": [{"code": "NAME_UNKNOWN"}]})
+                try:
+                    limit = min(
+                        max(int(query.get("n", ["100"])[0]), 1), REGISTRY_TAG_PAGE_LIMIT
+                    )
+                except ValueError:
+                    return self.send_json(
+                        400, {"errors": [{"code": "PAGINATION_NUMBER_INVALID"}]}
+                    )
+                last = query.get("last", [None])[0]
+                # Sorting the names of a large repository for each page would
+                # make the server, and not the module, the bottleneck
+                key = (id(repo["tags"]), len(repo["tags"]))
+                if repo.get("sorted_names", (None, None))[0] != key:
+                    repo["sorted_names"] = (key, sorted(set(t["name"] for t in repo["tags"])))
+                names = repo["sorted_names"][1]
+                start = bisect.bisect_right(names, last) if last is not None else 0
+                page = names[start : start + limit]
+                headers = {}
+                if len(names) > start + limit:
+                    headers["Link"] = (
+                        '</v2/{name}/tags/list?n={n}&last={last}>; rel="next"'.format(
+                            name=full_repo_name, n=limit, last=page[-1]
+                        )
+                    )
+                return self.send_json(200, {"name": full_repo_name, "tags": page}, headers)
+
+            def registry_token(self, query):
+                auth = self.headers.get("Authorization") or ""
+                user = None
+                if auth.startswith("Basic "):
+                    try:
+                        username, _sep, password = (
+                            base64.b64decode(auth[6:].strip()).decode("utf-8").partition(":")
+                        )
+                    except ValueError:
+                        return self.send_json(*error(400, "Invalid credentials"))
+                    if username == "$oauthtoken":
+                        user = fake.data.tokens.get(password)
+                    elif username in fake.data.users and password == fake.data.password:
+                        user = username
+                    if user is None:
+                        return self.send_json(*error(401, "Invalid username or password"))
+                # Only pull scopes are granted, for one repository
+                scope = query.get("scope", [""])[0]
+                m = re.match(r"^repository:(.+):pull$", scope)
+                full_repo_name = None
+                if m:
+                    repo = fake.data.repos.get(m.group(1))
+                    if repo and (user is not None or repo["is_public"]):
+                        full_repo_name = m.group(1)
+                token = uuid.uuid4().hex
+                with fake.lock:
+                    fake.registry_tokens[token] = (user, full_repo_name)
+                return self.send_json(200, {"token": token})
+
+            def do_GET(self):
+                self.handle_request("GET")
+
+            def do_HEAD(self):
+                self.handle_request("HEAD")
+
+            def do_POST(self):
+                self.handle_request("POST")
+
+            def do_PUT(self):
+                self.handle_request("PUT")
+
+            def do_DELETE(self):
+                self.handle_request("DELETE")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Quay API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per request")
+    parser.add_argument("--orgs", type=int, default=1)
+    parser.add_argument("--repos", type=int, default=5, help="Repositories per organization")
+    parser.add_argument("--tags", type=int, default=20, help="Tags per repository")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--teams", type=int, default=2, help="Teams per organization")
+    parser.add_argument("--team-members", type=int, default=5, help="Members per team")
+    parser.add_argument("--robots", type=int, default=2, help="Robots per organization")
+    parser.add_argument("--token", default="fake-admin-token")
+    parser.add_argument(
+        "--etags", action="store_true", help="Support conditional GET requests (ETag)"
+    )
+    parser.add_argument(
+        "--compress", action="store_true", help="Compress the responses (gzip, deflate)"
+    )
+    parser.add_argument(
+        "--no-registry", action="store_true", help="Do not serve the registry API (/v2/)"
+    )
+    args = parser.parse_args()
+
+    dataset = Dataset(
+        orgs=args.orgs,
+        repos=args.repos,
+        tags=args.tags,
+        users=args.users,
+        teams=args.teams,
+        team_members=args.team_members,
+        robots=args.robots,
+        token=args.token,
+    )
+    quay = FakeQuay(
+        dataset,
+        latency=args.latency,
+        host=args.host,
+        port=args.port,
+        etags=args.etags,
+        registry=not args.no_registry,
+        compress=args.compress,
+    )
+    print("Fake Quay API listening on {url}".format(url=quay.url))
+    print("Token for the admin user: {token}".format(token=quay.token))
+    try:
+        quay.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        quay.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import importlib
+import json
+import os
+import shutil
+
+import pytest
+
+PERF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "perf")
+MEASURES = {"requests": 10, "connections": 1, "wall_time": 1.0, "peak_rss_kb": 50000}
+
+
+@pytest.fixture
+def benchmark(monkeypatch):
+    # The script imports the fake server module from its own directory
+    monkeypatch.syspath_prepend(PERF_DIR)
+    return importlib.import_module("benchmark")
+
+
+def test_no_regression(benchmark):
+    measures = dict(MEASURES, wall_time=1.4, peak_rss_kb=70000)
+
+    assert benchmark.compare("scenario", measures, MEASURES, 0.5) == []
+
+
+def test_no_baseline(benchmark):
+    assert benchmark.compare("scenario", MEASURES, None, 0.5) == []
+
+
+def test_more_requests_is_a_regression(benchmark):
+    measures = dict(MEASURES, requests=11)
+
+    assert benchmark.compare("scenario", measures, MEASURES, 10) == [
+        "scenario: 11 requests (baseline 10)"
+    ]
+
+
+@pytest.mark.parametrize("key, value", [("wall_time", 1.6), ("peak_rss_kb", 75001)])
+def test_tolerance(benchmark, key, value):
+    measures = dict(MEASURES, **{key: value})
+
+    (regression,) = benchmark.compare("scenario", measures, MEASURES, 0.5)
+    assert regression.startswith("scenario: " + key)
+
+
+def test_baselines_cover_all_scenarios(benchmark):
+    with open(benchmark.BASELINES) as f:
+        baselines = json.load(f)
+
+    assert sorted(baselines) == sorted(s[0] for s in benchmark.SCENARIOS)
+
+
+def test_scenario_matches_baseline(benchmark):
+    name, module, params = next(s for s in benchmark.SCENARIOS if s[0] == "quay_organization")
+    with open(benchmark.BASELINES) as f:
+        baseline = json.load(f)[name]
+
+    pythonpath = benchmark.collection_path()
+    try:
+        measures, result = benchmark.run_scenario(module, params, 0, pythonpath)
+    finally:
+        shutil.rmtree(pythonpath)
+
+    assert not result.get("failed"), result.get("msg")
+    assert measures["requests"] == baseline["requests"]
@@ -0,0 +1,126 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import base64
+import gzip
+import json
+
+import pytest
+
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+
+from ansible_collections.herve4m.quay.tests.perf.fake_quay import Dataset, FakeQuay
+
+
+def get(quay, path, headers=None, token=True):
+    """Send a GET request and return the response and its body."""
+    url = urlparse(quay.url)
+    conn = http_client.HTTPConnection(url.hostname, url.port, timeout=5)
+    request_headers = dict(headers or {})
+    if token:
+        request_headers["Authorization"] = "Bearer " + quay.token
+    try:
+        conn.request("GET", path, headers=request_headers)
+        response = conn.getresponse()
+        return (response, response.read())
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def quay():
+    with FakeQuay(Dataset(tags=20)) as quay:
+        yield quay
+
+
+def test_tag_pages(quay):
+    response, body = get(quay, "/api/v1/repository/org0/repo0/tag/?limit=15&page=1")
+    first = json.loads(body)
+    response, body = get(quay, "/api/v1/repository/org0/repo0/tag/?limit=15&page=2")
+    second = json.loads(body)
+
+    assert response.status == 200
+    assert (len(first["tags"]), first["has_additional"]) == (15, True)
+    assert (len(second["tags"]), second["has_additional"]) == (5, False)
+    # The most recent tags come first
+    timestamps = [t["start_ts"] for t in first["tags"] + second["tags"]]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+
+def test_authentication_required(quay):
+    response, body = get(quay, "/api/v1/user/", token=False)
+
+    assert response.status == 401
+
+
+def test_stats(quay):
+    get(quay, "/api/v1/repository/org0/repo0")
+    get(quay, "/api/v1/repository/org0/repo1")
+    get(quay, "/api/v1/nosuchendpoint")
+
+    stats = quay.get_stats()
+    assert stats["requests"] == 3
+    assert stats["connections"] == 3
+    assert stats["endpoints"]["GET repository/{full_repo_name}"] == 2
+
+    quay.reset_stats()
+    assert quay.get_stats()["requests"] == 0
+
+
+def test_etags():
+    with FakeQuay(Dataset(), etags=True) as quay:
+        response, body = get(quay, "/api/v1/organization/org0")
+        etag = response.getheader("ETag")
+        response, body = get(quay, "/api/v1/organization/org0", {"If-None-Match": etag})
+
+    assert etag
+    assert response.status == 304
+    assert body == b""
+
+
+def test_compressed_responses():
+    with FakeQuay(Dataset(tags=50), compress=True) as quay:
+        response, body = get(
+            quay, "/api/v1/repository/org0/repo0/tag/?limit=50", {"Accept-Encoding": "gzip"}
+        )
+        plain, plain_body = get(quay, "/api/v1/repository/org0/repo0/tag/?limit=50")
+
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body) == plain_body
+    assert plain.getheader("Content-Encoding") is None
+
+
+@pytest.mark.parametrize("registry, status", [(True, 401), (False, 404)])
+def test_registry_api(registry, status):
+    with FakeQuay(Dataset(), registry=registry) as quay:
+        response, body = get(quay, "/v2/org0/repo0/tags/list", token=False)
+
+    assert response.status == status
+
+
+def test_registry_tag_names(quay):
+    credentials = base64.b64encode(("$oauthtoken:" + quay.token).encode()).decode()
+    response, body = get(
+        quay,
+        "/v2/auth?service=quay&scope=repository:org0/repo0:pull",
+        {"Authorization": "Basic " + credentials},
+        token=False,
+    )
+    auth = {"Authorization": "Bearer " + json.loads(body)["token"]}
+
+    response, body = get(quay, "/v2/org0/repo0/tags/list?n=15", auth, token=False)
+    first = json.loads(body)["tags"]
+    link = response.getheader("Link")
+    response, body = get(quay, link[1 : link.index(">")], auth, token=False)
+    second = json.loads(body)["tags"]
+
+    assert len(first) == 15
+    assert len(second) == 5
+    assert response.getheader("Link") is None
+    # The registry API lists the names in lexical order
+    assert first + second == sorted(first + second)
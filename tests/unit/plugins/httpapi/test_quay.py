@@ -0,0 +1,204 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+
+from email.message import Message
+from io import BytesIO
+
+import pytest
+
+from ansible.errors import AnsibleConnectionFailure
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+
+from ansible_collections.herve4m.quay.plugins.httpapi.quay import HttpApi
+
+ROOT_PAGE = b"<script>window.__token = 'csrf1';</script>"
+
+
+class FakeResponse(object):
+    """Response that the persistent connection returns."""
+
+    def __init__(self, status=200, headers=None):
+        self.status = status
+        self.reason = "OK"
+        self.msg = Message()
+        for name, value in headers or []:
+            self.msg[name] = value
+
+    def getcode(self):
+        return self.status
+
+    def info(self):
+        return self.msg
+
+
+class FakeConnection(object):
+    """Persistent connection that answers the requests from a list of responses.
+
+    Each response is a (status_code, headers, body) tuple, returned in order.
+    """
+
+    def __init__(self, responses=None, options=None):
+        self.responses = list(responses or [])
+        self.requests = []
+        self.options = options or {}
+        self._url = "https://quay.example.com:443"
+        self._auth = None
+
+    def send(self, path, data, method="GET", headers=None):
+        self.requests.append((method, path, data, headers))
+        status, headers, body = self.responses.pop(0)
+        return FakeResponse(status, headers), BytesIO(body)
+
+    def get_option(self, name):
+        return self.options.get(name)
+
+
+def make_plugin(connection, token=None):
+    plugin = HttpApi(connection)
+    plugin.get_option = lambda name: token if name == "quay_token" else None
+    return plugin
+
+
+def signin_responses(csrf="next1"):
+    return [
+        (200, [], ROOT_PAGE),
+        (200, [("X-Next-CSRF-Token", csrf), ("Set-Cookie", "_csrf_token=c1; Path=/")], b"{}"),
+    ]
+
+
+def test_login_with_token():
+    connection = FakeConnection()
+    plugin = make_plugin(connection, token="abcd")
+
+    plugin.login("admin", "secret")
+
+    assert connection.requests == []
+    assert connection._auth == {"Authorization": "Bearer abcd"}
+    assert not plugin.signed_in
+
+
+def test_login_without_credentials():
+    connection = FakeConnection()
+    plugin = make_plugin(connection)
+
+    plugin.login(None, None)
+
+    assert connection.requests == []
+    assert connection._auth is None
+
+
+def test_login_with_password():
+    connection = FakeConnection(signin_responses())
+    plugin = make_plugin(connection)
+
+    plugin.login("admin", "secret")
+
+    assert [r[:2] for r in connection.requests] == [("GET", "/"), ("POST", "/api/v1/signin")]
+    method, path, data, headers = connection.requests[1]
+    assert json.loads(data) == {"username": "admin", "password": "secret"}
+    assert headers["X-CSRF-Token"] == "csrf1"
+    assert plugin.signed_in
+    assert connection._auth == {"X-CSRF-Token": "next1"}
+
+
+def test_login_without_csrf_token():
+    connection = FakeConnection([(200, [], b"<html></html>")])
+    plugin = make_plugin(connection)
+
+    with pytest.raises(AnsibleConnectionFailure, match="CSRF token"):
+        plugin.login("admin", "secret")
+
+
+def test_login_refused():
+    connection = FakeConnection([(200, [], ROOT_PAGE), (403, [], b"Invalid credentials")])
+    plugin = make_plugin(connection)
+
+    with pytest.raises(AnsibleConnectionFailure, match="403: Invalid credentials"):
+        plugin.login("admin", "wrong")
+    assert not plugin.signed_in
+
+
+def test_update_auth_collects_cookies():
+    plugin = make_plugin(FakeConnection())
+    plugin.csrf_token = "next1"
+    response = FakeResponse(
+        headers=[
+            ("Set-Cookie", "_csrf_token=c1; Path=/; HttpOnly"),
+            ("Set-Cookie", "session=s1; Path=/; Secure"),
+        ]
+    )
+
+    headers = plugin.update_auth(response, "")
+
+    assert plugin.cookies == {"_csrf_token": "c1", "session": "s1"}
+    assert headers == {"Cookie": "_csrf_token=c1; session=s1", "X-CSRF-Token": "next1"}
+
+
+def test_update_auth_without_cookies():
+    plugin = make_plugin(FakeConnection())
+
+    assert plugin.update_auth(FakeResponse(), "") is None
+
+
+def test_logout_signs_out():
+    connection = FakeConnection(signin_responses() + [(200, [], b"{}")])
+    plugin = make_plugin(connection)
+    plugin.login("admin", "secret")
+    plugin.cookies = {"session": "s1"}
+
+    plugin.logout()
+
+    assert connection.requests[-1][:2] == ("POST", "/api/v1/signout")
+    assert not plugin.signed_in
+    assert plugin.cookies == {}
+    assert connection._auth is None
+
+
+def test_logout_with_token_does_not_sign_out():
+    connection = FakeConnection()
+    plugin = make_plugin(connection, token="abcd")
+    plugin.login(None, None)
+
+    plugin.logout()
+
+    assert connection.requests == []
+
+
+def unauthorized():
+    return HTTPError("https://quay.example.com/api/v1/user/", 401, "Unauthorized", {}, None)
+
+
+def test_handle_httperror_signs_in_again():
+    connection = FakeConnection(
+        signin_responses() + signin_responses(csrf="next2"),
+        options={"remote_user": "admin", "password": "secret"},
+    )
+    plugin = make_plugin(connection)
+    plugin.login("admin", "secret")
+
+    assert plugin.handle_httperror(unauthorized()) is True
+    assert plugin.csrf_token == "next2"
+    assert not plugin.relogin
+    assert len(connection.requests) == 4
+
+
+def test_handle_httperror_returns_other_errors():
+    connection = FakeConnection(signin_responses())
+    plugin = make_plugin(connection)
+    plugin.login("admin", "secret")
+    error = HTTPError("https://quay.example.com/api/v1/user/", 404, "Not Found", {}, None)
+
+    assert plugin.handle_httperror(error) is error
+
+
+def test_handle_httperror_with_token_returns_error():
+    plugin = make_plugin(FakeConnection(), token="abcd")
+    error = unauthorized()
+
+    assert plugin.handle_httperror(error) is error
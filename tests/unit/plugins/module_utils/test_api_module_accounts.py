@@ -0,0 +1,116 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import threading
+
+import pytest
+
+from ansible_collections.herve4m.quay.plugins.module_utils.api_module import (
+    APIModule,
+    APIModuleError,
+)
+
+RESPONSES = {
+    "user/": {"username": "admin"},
+    "user/robots/": {"robots": [{"name": "admin+bot1"}]},
+    "organization/org1/robots/deployer": {"name": "org1+deployer"},
+    "entities/user1": {"results": [{"name": "user1", "kind": "user"}]},
+    "entities/user2": {"results": [{"name": "user2", "kind": "user"}]},
+    "entities/user22": {"results": [{"name": "user2", "kind": "user"}]},
+}
+
+
+@pytest.fixture
+def module():
+    """Return an APIModule object that answers the requests from RESPONSES."""
+    module = APIModule.__new__(APIModule)
+    module.authenticated = True
+    module.current_user = None
+    module.who_am_i_hits = 0
+    module.who_am_i_lock = threading.Lock()
+    module.cache_account = {}
+    module.account_cache_hits = 0
+    module.account_cache_misses = 0
+    module.account_lock = threading.Lock()
+    module.max_workers = 1
+    module.worker = threading.local()
+    module.requests = []
+
+    def get_object_path(
+        path, ok_error_codes=None, query_params=None, exit_on_error=True, **kw
+    ):
+        path = path.format(**kw)
+        module.requests.append(path)
+        if path == "entities/broken":
+            raise APIModuleError("Cannot search for broken")
+        return RESPONSES.get(path)
+
+    module.get_object_path = get_object_path
+    return module
+
+
+def test_who_am_i_memoized(module):
+    assert [module.who_am_i() for i in range(3)] == ["admin"] * 3
+
+    assert module.requests == ["user/"]
+    assert module.who_am_i_hits == 2
+
+
+def test_who_am_i_anonymous(module):
+    module.authenticated = False
+
+    assert module.who_am_i() is None
+    assert module.requests == []
+
+
+def test_account_cached(module):
+    user = module.get_account("user1")
+
+    assert user["is_robot"] is False
+    assert module.get_account("user1") is user
+    assert module.requests == ["user/robots/user1", "entities/user1"]
+    assert (module.account_cache_hits, module.account_cache_misses) == (1, 1)
+
+
+def test_missing_account_cached(module):
+    assert module.get_account("nosuchuser") is None
+    assert module.get_account("nosuchuser") is None
+
+    assert module.requests == ["user/robots/nosuchuser", "entities/nosuchuser"]
+
+
+def test_organization_robot(module):
+    robot = module.get_account("org1+deployer")
+
+    assert robot["is_robot"] is True
+    assert module.requests == ["organization/org1/robots/deployer"]
+
+
+def test_partial_name_match(module):
+    # The search returns user2 for user22, which does not exist
+    assert module.get_account("user22") is None
+
+
+def test_accounts_in_batch(module):
+    accounts = module.get_accounts(["user1", "bot1", "user1", "user2", "org1+deployer"])
+
+    assert sorted(accounts) == ["bot1", "org1+deployer", "user1", "user2"]
+    assert accounts["bot1"]["is_robot"] is True
+    assert accounts["user2"]["is_robot"] is False
+    # The robot accounts of the current user are retrieved at once, and then
+    # each user is searched only once
+    assert module.requests == [
+        "user/robots/",
+        "entities/user1",
+        "entities/user2",
+        "organization/org1/robots/deployer",
+    ]
+
+
+def test_accounts_error(module):
+    with pytest.raises(APIModuleError, match="broken"):
+        module.get_accounts(["user1", "broken"], exit_on_error=False)
@@ -0,0 +1,218 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import re
+
+import pytest
+
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+
+from ansible_collections.herve4m.quay.plugins.module_utils.api_module import APIModule
+
+NOW = 1700000000
+
+
+def make_tags(count):
+    """Return tags like the API lists them: one per minute, most recent first."""
+    return [
+        {"name": "v{i}".format(i=i), "start_ts": NOW - i * 60, "manifest_digest": "sha256:0"}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def module():
+    """Return an APIModule object that does not connect to any server."""
+    module = APIModule.__new__(APIModule)
+    module.pages = []
+
+    def get_tag_pages(namespace, repository, query_params):
+        tags = make_tags(250)
+        for start in range(0, len(tags), 100):
+            module.pages.append(start // 100 + 1)
+            yield {"tags": tags[start : start + 100], "has_additional": start + 100 < 250}
+
+    def iter_tag_names(namespace, repository):
+        # The registry API lists the names in lexical order
+        module.registry_listed = True
+        for name in sorted(t["name"] for t in make_tags(250)):
+            yield name
+
+    module.get_tag_pages = get_tag_pages
+    module.iter_tag_names = iter_tag_names
+    module.registry_listed = False
+    return module
+
+
+def test_names_only_uses_registry(module):
+    names = module.get_tags("production", "smallimage", names_only=True)
+
+    assert module.registry_listed
+    assert module.pages == []
+    assert len(names) == 250
+
+
+def test_names_only_with_limit_returns_most_recent(module):
+    names = module.get_tags("production", "smallimage", names_only=True, limit=3)
+
+    assert not module.registry_listed
+    assert names == ["v0", "v1", "v2"]
+    # The pagination stopped at the first page
+    assert module.pages == [1]
+
+
+def test_names_only_with_name_filter_uses_registry(module):
+    names = module.get_tags(
+        "production", "smallimage", names_only=True, name_regex=re.compile(r"^v1\d$")
+    )
+
+    assert module.registry_listed
+    assert names == ["v1{i}".format(i=i) for i in range(10)]
+
+
+def test_newer_than_stops_pagination(module):
+    tags = module.get_tags("production", "smallimage", newer_than=NOW - 120 * 60)
+
+    assert [t["name"] for t in tags] == ["v{i}".format(i=i) for i in range(121)]
+    assert module.pages == [1, 2]
+
+
+def test_older_than_and_limit(module):
+    tags = module.get_tags("production", "smallimage", older_than=NOW - 200 * 60, limit=2)
+
+    assert [t["name"] for t in tags] == ["v201", "v202"]
+    assert module.pages == [1, 2, 3]
+
+
+def test_time_window_with_names_only(module):
+    names = module.get_tags(
+        "production",
+        "smallimage",
+        names_only=True,
+        newer_than=NOW - 5 * 60,
+        older_than=NOW - 60,
+    )
+
+    assert not module.registry_listed
+    assert names == ["v2", "v3", "v4", "v5"]
+
+
+def test_iter_tags_stops_at_first_match(module):
+    tag = next(module.iter_tags("production", "smallimage", name_regex=re.compile(r"^v42$")))
+
+    assert tag["name"] == "v42"
+    assert module.pages == [1]
+
+
+def test_iter_tags_reads_next_pages_on_demand(module):
+    tags = module.iter_tags("production", "smallimage", name_regex=re.compile(r"^v1\d\d$"))
+
+    assert next(tags)["name"] == "v100"
+    assert module.pages == [1, 2]
+    assert len(list(tags)) == 99
+    assert module.pages == [1, 2, 3]
+
+
+def test_iter_tags_no_match(module):
+    assert next(module.iter_tags("production", "smallimage", digest="sha256:1"), None) is None
+    assert module.pages == [1, 2, 3]
+
+
+class FakeResolver(object):
+    def __init__(self, token="t1", enabled=True):
+        self.token = token
+        self.enabled = enabled
+
+    def get_token(self, full_repo_name):
+        return self.token
+
+
+class FailJson(Exception):
+    pass
+
+
+def registry_module(responses, token="t1"):
+    """Return an APIModule object that answers the registry requests in order.
+
+    Each response is a (status_code, headers, names) tuple.
+    """
+    module = APIModule.__new__(APIModule)
+    module.host_url = urlparse("https://quay.example.com")
+    module.digest_resolver = FakeResolver(token)
+    module.requests = []
+    queue = list(responses)
+
+    def make_json_request(method, url, ok_error_codes=None, headers=None, endpoint=None):
+        module.requests.append(url)
+        status_code, response_headers, names = queue.pop(0)
+        return {
+            "status_code": status_code,
+            "headers": response_headers,
+            "json": {"tags": names} if names is not None else {},
+        }
+
+    def iter_tags(namespace, repository, tag=None, digest=None, only_active_tags=True):
+        module.api_listed = True
+        for t in make_tags(3):
+            yield t
+
+    def fail_json(**kwargs):
+        raise FailJson(kwargs["msg"])
+
+    module.make_json_request = make_json_request
+    module.iter_tags = iter_tags
+    module.fail_json = fail_json
+    module.api_listed = False
+    return module
+
+
+def test_tag_names_follow_link_header():
+    link = '</v2/production/smallimage/tags/list?n=1000&last={last}>; rel="next"'
+    module = registry_module(
+        [
+            (200, {"Link": link.format(last="b")}, ["a", "b"]),
+            (200, {"link": link.format(last="d")}, ["c", "d"]),
+            (200, {}, ["e"]),
+        ]
+    )
+
+    names = list(module.iter_tag_names("production", "smallimage"))
+
+    assert names == ["a", "b", "c", "d", "e"]
+    assert not module.api_listed
+    assert [u.path for u in module.requests] == ["/v2/production/smallimage/tags/list"] * 3
+    assert module.requests[0].query == "n=1000"
+    assert module.requests[2].query == "n=1000&last=d"
+    # The next pages are requested from the Quay host, whatever the Link host
+    assert all(u.netloc == "quay.example.com" for u in module.requests)
+
+
+@pytest.mark.parametrize("status_code", [401, 403, 404])
+def test_tag_names_fall_back_to_api(status_code):
+    module = registry_module([(status_code, {}, None)])
+
+    names = list(module.iter_tag_names("production", "smallimage"))
+
+    assert names == ["v0", "v1", "v2"]
+    assert module.api_listed
+
+
+def test_tag_names_without_token_fall_back_to_api():
+    module = registry_module([], token=None)
+
+    assert list(module.iter_tag_names("production", "smallimage")) == ["v0", "v1", "v2"]
+    assert module.requests == []
+
+
+def test_tag_names_fail_on_later_page():
+    link = '</v2/production/smallimage/tags/list?n=1000&last=b>; rel="next"'
+    module = registry_module([(200, {"Link": link}, ["a", "b"]), (401, {}, None)])
+
+    with pytest.raises(FailJson, match="Cannot retrieve the tags of production/smallimage"):
+        list(module.iter_tag_names("production", "smallimage"))
+    # The names are not mixed with the API listing
+    assert not module.api_listed
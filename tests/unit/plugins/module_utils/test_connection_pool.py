@@ -0,0 +1,216 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import gzip
+import io
+import socket
+import zlib
+
+import pytest
+
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+
+from ansible_collections.herve4m.quay.plugins.module_utils import connection_pool
+from ansible_collections.herve4m.quay.plugins.module_utils.connection_pool import (
+    ConnectionPool,
+    RemoteDisconnected,
+    is_connection_dropped,
+    read_body,
+)
+
+URL = urlparse("http://quay.example.com/api/v1/repository")
+
+
+class FakeResponse(object):
+    """Response that ``ConnectionPool.urlopen`` reads."""
+
+    def __init__(self, body=b"{}"):
+        self.status = 200
+        self.reason = "OK"
+        self.msg = http_client.HTTPMessage()
+        self.headers = self.msg
+        self.will_close = False
+        self.body = body
+
+    def read(self, amt=None):
+        body, self.body = self.body, b""
+        return body
+
+
+class FakeConnection(object):
+    """Connection that raises the given errors from request() or getresponse()."""
+
+    def __init__(self, request_error=None, response_error=None):
+        self.request_error = request_error
+        self.response_error = response_error
+        self.requests = []
+        self.closed = False
+
+    def request(self, method, path, body=None, headers=None):
+        self.requests.append(method)
+        if self.request_error:
+            raise self.request_error
+
+    def getresponse(self):
+        if self.response_error:
+            raise self.response_error
+        return FakeResponse()
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(monkeypatch, connections):
+    """Return a pool that hands out the given (connection, reused) tuples."""
+    pool = ConnectionPool()
+    queue = list(connections)
+    monkeypatch.setattr(pool, "get_connection", lambda key: queue.pop(0))
+    return pool
+
+
+def test_resend_when_request_cannot_be_sent(monkeypatch):
+    stale = FakeConnection(request_error=socket.error(32, "Broken pipe"))
+    fresh = FakeConnection()
+    pool = make_pool(monkeypatch, [(stale, True), (fresh, False)])
+
+    response = pool.urlopen("POST", URL, body="{}")
+
+    assert response.status == 200
+    assert stale.closed
+    assert fresh.requests == ["POST"]
+
+
+@pytest.mark.parametrize("method", ["GET", "PUT", "DELETE"])
+def test_resend_idempotent_when_remote_disconnected(monkeypatch, method):
+    stale = FakeConnection(response_error=RemoteDisconnected("closed"))
+    fresh = FakeConnection()
+    pool = make_pool(monkeypatch, [(stale, True), (fresh, False)])
+
+    assert pool.urlopen(method, URL).status == 200
+    assert fresh.requests == [method]
+
+
+def test_no_resend_post_when_remote_disconnected(monkeypatch):
+    stale = FakeConnection(response_error=RemoteDisconnected("closed"))
+    fresh = FakeConnection()
+    pool = make_pool(monkeypatch, [(stale, True), (fresh, False)])
+
+    with pytest.raises(RemoteDisconnected):
+        pool.urlopen("POST", URL, body="{}")
+    assert stale.closed
+    assert fresh.requests == []
+
+
+@pytest.mark.parametrize("method", ["GET", "POST"])
+def test_no_resend_after_response_timeout(monkeypatch, method):
+    conn = FakeConnection(response_error=socket.timeout("timed out"))
+    fresh = FakeConnection()
+    pool = make_pool(monkeypatch, [(conn, True), (fresh, False)])
+
+    with pytest.raises(socket.timeout):
+        pool.urlopen(method, URL)
+    assert conn.closed
+    assert fresh.requests == []
+
+
+def test_no_resend_on_new_connection(monkeypatch):
+    conn = FakeConnection(request_error=socket.error(111, "Connection refused"))
+    pool = make_pool(monkeypatch, [(conn, False)])
+
+    with pytest.raises(socket.error):
+        pool.urlopen("GET", URL)
+
+
+def test_connection_dropped():
+    local, remote = socket.socketpair()
+    conn = http_client.HTTPConnection("quay.example.com")
+    conn.sock = local
+    try:
+        assert not is_connection_dropped(conn)
+        remote.close()
+        assert is_connection_dropped(conn)
+    finally:
+        local.close()
+
+
+def test_dropped_idle_connection_not_reused(monkeypatch):
+    pool = ConnectionPool()
+    key = ("http", "quay.example.com", 80)
+    dropped = FakeConnection()
+    pool.idle[key] = [dropped]
+    monkeypatch.setattr(connection_pool, "is_connection_dropped", lambda conn: True)
+
+    conn, reused = pool.get_connection(key)
+
+    assert not reused
+    assert conn is not dropped
+    assert dropped.closed
+    assert pool.get_stats()["hits"] == 0
+
+
+BODY = b'{"tags": [' + b", ".join(b'{"name": "v%d"}' % i for i in range(5000)) + b"]}"
+
+
+class EncodedResponse(object):
+    """Response with the given Content-Encoding, read by small chunks."""
+
+    def __init__(self, data, encoding=None):
+        self.headers = http_client.HTTPMessage()
+        if encoding:
+            self.headers["Content-Encoding"] = encoding
+        self.fp = io.BytesIO(data)
+
+    def read(self, amt=None):
+        return self.fp.read(amt)
+
+
+def raw_deflate(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+@pytest.mark.parametrize(
+    "data, encoding",
+    [
+        (BODY, None),
+        (BODY, "identity"),
+        (gzip.compress(BODY), "gzip"),
+        (gzip.compress(BODY), " X-GZIP "),
+        (zlib.compress(BODY), "deflate"),
+        # Some servers send raw deflate data, without the zlib header
+        (raw_deflate(BODY), "deflate"),
+    ],
+)
+def test_read_body(data, encoding):
+    assert read_body(EncodedResponse(data, encoding), chunk_size=1024) == BODY
+
+
+def test_read_body_empty():
+    assert read_body(EncodedResponse(b"", "gzip")) == b""
+
+
+def test_read_body_invalid_data():
+    with pytest.raises(zlib.error):
+        read_body(EncodedResponse(b"not compressed at all", "gzip"))
+
+
+def test_pooled_response_decompressed(monkeypatch):
+    response = FakeResponse(gzip.compress(BODY))
+    response.msg["Content-Encoding"] = "gzip"
+
+    class GzipConnection(FakeConnection):
+        def getresponse(self):
+            return response
+
+    pool = make_pool(monkeypatch, [(GzipConnection(), False)])
+
+    result = pool.urlopen("GET", URL)
+
+    assert result.read() == BODY
+    assert result.size == len(BODY)
+    assert result.getheader("Content-Encoding") is None
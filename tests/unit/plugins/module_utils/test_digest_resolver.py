@@ -0,0 +1,183 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible.module_utils.six.moves.urllib.parse import parse_qs, urlparse
+
+from ansible_collections.herve4m.quay.plugins.module_utils.digest_resolver import (
+    DigestResolver,
+    parse_challenge,
+)
+
+DIGEST = "sha256:53b2a7c8"
+CHALLENGE = (
+    'Bearer realm="https://quay.example.com/v2/auth",service="quay.example.com",'
+    'scope="repository:production/smallimage:pull"'
+)
+
+
+class FakeModule(object):
+    """Module that answers the registry requests from a list of responses.
+
+    Each response is a (status_code, headers, body) tuple, returned in order.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.connection = None
+        self.host_url = urlparse("https://quay.example.com")
+        self.params = {"quay_token": "abcd"}
+
+    def make_raw_request(self, method, url, ok_error_codes=None, headers=None, endpoint=None):
+        self.requests.append((method, url, headers))
+        status_code, response_headers, body = self.responses.pop(0)
+        return {"status_code": status_code, "headers": response_headers, "body": body}
+
+    def debug(self, msg):
+        pass
+
+
+def token_response(token):
+    return (200, {}, json.dumps({"token": token}).encode())
+
+
+def manifest_response(digest=DIGEST):
+    return (200, {"Docker-Content-Digest": digest}, b"")
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (
+            CHALLENGE,
+            {
+                "realm": "https://quay.example.com/v2/auth",
+                "service": "quay.example.com",
+                "scope": "repository:production/smallimage:pull",
+            },
+        ),
+        (
+            'bearer realm="https://quay.example.com/v2/auth", error="insufficient_scope"',
+            {"realm": "https://quay.example.com/v2/auth", "error": "insufficient_scope"},
+        ),
+        (
+            "Bearer realm=https://quay.example.com/v2/auth",
+            {"realm": "https://quay.example.com/v2/auth"},
+        ),
+        ('Basic realm="Quay"', None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_parse_challenge(header, expected):
+    assert parse_challenge(header) == expected
+
+
+def test_resolve_and_reuse():
+    module = FakeModule([token_response("t1"), manifest_response()])
+    resolver = DigestResolver(module)
+
+    assert resolver.get_registry_digest("production", "smallimage", "latest") == DIGEST
+    assert resolver.get_registry_digest("production", "smallimage", "latest") == DIGEST
+
+    assert [r[0] for r in module.requests] == ["GET", "HEAD"]
+    query = parse_qs(module.requests[0][1].query)
+    assert query["scope"] == ["repository:production/smallimage:pull"]
+    assert query["service"] == ["quay.example.com"]
+    assert module.requests[0][2]["Authorization"].startswith("Basic ")
+    assert module.requests[1][2]["Authorization"] == "Bearer t1"
+    assert resolver.get_stats() == {"hits": 1, "resolved": 1, "failures": 0}
+
+
+def test_token_reused_for_other_tags():
+    module = FakeModule([token_response("t1"), manifest_response(), manifest_response()])
+    resolver = DigestResolver(module)
+
+    resolver.get_registry_digest("production", "smallimage", "v1")
+    resolver.get_registry_digest("production", "smallimage", "v2")
+
+    assert [r[0] for r in module.requests] == ["GET", "HEAD", "HEAD"]
+
+
+def test_auth_endpoint_missing_disables_resolver():
+    module = FakeModule([(404, {}, b"")])
+    resolver = DigestResolver(module)
+
+    assert resolver.get_registry_digest("production", "smallimage", "latest") is None
+    assert not resolver.enabled
+    # No more registry requests for the rest of the module run
+    assert resolver.get_registry_digest("production", "other", "latest") is None
+    assert len(module.requests) == 1
+
+
+def test_auth_refused_falls_back():
+    module = FakeModule([(401, {}, b"")])
+    resolver = DigestResolver(module)
+
+    assert resolver.get_registry_digest("production", "smallimage", "v1") is None
+    assert resolver.get_registry_digest("production", "smallimage", "v2") is None
+    # The refused token is not requested again for the same repository
+    assert len(module.requests) == 1
+    assert resolver.enabled
+
+
+def test_unknown_tag_falls_back():
+    module = FakeModule([token_response("t1"), (404, {}, b"")])
+    resolver = DigestResolver(module)
+
+    assert resolver.get_registry_digest("production", "smallimage", "nosuchtag") is None
+    assert resolver.get_stats()["failures"] == 1
+
+
+def test_challenge_retried_once():
+    module = FakeModule(
+        [
+            token_response("t1"),
+            (401, {"WWW-Authenticate": CHALLENGE}, b""),
+            token_response("t2"),
+            manifest_response(),
+        ]
+    )
+    resolver = DigestResolver(module)
+
+    assert resolver.get_registry_digest("production", "smallimage", "latest") == DIGEST
+    assert module.requests[3][2]["Authorization"] == "Bearer t2"
+    assert resolver.tokens["production/smallimage"] == "t2"
+
+
+def test_challenge_rejected_twice_falls_back():
+    unauthorized = (401, {"WWW-Authenticate": CHALLENGE}, b"")
+    module = FakeModule(
+        [token_response("t1"), unauthorized, token_response("t2"), unauthorized]
+    )
+    resolver = DigestResolver(module)
+
+    assert resolver.get_registry_digest("production", "smallimage", "latest") is None
+    assert len(module.requests) == 4
+
+
+def test_challenge_on_other_host_ignored():
+    challenge = 'Bearer realm="https://auth.example.org/token",service="registry"'
+    module = FakeModule([token_response("t1"), (401, {"WWW-Authenticate": challenge}, b"")])
+    resolver = DigestResolver(module)
+
+    assert resolver.get_registry_digest("production", "smallimage", "latest") is None
+    # The credentials are not sent to the other server
+    assert len(module.requests) == 2
+
+
+def test_disabled_with_httpapi_connection():
+    module = FakeModule([])
+    module.connection = object()
+    resolver = DigestResolver(module)
+
+    assert resolver.get_registry_digest("production", "smallimage", "latest") is None
+    assert module.requests == []
@@ -0,0 +1,141 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import socket
+import ssl
+
+import pytest
+
+from ansible_collections.herve4m.quay.plugins.module_utils.connection_pool import (
+    HTTPConnection,
+    HTTPSConnection,
+)
+from ansible_collections.herve4m.quay.plugins.module_utils.dns_resolver import (
+    DNSResolver,
+)
+
+
+def counting_lookup(resolver, addresses=("192.0.2.10",)):
+    """Replace the DNS query of the resolver and record the queried names."""
+    resolver.queries = []
+
+    def lookup(host):
+        # The resolver lock is free during the query
+        assert resolver.lock.acquire(False)
+        resolver.lock.release()
+        resolver.queries.append(host)
+        return list(addresses)
+
+    resolver.lookup = lookup
+    return resolver
+
+
+def test_addresses_cached():
+    resolver = counting_lookup(DNSResolver(ttl=300))
+
+    assert resolver.resolve("Quay.example.com") == ["192.0.2.10"]
+    assert resolver.resolve("quay.example.com") == ["192.0.2.10"]
+
+    assert resolver.queries == ["quay.example.com"]
+    assert resolver.get_stats() == {"hits": 1, "misses": 1}
+
+
+def test_no_cache_when_ttl_is_zero():
+    resolver = counting_lookup(DNSResolver(ttl=0))
+
+    resolver.resolve("quay.example.com")
+    resolver.resolve("quay.example.com")
+
+    assert len(resolver.queries) == 2
+
+
+def test_pinned_addresses():
+    resolver = counting_lookup(DNSResolver(pins={"quay.example.com": ["192.0.2.20"]}))
+
+    assert resolver.resolve("quay.example.com") == ["192.0.2.20"]
+    assert resolver.queries == []
+
+
+def test_shared_file(tmp_path):
+    path = str(tmp_path / "dns.json")
+    first = counting_lookup(DNSResolver(ttl=300, path=path))
+    second = counting_lookup(DNSResolver(ttl=300, path=path), addresses=("192.0.2.99",))
+
+    first.resolve("quay.example.com")
+
+    assert second.resolve("quay.example.com") == ["192.0.2.10"]
+    assert second.queries == []
+    assert second.get_stats() == {"hits": 1, "misses": 0}
+
+
+def test_resolve_again_when_addresses_unreachable(monkeypatch):
+    resolver = counting_lookup(DNSResolver(ttl=300))
+    resolver.entries["quay.example.com"] = (["192.0.2.1"], float("inf"))
+    connected = []
+
+    def create_connection(address, timeout=None, source_address=None):
+        if address[0] == "192.0.2.1":
+            raise socket.error(113, "No route to host")
+        connected.append(address)
+        return "sock"
+
+    monkeypatch.setattr(socket, "create_connection", create_connection)
+
+    assert resolver.create_connection(("quay.example.com", 443)) == "sock"
+    assert connected == [("192.0.2.10", 443)]
+
+
+class FakeResolver(object):
+    def __init__(self, sock):
+        self.sock = sock
+        self.addresses = []
+
+    def create_connection(self, address, timeout=None, source_address=None):
+        self.addresses.append(address)
+        return self.sock
+
+
+class FakeContext(ssl.SSLContext):
+    def wrap_socket(self, sock, server_hostname=None):
+        self.server_hostname = server_hostname
+        return ("tls", sock)
+
+
+@pytest.fixture
+def sock():
+    """Return a TCP socket connected to a local server."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    client = socket.create_connection(server.getsockname())
+    yield client
+    client.close()
+    server.close()
+
+
+def test_http_connection_uses_resolver(sock):
+    resolver = FakeResolver(sock)
+    conn = HTTPConnection("quay.example.com", 8080, timeout=5, resolver=resolver)
+
+    conn.connect()
+
+    assert conn.sock is sock
+    assert resolver.addresses == [("quay.example.com", 8080)]
+    # The private socket factory of http.client is left untouched
+    assert conn._create_connection is socket.create_connection
+
+
+def test_https_connection_uses_resolver(sock):
+    resolver = FakeResolver(sock)
+    context = FakeContext(ssl.PROTOCOL_TLS_CLIENT)
+    conn = HTTPSConnection("quay.example.com", 443, context=context, resolver=resolver)
+
+    conn.connect()
+
+    assert conn.sock == ("tls", sock)
+    assert context.server_hostname == "quay.example.com"
+    assert resolver.addresses == [("quay.example.com", 443)]
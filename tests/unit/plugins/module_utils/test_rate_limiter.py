@@ -0,0 +1,100 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible_collections.herve4m.quay.plugins.module_utils import rate_limiter
+from ansible_collections.herve4m.quay.plugins.module_utils.rate_limiter import RateLimiter
+
+
+class Clock(object):
+    """Time that only moves when the test advances it."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "time", clock.time)
+    return clock
+
+
+def test_disabled():
+    limiter = RateLimiter(rate=0)
+
+    assert [limiter.reserve() for i in range(100)] == [0] * 100
+    assert limiter.waits == 0
+
+
+def test_burst_then_wait(clock):
+    limiter = RateLimiter(rate=2, burst=3)
+
+    delays = [limiter.reserve() for i in range(5)]
+
+    # Three requests go out at once, then one every half second
+    assert delays == [0, 0, 0, 0.5, 1.0]
+    assert limiter.waits == 2
+    assert limiter.wait_time == 1.5
+
+
+def test_refill(clock):
+    limiter = RateLimiter(rate=2, burst=3)
+    for i in range(3):
+        limiter.reserve()
+
+    clock.now += 1
+    assert [limiter.reserve() for i in range(3)] == [0, 0, 0.5]
+
+
+def test_refill_capped_at_burst(clock):
+    limiter = RateLimiter(rate=10, burst=2)
+
+    clock.now += 3600
+    assert [limiter.reserve() for i in range(3)] == [0, 0, 0.1]
+
+
+def test_shared_file(clock, tmp_path):
+    path = str(tmp_path / "state" / "rate.json")
+    first = RateLimiter(rate=1, burst=2, path=path, key="quay.example.com:443")
+    second = RateLimiter(rate=1, burst=2, path=path, key="quay.example.com:443")
+
+    # Both objects take their tokens from the same bucket
+    assert [first.reserve(), second.reserve(), first.reserve(), second.reserve()] == [
+        0,
+        0,
+        1,
+        2,
+    ]
+    with open(path) as f:
+        bucket = json.load(f)["quay.example.com:443"]
+    assert bucket == {"tokens": -2, "stamp": clock.now}
+
+
+def test_shared_file_buckets_per_server(clock, tmp_path):
+    path = str(tmp_path / "rate.json")
+    first = RateLimiter(rate=1, burst=1, path=path, key="quay1.example.com:443")
+    second = RateLimiter(rate=1, burst=1, path=path, key="quay2.example.com:443")
+
+    assert first.reserve() == 0
+    assert second.reserve() == 0
+    assert first.reserve() == 1
+
+
+def test_shared_file_unusable_falls_back(clock, tmp_path):
+    path = tmp_path / "rate.json"
+    path.mkdir()
+    limiter = RateLimiter(rate=1, burst=1, path=str(path))
+
+    assert [limiter.reserve(), limiter.reserve()] == [0, 1]
+    assert limiter.path is None
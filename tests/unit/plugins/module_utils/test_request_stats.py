@@ -0,0 +1,132 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import gzip
+import io
+
+import pytest
+
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+
+from ansible_collections.herve4m.quay.plugins.module_utils.api_module import APIModule
+from ansible_collections.herve4m.quay.plugins.module_utils.connection_pool import (
+    PoolResponse,
+    ResponseHead,
+)
+from ansible_collections.herve4m.quay.plugins.module_utils.rate_limiter import RateLimiter
+from ansible_collections.herve4m.quay.plugins.module_utils.request_stats import (
+    RequestStats,
+)
+from ansible_collections.herve4m.quay.plugins.module_utils.retry_policy import RetryPolicy
+
+URL = urlparse("https://quay.example.com/api/v1/repository/production/smallimage")
+BODY = b'{"name": "smallimage", "description": "' + b"x" * 2000 + b'"}'
+
+
+def compressed_headers(data):
+    msg = http_client.HTTPMessage()
+    msg["Content-Type"] = "application/json"
+    msg["Content-Encoding"] = "gzip"
+    msg["Content-Length"] = str(len(data))
+    return msg
+
+
+class FakeResponse(object):
+    """Compressed response that the session object returns."""
+
+    def __init__(self, body):
+        self.data = gzip.compress(body)
+        self.status = 200
+        self.reason = "OK"
+        self.msg = compressed_headers(self.data)
+        self.headers = self.msg
+        self.fp = io.BytesIO(self.data)
+
+    def read(self, amt=None):
+        return self.fp.read(amt)
+
+
+class FakeSession(object):
+    def __init__(self, result):
+        self.result = result
+
+    def open(self, method, url, headers=None, data=None, follow_redirects=None):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class FakePool(object):
+    def can_handle(self, url):
+        return False
+
+
+def make_module(result):
+    module = APIModule.__new__(APIModule)
+    module.connection = None
+    module.pool = FakePool()
+    module.session = FakeSession(result)
+    module.rate_limiter = RateLimiter()
+    module.retry_policy = RetryPolicy(max_retries=0)
+    module.request_stats = RequestStats()
+    return module
+
+
+def test_size_of_decompressed_body():
+    module = make_module(FakeResponse(BODY))
+
+    response = module.send_request("GET", URL, endpoint="repository/{full_repo_name}")
+
+    assert response.read() == BODY
+    assert response.getheader("Content-Encoding") is None
+    (request,) = module.request_stats.requests
+    assert request[:4] == ("GET", "repository/{full_repo_name}", 200, len(BODY))
+
+
+def test_size_of_error_body():
+    data = gzip.compress(BODY)
+    error = HTTPError(
+        URL.geturl(), 404, "Not Found", compressed_headers(data), io.BytesIO(data)
+    )
+    module = make_module(error)
+
+    with pytest.raises(HTTPError) as exc:
+        module.send_request("GET", URL, ok_error_codes=[404])
+
+    # The body is still available to the caller
+    assert exc.value.code == 404
+    assert exc.value.read() == BODY
+    (request,) = module.request_stats.requests
+    assert request[1:4] == ("repository/production/smallimage", 404, len(BODY))
+
+
+def test_size_of_pooled_response():
+    module = APIModule.__new__(APIModule)
+    module.request_stats = RequestStats()
+    response = PoolResponse(ResponseHead(200, "OK", http_client.HTTPMessage()), BODY)
+
+    module.record_request("GET", URL, None, response, 0)
+
+    assert module.request_stats.requests[0][3] == len(BODY)
+
+
+def test_summary():
+    stats = RequestStats()
+    for i in range(1, 11):
+        stats.record("GET", "repository/{full_repo_name}", 200, 100, i / 10.0)
+    stats.record("PUT", "repository/{full_repo_name}", 404, 0, 5.0)
+
+    summary = stats.get_summary()
+
+    assert summary["count"] == 11
+    assert summary["bytes"] == 1000
+    assert summary["status_codes"] == {"200": 10, "404": 1}
+    assert [e["method"] for e in summary["endpoints"]] == ["GET", "PUT"]
+    get = summary["endpoints"][0]
+    assert (get["p50"], get["p95"]) == (0.5, 1.0)
@@ -0,0 +1,180 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import stat
+import time
+
+import pytest
+
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+
+from ansible_collections.herve4m.quay.plugins.module_utils import response_cache
+from ansible_collections.herve4m.quay.plugins.module_utils.response_cache import (
+    ResponseCache,
+)
+
+BASE = "https://quay.example.com/api/v1/"
+ETAG = {"ETag": '"abc"'}
+
+
+def url_for(endpoint, query=""):
+    return urlparse(BASE + endpoint + ("?" + query if query else ""))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "cache"), 1024 * 1024, 3600, identity="token")
+
+
+@pytest.mark.parametrize(
+    "endpoint",
+    [
+        "organization/org1/robots/robot1",
+        "user/robots/robot1",
+        "organization/org1/applications",
+        "organization/org1/proxycache",
+        "repository/org1/repo1/mirror",
+        "repository/org1/repo1/notification/",
+    ],
+)
+def test_secret_endpoints_not_stored(cache, endpoint):
+    url = url_for(endpoint)
+    cache.set(endpoint, url, {"token": "secret"}, ETAG)
+
+    assert os.listdir(cache.path) == []
+    assert cache.get_stale(endpoint, url) is None
+
+
+def test_allowed_endpoint_stored_for_revalidation(cache):
+    endpoint = "repository/org1/repo1/tag/"
+    url = url_for(endpoint, "page=1")
+    cache.set(endpoint, url, {"tags": []}, ETAG)
+
+    assert cache.get(endpoint, url) is None
+    assert cache.get_stale(endpoint, url) == ({"tags": []}, {"If-None-Match": '"abc"'})
+
+
+def test_allowed_endpoint_without_validators_not_stored(cache):
+    endpoint = "organization/org1"
+    cache.set(endpoint, url_for(endpoint), {"name": "org1"}, {})
+
+    assert os.listdir(cache.path) == []
+
+
+def test_files_are_private(cache):
+    endpoint = "organization/org1"
+    cache.set(endpoint, url_for(endpoint), {"name": "org1"}, ETAG)
+
+    (name,) = os.listdir(cache.path)
+    mode = stat.S_IMODE(os.stat(os.path.join(cache.path, name)).st_mode)
+    assert mode == 0o600
+
+
+def test_invalidate_removes_query_variants(cache):
+    endpoint = "repository/org1/repo1"
+    for query in ("", "includeTags=true", "includeTags=false"):
+        cache.set(endpoint, url_for(endpoint, query), {"name": "repo1"}, ETAG)
+    other = "repository/org1/repo1/tag/"
+    cache.set(other, url_for(other, "page=2"), {"tags": []}, ETAG)
+
+    cache.invalidate(endpoint, url_for(endpoint))
+
+    assert cache.get_stale(endpoint, url_for(endpoint, "includeTags=true")) is None
+    assert cache.get_stale(endpoint, url_for(endpoint)) is None
+    assert cache.get_stale(other, url_for(other, "page=2")) is not None
+
+
+def test_responses_not_shared_between_identities(cache):
+    endpoint = "organization/org1"
+    cache.set(endpoint, url_for(endpoint), {"name": "org1"}, ETAG)
+    other = ResponseCache(cache.path, 1024 * 1024, 3600, identity="other")
+
+    assert other.get_stale(endpoint, url_for(endpoint)) is None
+
+
+DIGEST = "sha256:" + "a" * 64
+MANIFEST = "repository/org1/repo1/manifest/" + DIGEST
+LABELS = MANIFEST + "/labels"
+SECURITY = MANIFEST + "/security"
+
+
+class Clock(object):
+    """Time that only moves when the test advances it."""
+
+    def __init__(self, now=1000000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock.time)
+    return clock
+
+
+def test_labels_expire_after_ttl(cache, clock):
+    cache.set(LABELS, url_for(LABELS), {"labels": []})
+
+    clock.now += 3599
+    assert cache.get(LABELS, url_for(LABELS)) == {"labels": []}
+    clock.now += 2
+    assert cache.get(LABELS, url_for(LABELS)) is None
+    # The expired response without validators is removed
+    assert os.listdir(cache.path) == []
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_labels_kept_for_revalidation(cache, clock):
+    cache.set(LABELS, url_for(LABELS), {"labels": []}, ETAG)
+
+    clock.now += 3601
+    assert cache.get(LABELS, url_for(LABELS)) is None
+    assert cache.get_stale(LABELS, url_for(LABELS)) == (
+        {"labels": []},
+        {"If-None-Match": '"abc"'},
+    )
+
+
+def test_manifest_never_expires(cache, clock):
+    cache.set(MANIFEST, url_for(MANIFEST), {"digest": DIGEST})
+
+    clock.now += 365 * 86400
+    assert cache.get(MANIFEST, url_for(MANIFEST)) == {"digest": DIGEST}
+
+
+def test_incomplete_security_report_not_stored(cache):
+    cache.set(SECURITY, url_for(SECURITY), {"status": "queued"})
+    assert os.listdir(cache.path) == []
+
+    cache.set(SECURITY, url_for(SECURITY), {"status": "scanned", "data": {}})
+    assert cache.get(SECURITY, url_for(SECURITY)) == {"status": "scanned", "data": {}}
+
+
+def test_lru_eviction(cache):
+    def manifest(name):
+        endpoint = "repository/org1/{name}/manifest/{digest}".format(name=name, digest=DIGEST)
+        return (endpoint, url_for(endpoint))
+
+    for i, name in enumerate(("repo1", "repo2")):
+        endpoint, url = manifest(name)
+        cache.set(endpoint, url, {"digest": DIGEST})
+        # Files last used 1000 and 999 seconds ago
+        os.utime(cache.get_filename(url), (time.time() - 1000 + i, time.time() - 1000 + i))
+    size = os.path.getsize(cache.get_filename(manifest("repo1")[1]))
+    cache.max_size = size * 2 + size // 2
+
+    # Reading repo1 makes repo2 the least recently used response
+    assert cache.get(*manifest("repo1")) is not None
+    cache.set(*manifest("repo3"), response_json={"digest": DIGEST})
+
+    assert cache.get(*manifest("repo1")) is not None
+    assert cache.get(*manifest("repo2")) is None
+    assert cache.get(*manifest("repo3")) is not None
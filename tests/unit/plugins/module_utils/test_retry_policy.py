@@ -0,0 +1,111 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import socket
+import time
+
+from email.utils import formatdate
+
+import pytest
+
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.error import HTTPError, URLError
+
+from ansible_collections.herve4m.quay.plugins.module_utils import retry_policy
+from ansible_collections.herve4m.quay.plugins.module_utils.retry_policy import RetryPolicy
+
+
+def http_error(code, retry_after=None):
+    headers = http_client.HTTPMessage()
+    if retry_after is not None:
+        headers["Retry-After"] = retry_after
+    return HTTPError("https://quay.example.com/api/v1/user/", code, "Error", headers, None)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("5", 5), (" 2.5 ", 2.5), ("-3", 0), ("soon", None), ("", None), (None, None)],
+)
+def test_retry_after_seconds(value, expected):
+    assert RetryPolicy().get_retry_after(http_error(503, value)) == expected
+
+
+def test_retry_after_date():
+    value = formatdate(time.time() + 120, usegmt=True)
+
+    delay = RetryPolicy().get_retry_after(http_error(503, value))
+
+    assert 115 <= delay <= 120
+
+
+def test_retry_after_date_in_the_past():
+    value = formatdate(time.time() - 120, usegmt=True)
+
+    assert RetryPolicy().get_retry_after(http_error(503, value)) == 0
+
+
+@pytest.mark.parametrize(
+    "method, error, expected",
+    [
+        ("GET", http_error(503), True),
+        ("DELETE", http_error(502), True),
+        ("put", http_error(504), True),
+        ("POST", http_error(503), False),
+        ("POST", http_error(429), True),
+        ("GET", http_error(500), False),
+        ("GET", http_error(404), False),
+        ("GET", socket.timeout("timed out"), True),
+        ("GET", URLError("connection refused"), True),
+        ("HEAD", http_client.BadStatusLine(""), True),
+        ("POST", socket.error(104, "Connection reset by peer"), False),
+        ("GET", ValueError("not a network error"), False),
+    ],
+)
+def test_idempotency_rules(method, error, expected):
+    assert RetryPolicy().is_retryable(method, error) is expected
+
+
+def test_max_retries():
+    policy = RetryPolicy(max_retries=2, backoff=0)
+
+    assert policy.get_retry_delay("GET", 1, http_error(503)) == 0
+    assert policy.get_retry_delay("GET", 2, http_error(503)) == 0
+    assert policy.get_retry_delay("GET", 3, http_error(503)) is None
+    assert policy.retries == 2
+
+
+def test_retries_disabled():
+    assert RetryPolicy(max_retries=0).get_retry_delay("GET", 1, http_error(503)) is None
+
+
+def test_backoff_grows(monkeypatch):
+    monkeypatch.setattr(retry_policy.random, "uniform", lambda low, high: high)
+    policy = RetryPolicy(backoff=1.0, max_delay=30)
+
+    assert [policy.get_delay(a) for a in range(1, 7)] == [1, 2, 4, 8, 16, 30]
+
+
+def test_max_delay_caps_retry_after():
+    policy = RetryPolicy(max_delay=10)
+
+    assert policy.get_delay(1, http_error(429, "3600")) == 10
+
+
+def test_retry_after_preferred_over_backoff():
+    policy = RetryPolicy(backoff=100, max_delay=30)
+
+    assert policy.get_delay(3, http_error(503, "2")) == 2
+
+
+def test_should_retry_waits(monkeypatch):
+    waits = []
+    monkeypatch.setattr(retry_policy.time, "sleep", waits.append)
+    policy = RetryPolicy(max_retries=1)
+
+    assert policy.should_retry("GET", 1, http_error(503, "4"))
+    assert not policy.should_retry("GET", 2, http_error(503, "4"))
+    assert waits == [4]
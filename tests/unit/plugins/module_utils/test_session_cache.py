@@ -0,0 +1,136 @@
+# Copyright: (c) 2024 Hervé Quatremain <herve.quatremain@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+
+import pytest
+
+from ansible.module_utils.six.moves import http_cookiejar
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+
+from ansible_collections.herve4m.quay.plugins.module_utils import api_module
+from ansible_collections.herve4m.quay.plugins.module_utils.api_module import APIModule
+from ansible_collections.herve4m.quay.plugins.module_utils.session_cache import (
+    SessionCache,
+)
+
+HOST = "https://quay.example.com"
+
+
+@pytest.fixture
+def cryptography():
+    return pytest.importorskip("cryptography")
+
+
+def make_jar():
+    jar = http_cookiejar.CookieJar()
+    jar.set_cookie(
+        http_cookiejar.Cookie(
+            version=0,
+            name="_csrf_token",
+            value="c1",
+            port=None,
+            port_specified=False,
+            domain="quay.example.com",
+            domain_specified=False,
+            domain_initial_dot=False,
+            path="/",
+            path_specified=True,
+            secure=True,
+            expires=None,
+            discard=True,
+            comment=None,
+            comment_url=None,
+            rest={},
+        )
+    )
+    return jar
+
+
+def test_round_trip(cryptography, tmp_path):
+    cache = SessionCache(str(tmp_path), HOST, "admin", "secret")
+    cache.save(make_jar(), "token1")
+
+    jar = http_cookiejar.CookieJar()
+    assert SessionCache(str(tmp_path), HOST, "admin", "secret").load(jar) == "token1"
+    assert [(c.name, c.value, c.domain) for c in jar] == [
+        ("_csrf_token", "c1", "quay.example.com")
+    ]
+
+
+def test_file_is_encrypted(cryptography, tmp_path):
+    cache = SessionCache(str(tmp_path), HOST, "admin", "secret")
+    cache.save(make_jar(), "token1")
+
+    with open(cache.filename) as f:
+        data = f.read()
+    assert "token1" not in data
+    assert "_csrf_token" not in data
+
+
+def test_wrong_password(cryptography, tmp_path):
+    SessionCache(str(tmp_path), HOST, "admin", "secret").save(make_jar(), "token1")
+
+    jar = http_cookiejar.CookieJar()
+    assert SessionCache(str(tmp_path), HOST, "admin", "wrong").load(jar) is None
+    assert len(jar) == 0
+
+
+def test_sessions_per_user_and_host(cryptography, tmp_path):
+    SessionCache(str(tmp_path), HOST, "admin", "secret").save(make_jar(), "token1")
+
+    jar = http_cookiejar.CookieJar()
+    assert SessionCache(str(tmp_path), HOST, "other", "secret").load(jar) is None
+    assert SessionCache(str(tmp_path), HOST + ":8443", "admin", "secret").load(jar) is None
+
+
+def test_corrupted_file(cryptography, tmp_path):
+    cache = SessionCache(str(tmp_path), HOST, "admin", "secret")
+    with open(cache.filename, "w") as f:
+        f.write('{"salt": "AAAA", "data": "not encrypted"}')
+
+    assert cache.load(http_cookiejar.CookieJar()) is None
+
+
+def test_remove(cryptography, tmp_path):
+    cache = SessionCache(str(tmp_path), HOST, "admin", "secret")
+    cache.save(make_jar(), "token1")
+
+    cache.remove()
+
+    assert not os.path.exists(cache.filename)
+    assert cache.load(http_cookiejar.CookieJar()) is None
+
+
+class FailJson(Exception):
+    pass
+
+
+def test_missing_cryptography(monkeypatch, tmp_path):
+    monkeypatch.setattr(api_module, "HAS_CRYPTOGRAPHY", False)
+    module = APIModule.__new__(APIModule)
+    module.host_url = urlparse(HOST)
+    module.params = {
+        "quay_session_cache_dir": str(tmp_path),
+        "quay_username": "admin",
+        "quay_password": "secret",
+    }
+
+    def fail_json(**kwargs):
+        raise FailJson(kwargs["msg"])
+
+    module.fail_json = fail_json
+
+    with pytest.raises(FailJson, match="cryptography"):
+        module.get_session_cache()
+
+
+def test_no_cache_without_password(tmp_path):
+    module = APIModule.__new__(APIModule)
+    module.params = {"quay_session_cache_dir": str(tmp_path), "quay_token": "abcd"}
+
+    assert module.get_session_cache() is None